@@ -5,8 +5,21 @@ from .models import (
     QuizAttempt, UserStoryLike, UserStoryView, UserTimelineView, UserTimelineBookmark, 
     Timestamp, Feedback, TimelineCategory, StandAloneGameQuestion, StandAloneGameOption, 
     GameTypes, StandAloneGameAttempt, UserFollow, CommunityMember, Community, Post, 
-    Comment, Report, VerificationOTP, ReportType, ReportReason, ReportStatus
+    Comment, Report, VerificationOTP, ReportType, ReportReason, ReportStatus, UserBadge, PointsEvent, VideoJob, SessionLocal
 )
+from sqlalchemy import func, select, update
+from utils.identity_cache import invalidate_user
+
+def recount_community_members():
+    """Rebuild every Community.member_count; admin edits bypass the join/leave endpoints"""
+    db = SessionLocal()
+    try:
+        db.execute(update(Community).values(member_count=(
+            select(func.count(CommunityMember.id)).where(CommunityMember.community_id == Community.id).scalar_subquery()
+        )))
+        db.commit()
+    finally:
+        db.close()
 
 class UserAdmin(ModelView, model=User):
     column_list = [User.id, User.email, User.username, User.password, User.joined_at, User.is_verified, User.is_active, User.is_admin]
@@ -22,10 +35,20 @@ class UserAdmin(ModelView, model=User):
     column_formatters = {
         User.profile: lambda m, a: m.profile.nickname if m.profile else "No profile"
     }
+    
+    # Drop the cached identity so admin edits (e.g. deactivation) apply right away in this
+    # process; the others drop theirs at their next identity_invalidations poll (a few seconds)
+    async def after_model_change(self, data, model, is_created, request):
+        invalidate_user(model.id)
+    
+    async def after_model_delete(self, model, request):
+        invalidate_user(model.id)
+        # Their memberships were deleted with them
+        recount_community_members()
 
 class ProfileAdmin(ModelView, model=Profile):
     column_list = [Profile.id, Profile.user_id, Profile.points, Profile.nickname, Profile.avatar_url, 
-                   Profile.referral_code, Profile.total_referrals, Profile.is_premium, Profile.badges,
+                   Profile.referral_code, Profile.total_referrals, Profile.is_premium,
                    Profile.current_login_streak, Profile.max_login_streak, Profile.last_login_date, 
                    Profile.language_preference, Profile.pronouns, Profile.location, Profile.personalization_questions]
     name = "Profile"
@@ -36,6 +59,28 @@ class ProfileAdmin(ModelView, model=Profile):
     column_formatters = {
         Profile.user: lambda m, a: f"{m.user.email}" if m.user else "No user"
     }
+    
+    async def after_model_change(self, data, model, is_created, request):
+        invalidate_user(model.user_id)
+    
+    async def after_model_delete(self, model, request):
+        invalidate_user(model.user_id)
+
+class UserBadgeAdmin(ModelView, model=UserBadge):
+    column_list = [UserBadge.id, UserBadge.user_id, UserBadge.badge_id, UserBadge.earned_at, UserBadge.revoked_at]
+    name = "User Badge"
+    name_plural = "User Badges"
+    icon = "fa-solid fa-award"
+
+class PointsEventAdmin(ModelView, model=PointsEvent):
+    column_list = [PointsEvent.id, PointsEvent.user_id, PointsEvent.delta, PointsEvent.reason, PointsEvent.source_id, PointsEvent.created_at, PointsEvent.aggregated_at]
+    name = "Points Event"
+    name_plural = "Points Events"
+    icon = "fa-solid fa-coins"
+    # The ledger is append-only
+    can_create = False
+    can_edit = False
+    can_delete = False
 
 class UserFollowAdmin(ModelView, model=UserFollow):
     column_list = [UserFollow.id, UserFollow.follower_id, UserFollow.followed_id, UserFollow.created_at]
@@ -106,6 +151,16 @@ class StoryAdmin(ModelView, model=Story):
         Story.quiz: lambda m, a: f"Quiz #{m.quiz.id}" if m.quiz else "None"
     }
     
+class VideoJobAdmin(ModelView, model=VideoJob):
+    column_list = [VideoJob.id, VideoJob.story_id, VideoJob.status, VideoJob.progress, VideoJob.attempts,
+                   VideoJob.error, VideoJob.host, VideoJob.claimed_by, VideoJob.heartbeat_at, VideoJob.created_at, VideoJob.finished_at]
+    name = "Video Job"
+    name_plural = "Video Jobs"
+    icon = "fa-solid fa-film"
+    # Jobs are created by story uploads and driven by the transcoding workers
+    can_create = False
+    can_edit = False
+
 class QuizAdmin(ModelView, model=Quiz):
     column_list = [Quiz.id, Quiz.story_id, Quiz.created_at]
     name = "Quiz"
@@ -232,10 +287,19 @@ class CommunityMemberAdmin(ModelView, model=CommunityMember):
         CommunityMember.user: lambda m, a: f"{m.user.email}" if m.user else f"User #{m.user_id}",
         CommunityMember.community: lambda m, a: f"{m.community.name}" if m.community else f"Community #{m.community_id}"
     }
+    
+    # A membership can be added, moved or removed here, recount so member_count stays right
+    async def after_model_change(self, data, model, is_created, request):
+        recount_community_members()
+    
+    async def after_model_delete(self, model, request):
+        recount_community_members()
 
 class CommunityAdmin(ModelView, model=Community):
     column_list = [Community.id, Community.name, Community.description, Community.banner_url, 
-                   Community.icon_url, Community.topics, Community.created_at, Community.created_by]
+                   Community.icon_url, Community.topics, Community.member_count, Community.created_at, Community.created_by]
+    # Maintained by the join/leave endpoints
+    form_excluded_columns = [Community.member_count]
     name = "Community"
     name_plural = "Communities"
     icon = "fa-solid fa-users"
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
-from routers import users, stories_timelines, communities_posts, games
+from fastapi.responses import ORJSONResponse
+from routers import users, stories_timelines, communities_posts, games, events
 from db.models import engine, Base
 from utils.auth import SECRET_KEY
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,11 +8,32 @@ from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import os
+import asyncio
 import sqladmin
 import shutil
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-
-app= FastAPI()
+from contextlib import asynccontextmanager
+from utils.background import start_background_worker, stop_background_worker
+from utils.catalog import catalog_cache
+from utils.transcoder import transcode_pool
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.responses import CompressionMiddleware
+from utils.file_handler import UploadSizeLimitMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background worker for streaks, badges and other deferred work
+    await start_background_worker()
+    # Load the catalog before the first request instead of on it
+    await asyncio.to_thread(catalog_cache.warm)
+    # Story video transcoding, resuming jobs left unfinished by a previous run
+    await transcode_pool.start()
+    yield
+    await transcode_pool.stop()
+    await stop_background_worker()
+
+# orjson for every response that doesn't pick its own class
+app= FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 app.add_middleware(
@@ -28,10 +50,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser clients read the keyset pagination cursor
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.add_middleware(HTTPSRedirectMiddleware)
 
+# 413 for oversized request bodies before they are parsed or spooled
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Brotli or gzip for large JSON payloads, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 
 static_path = Path("static")
 static_path.mkdir(exist_ok=True)
@@ -61,6 +91,7 @@ app.include_router(users.router)
 app.include_router(stories_timelines.router)
 app.include_router(communities_posts.router)
 app.include_router(games.router)
+app.include_router(events.router)
 
 # Include admin
 from sqladmin import Admin
@@ -70,9 +101,12 @@ admin = Admin(app, engine)
 from db.admin import (
     UserAdmin, 
     ProfileAdmin,
+    UserBadgeAdmin,
+    PointsEventAdmin,
     UserFollowAdmin,
     TimelineAdmin, 
     StoryAdmin, 
+    VideoJobAdmin,
     QuizAdmin,
     QuestionAdmin,
     OptionAdmin,
@@ -98,9 +132,12 @@ from db.admin import (
 
 admin.add_view(UserAdmin)
 admin.add_view(ProfileAdmin)
+admin.add_view(UserBadgeAdmin)
+admin.add_view(PointsEventAdmin)
 admin.add_view(UserFollowAdmin)
 admin.add_view(TimelineAdmin)
 admin.add_view(StoryAdmin)
+admin.add_view(VideoJobAdmin)
 admin.add_view(QuizAdmin)
 admin.add_view(QuestionAdmin)
 admin.add_view(OptionAdmin)
@@ -0,0 +1,53 @@
+"""Make the timestamps keyset pagination orders by NOT NULL
+
+Revision ID: f2b8d4c6a1e7
+Revises: e5c71a9b3d28
+Create Date: 2026-10-17 21:06:44.918032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4c6a1e7'
+down_revision: Union[str, None] = 'e5c71a9b3d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column) pairs paged by (column, id); a NULL can't go in a cursor and is
+# skipped by the (column, id) > cursor comparison
+KEYSET_TIMESTAMPS = [
+    ('on_this_day', 'created_at'),
+    ('characters', 'created_at'),
+    ('timelines', 'created_at'),
+    ('stories', 'created_at'),
+    ('quizzes', 'created_at'),
+    ('quiz_attempts', 'created_at'),
+    ('user_timeline_bookmarks', 'bookmarked_at'),
+    ('communities', 'created_at'),
+    ('community_members', 'joined_at'),
+    ('posts', 'created_at'),
+    ('comments', 'created_at'),
+    ('stand_alone_games', 'created_at'),
+    ('stand_alone_game_attempts', 'created_at'),
+    ('reports', 'created_at'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in KEYSET_TIMESTAMPS:
+        # Rows without a timestamp have no known creation time; they sort first
+        op.execute(f"UPDATE {table} SET {column} = '1970-01-01 00:00:00' WHERE {column} IS NULL")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in reversed(KEYSET_TIMESTAMPS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(), nullable=True)
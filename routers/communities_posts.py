@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime
 
-from db.models import Community, Post, Comment, User, CommunityMember, Report
+from db.models import Community, Post, Comment, User, CommunityMember, Report, ReportType
 from schemas.communities_posts import (
     Community as CommunitySchema,
     CommunityCreate, 
@@ -25,6 +25,7 @@ from schemas.communities_posts import (
     Report as ReportSchema,
     ReportResponse,
     ReportWithDetails,
+    ReportQueueItem,
     ReportUpdate,
     ReportTypeEnum,
     ReportReasonEnum
@@ -32,6 +33,7 @@ from schemas.communities_posts import (
 from db.models import get_db
 from utils.auth import get_current_user
 from utils.file_handler import save_image, delete_file
+from utils.pagination import paginate, set_next_cursor
 
 router = APIRouter(
     prefix="/api/community",
@@ -86,47 +88,81 @@ async def create_community(
             delete_file(icon_url)
         raise HTTPException(status_code=400, detail=str(e))
 
+def _community_with_member_count(community: Community, is_member: bool) -> CommunityWithMemberCount:
+    """Enhanced community object; member_count is the denormalized column, no COUNT query"""
+    community_dict = {
+        "id": community.id,
+        "name": community.name,
+        "description": community.description,
+        "topics": community.topics,
+        "banner_url": community.banner_url,
+        "icon_url": community.icon_url,
+        "created_at": community.created_at,
+        "created_by": community.created_by,
+        "member_count": community.member_count,
+        "is_member": is_member
+    }
+    return CommunityWithMemberCount(**community_dict)
+
+def _change_member_count(db: Session, community_id: int, delta: int):
+    """Adjust the denormalized member count in the caller's transaction"""
+    db.query(Community).filter(Community.id == community_id).update(
+        {Community.member_count: Community.member_count + delta}, synchronize_session=False
+    )
+
 @router.get("/", response_model=List[CommunityWithMemberCount])
 def get_communities(
+    response: Response,
     skip: int = 0, 
     limit: int = 10,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all communities with pagination, member count, and membership status"""
-    communities = db.query(Community).offset(skip).limit(limit).all()
-    
-    result = []
-    for community in communities:
-        # Count members
-        member_count = db.query(CommunityMember).filter(
-            CommunityMember.community_id == community.id
-        ).count()
-        
-        # Check if current user is a member
-        is_member = db.query(CommunityMember).filter(
-            CommunityMember.community_id == community.id,
-            CommunityMember.user_id == current_user.id
-        ).first() is not None
-        
-        # Create enhanced community object
-        community_dict = {
-            "id": community.id,
-            "name": community.name,
-            "description": community.description,
-            "topics": community.topics,
-            "banner_url": community.banner_url,
-            "icon_url": community.icon_url,
-            "created_at": community.created_at,
-            "created_by": community.created_by,
-            "member_count": member_count,
-            "is_member": is_member
+    communities, next_cursor = paginate(
+        db.query(Community), Community.created_at, Community.id, after, limit, offset=skip
+    )
+    set_next_cursor(response, next_cursor)
+    
+    # Check membership for the whole page with one query
+    joined_community_ids = set()
+    if communities:
+        joined_community_ids = {
+            community_id for (community_id,) in db.query(CommunityMember.community_id).filter(
+                CommunityMember.user_id == current_user.id,
+                CommunityMember.community_id.in_([community.id for community in communities])
+            )
         }
-        result.append(CommunityWithMemberCount(**community_dict))
     
-    return result
+    return [
+        _community_with_member_count(community, community.id in joined_community_ids)
+        for community in communities
+    ]
 
-@router.get("/{community_id}", response_model=CommunityWithMemberCount)
+@router.get("/my-communities", response_model=List[CommunityWithMemberCount])
+def get_my_communities(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all communities the current user has joined"""
+    # Declared before /{community_id} so the path isn't parsed as a community id
+    member_communities, next_cursor = paginate(
+        db.query(Community)
+        .join(CommunityMember)
+        .filter(CommunityMember.user_id == current_user.id),
+        Community.created_at, Community.id, after, limit, offset=skip
+    )
+    set_next_cursor(response, next_cursor)
+    
+    return [_community_with_member_count(community, True) for community in member_communities]
+
+# :int keeps this from shadowing fixed paths like /reports
+@router.get("/{community_id:int}", response_model=CommunityWithMemberCount)
 def get_community(
     community_id: int,
     db: Session = Depends(get_db),
@@ -137,32 +173,13 @@ def get_community(
     if not community:
         raise HTTPException(status_code=404, detail="Community not found")
     
-    # Count members
-    member_count = db.query(CommunityMember).filter(
-        CommunityMember.community_id == community.id
-    ).count()
-    
     # Check if current user is a member
-    is_member = db.query(CommunityMember).filter(
+    is_member = db.query(CommunityMember.id).filter(
         CommunityMember.community_id == community.id,
         CommunityMember.user_id == current_user.id
     ).first() is not None
     
-    # Create enhanced community object
-    community_dict = {
-        "id": community.id,
-        "name": community.name,
-        "description": community.description,
-        "topics": community.topics,
-        "banner_url": community.banner_url,
-        "icon_url": community.icon_url,
-        "created_at": community.created_at,
-        "created_by": community.created_by,
-        "member_count": member_count,
-        "is_member": is_member
-    }
-    
-    return CommunityWithMemberCount(**community_dict)
+    return _community_with_member_count(community, is_member)
 
 @router.put("/{community_id}", response_model=CommunitySchema)
 async def update_community(
@@ -301,6 +318,7 @@ def join_community(
     )
     
     db.add(new_membership)
+    _change_member_count(db, community_id, 1)
     try:
         db.commit()
         return CommunityMembershipResponse(
@@ -337,6 +355,7 @@ def leave_community(
     
     # Remove membership
     db.delete(membership)
+    _change_member_count(db, community_id, -1)
     try:
         db.commit()
         return CommunityMembershipResponse(
@@ -350,8 +369,10 @@ def leave_community(
 @router.get("/{community_id}/members", response_model=List[CommunityMemberSchema])
 def get_community_members(
     community_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    after: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all members of a community"""
@@ -360,9 +381,11 @@ def get_community_members(
     if not community:
         raise HTTPException(status_code=404, detail="Community not found")
     
-    members = db.query(CommunityMember).filter(
-        CommunityMember.community_id == community_id
-    ).offset(skip).limit(limit).all()
+    members, next_cursor = paginate(
+        db.query(CommunityMember).filter(CommunityMember.community_id == community_id),
+        CommunityMember.joined_at, CommunityMember.id, after, limit, offset=skip
+    )
+    set_next_cursor(response, next_cursor)
     
     return members
 
@@ -392,26 +415,6 @@ def get_membership_status(
         is_member=is_member
     )
 
-@router.get("/my-communities", response_model=List[CommunitySchema])
-def get_my_communities(
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get all communities the current user has joined"""
-    # Get communities where user is a member
-    member_communities = (
-        db.query(Community)
-        .join(CommunityMember)
-        .filter(CommunityMember.user_id == current_user.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    
-    return member_communities
-
 # Post endpoints
 @router.post("/post/", response_model=PostSchema, status_code=status.HTTP_201_CREATED)
 async def create_post(
@@ -455,16 +458,19 @@ async def create_post(
 
 @router.get("/post/", response_model=List[PostSchema])
 def get_posts(
+    response: Response,
     community_id: Optional[int] = None,
     skip: int = 0, 
     limit: int = 10,
+    after: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all posts with optional filtering by community"""
     query = db.query(Post)
     if community_id:
         query = query.filter(Post.community_id == community_id)
-    posts = query.order_by(Post.created_at.desc()).offset(skip).limit(limit).all()
+    posts, next_cursor = paginate(query, Post.created_at, Post.id, after, limit, descending=True, offset=skip)
+    set_next_cursor(response, next_cursor)
     return posts
 
 @router.get("/post/{post_id}", response_model=PostSchema)
@@ -634,10 +640,34 @@ def create_report(
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+def _reported_item_titles(db: Session, items) -> dict:
+    """Titles of reported communities and posts keyed by (report_type, item id), one IN query per type"""
+    ids_by_type = {}
+    for report_type, item_id in items:
+        ids_by_type.setdefault(ReportType(report_type), set()).add(item_id)
+    
+    titles = {}
+    if ids_by_type.get(ReportType.COMMUNITY):
+        for community_id, name in db.query(Community.id, Community.name).filter(
+            Community.id.in_(ids_by_type[ReportType.COMMUNITY])
+        ):
+            titles[(ReportType.COMMUNITY, community_id)] = name
+    if ids_by_type.get(ReportType.POST):
+        for post_id, title in db.query(Post.id, Post.title).filter(Post.id.in_(ids_by_type[ReportType.POST])):
+            titles[(ReportType.POST, post_id)] = title
+    return titles
+
+def _reported_item_title(titles: dict, report_type, item_id: int) -> str:
+    report_type = ReportType(report_type)
+    deleted = "Deleted Community" if report_type == ReportType.COMMUNITY else "Deleted Post"
+    return titles.get((report_type, item_id), deleted)
+
 @router.get("/reports", response_model=List[ReportWithDetails])
 def get_reports(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    after: Optional[str] = None,
     status_filter: Optional[str] = None,
     report_type_filter: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -655,23 +685,22 @@ def get_reports(
     if report_type_filter:
         query = query.filter(Report.report_type == report_type_filter)
     
-    reports = query.order_by(Report.created_at.desc()).offset(skip).limit(limit).all()
+    reports, next_cursor = paginate(query, Report.created_at, Report.id, after, limit, descending=True, offset=skip)
+    set_next_cursor(response, next_cursor)
+    
+    # Look up reporters and reported items for the whole page at once
+    reporter_emails = {}
+    if reports:
+        reporter_emails = dict(
+            db.query(User.id, User.email).filter(User.id.in_({report.reporter_id for report in reports}))
+        )
+    titles = _reported_item_titles(db, [(report.report_type, report.reported_item_id) for report in reports])
     
     # Enhance reports with additional details
     enhanced_reports = []
     for report in reports:
-        # Get reporter email
-        reporter = db.query(User).filter(User.id == report.reporter_id).first()
-        reporter_email = reporter.email if reporter else None
-        
-        # Get reported item title
-        reported_item_title = None
-        if report.report_type == "community":
-            community = db.query(Community).filter(Community.id == report.reported_item_id).first()
-            reported_item_title = community.name if community else "Deleted Community"
-        elif report.report_type == "post":
-            post = db.query(Post).filter(Post.id == report.reported_item_id).first()
-            reported_item_title = post.title if post else "Deleted Post"
+        reporter_email = reporter_emails.get(report.reporter_id)
+        reported_item_title = _reported_item_title(titles, report.report_type, report.reported_item_id)
         
         enhanced_report = ReportWithDetails(
             id=report.id,
@@ -692,6 +721,52 @@ def get_reports(
     
     return enhanced_reports
 
+@router.get("/reports/queue", response_model=List[ReportQueueItem])
+def get_report_queue(
+    skip: int = 0,
+    limit: int = 20,
+    status_filter: Optional[str] = "pending",
+    report_type_filter: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reported communities and posts with their report counts, most reported first (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    report_count = func.count(Report.id).label("report_count")
+    last_reported_at = func.max(Report.created_at).label("last_reported_at")
+    query = db.query(
+        Report.report_type,
+        Report.reported_item_id,
+        report_count,
+        func.min(Report.created_at).label("first_reported_at"),
+        last_reported_at
+    )
+    
+    # Apply filters
+    if status_filter:
+        query = query.filter(Report.status == status_filter)
+    if report_type_filter:
+        query = query.filter(Report.report_type == report_type_filter)
+    
+    items = query.group_by(Report.report_type, Report.reported_item_id).order_by(
+        report_count.desc(), last_reported_at.desc(), Report.reported_item_id
+    ).offset(skip).limit(limit).all()
+    
+    titles = _reported_item_titles(db, [(item.report_type, item.reported_item_id) for item in items])
+    return [
+        ReportQueueItem(
+            report_type=item.report_type,
+            reported_item_id=item.reported_item_id,
+            reported_item_title=_reported_item_title(titles, item.report_type, item.reported_item_id),
+            report_count=item.report_count,
+            first_reported_at=item.first_reported_at,
+            last_reported_at=item.last_reported_at
+        )
+        for item in items
+    ]
+
 @router.put("/reports/{report_id}", response_model=ReportSchema)
 def update_report(
     report_id: int,
@@ -727,20 +802,20 @@ def update_report(
 
 @router.get("/reports/my", response_model=List[ReportSchema])
 def get_my_reports(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get current user's submitted reports"""
-    reports = (
+    reports, next_cursor = paginate(
         db.query(Report)
-        .filter(Report.reporter_id == current_user.id)
-        .order_by(Report.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .filter(Report.reporter_id == current_user.id),
+        Report.created_at, Report.id, after, limit, descending=True, offset=skip
     )
+    set_next_cursor(response, next_cursor)
     return reports
 
 @router.get("/reports/reasons", response_model=List[dict])
@@ -782,12 +857,18 @@ def create_comment(
 @router.get("/post/{post_id}/comments", response_model=List[CommentSchema])
 def get_comments(
     post_id: int,
+    response: Response,
     skip: int = 0, 
     limit: int = 10,
+    after: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all comments for a specific post"""
-    comments = db.query(Comment).filter(Comment.post_id == post_id).order_by(Comment.created_at.desc()).offset(skip).limit(limit).all()
+    comments, next_cursor = paginate(
+        db.query(Comment).filter(Comment.post_id == post_id),
+        Comment.created_at, Comment.id, after, limit, descending=True, offset=skip
+    )
+    set_next_cursor(response, next_cursor)
     return comments
 
 @router.put("/comment/{comment_id}", response_model=CommentSchema)
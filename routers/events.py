@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from db.models import get_db, User, Story, Timeline, UserStoryView, UserTimelineView, IS_SQLITE
+from schemas.events import ViewEventsBatchModel, ViewEventsResponseModel
+from utils.auth import get_current_user
+from utils.background import register_handler, enqueue_event
+from utils.http_cache import bump_user_state_version
+from utils.counters import story_counters
+from utils.points import award_points, POINTS_STORY_VIEW
+from utils.progress import increment_progress, timeline_progress_increment
+from datetime import datetime, timezone
+from typing import List
+
+router = APIRouter(
+    prefix="/api/events",
+    tags=["events"]
+)
+
+def _insert_new_views(db: Session, model, target_column: str, user_id: int, viewed_at_by_id: dict) -> List[int]:
+    """Bulk INSERT ... ON CONFLICT DO NOTHING; returns the ids that were viewed for the first time"""
+    if not viewed_at_by_id:
+        return []
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    target = getattr(model, target_column)
+    stmt = insert(model).values([
+        {'user_id': user_id, target_column: target_id, 'is_seen': True, 'viewed_at': viewed_at}
+        for target_id, viewed_at in viewed_at_by_id.items()
+    ]).on_conflict_do_nothing(index_elements=['user_id', target_column]).returning(target)
+    return [target_id for (target_id,) in db.execute(stmt)]
+
+@router.post('/views', response_model=ViewEventsResponseModel, status_code=status.HTTP_202_ACCEPTED)
+async def record_view_events(
+    batch: ViewEventsBatchModel,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Record a batch of story and timeline views. First views are stored with one
+    insert per table, along with their points; progress and badges are processed
+    in the background.
+    """
+    now = datetime.utcnow()
+    story_views, timeline_views = {}, {}
+    story_view_counts = {}
+    for event in batch.events:
+        viewed_at = event.viewed_at or now
+        if viewed_at.tzinfo:
+            viewed_at = viewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # Client clocks can run ahead, never record a view in the future
+        viewed_at = min(viewed_at, now)
+        if event.story_id is not None:
+            story_views[event.story_id] = min(viewed_at, story_views.get(event.story_id, viewed_at))
+            story_view_counts[event.story_id] = story_view_counts.get(event.story_id, 0) + 1
+        else:
+            timeline_views[event.timeline_id] = min(viewed_at, timeline_views.get(event.timeline_id, viewed_at))
+
+    # Drop views of stories or timelines that don't exist instead of failing the batch
+    if story_views:
+        existing = {story_id for (story_id,) in db.query(Story.id).filter(Story.id.in_(list(story_views)))}
+        story_views = {story_id: viewed_at for story_id, viewed_at in story_views.items() if story_id in existing}
+    if timeline_views:
+        existing = {timeline_id for (timeline_id,) in db.query(Timeline.id).filter(Timeline.id.in_(list(timeline_views)))}
+        timeline_views = {timeline_id: viewed_at for timeline_id, viewed_at in timeline_views.items() if timeline_id in existing}
+
+    new_story_ids = _insert_new_views(db, UserStoryView, 'story_id', current_user.id, story_views)
+    new_timeline_ids = _insert_new_views(db, UserTimelineView, 'timeline_id', current_user.id, timeline_views)
+    for story_id in new_story_ids:
+        award_points(db, current_user.id, 5, POINTS_STORY_VIEW, story_id)  # 5 points for first time viewing a story
+    if new_story_ids or new_timeline_ids:
+        # Bulk inserts skip the session hooks; is_seen flags changed, so cached lists are stale
+        bump_user_state_version(db, current_user.id)
+    db.commit()
+
+    # Every view counts towards Story.views, first views or not
+    for story_id in story_views:
+        story_counters.increment(story_id, 'views', story_view_counts[story_id])
+
+    if new_story_ids or new_timeline_ids:
+        enqueue_event("views_recorded", user_id=current_user.id, story_ids=new_story_ids, timeline_ids=new_timeline_ids)
+
+    return ViewEventsResponseModel(
+        accepted=len(batch.events),
+        new_story_views=len(new_story_ids),
+        new_timeline_views=len(new_timeline_ids)
+    )
+
+@register_handler("views_recorded")
+def process_views_recorded(db: Session, user_id: int, story_ids: List[int], timeline_ids: List[int]):
+    """Progress and badges for first views recorded by POST /api/events/views"""
+    from utils.badge_utils import evaluate_badge_progress, notify_badges_unlocked, STORY_VIEW_METRICS, TIMELINE_VIEW_METRICS
+
+    # Every call stamps last_qualifying_activity_at, so timeline-only batches still count for retention
+    increment_progress(db, user_id, stories_completed=len(story_ids))
+    if story_ids:
+        for (timeline_id,) in db.query(Story.timeline_id).filter(Story.id.in_(story_ids)):
+            if timeline_id:
+                db.execute(timeline_progress_increment(user_id, timeline_id))
+
+    changed_metrics = STORY_VIEW_METRICS if story_ids else TIMELINE_VIEW_METRICS
+    badge_updates = evaluate_badge_progress(user_id, db, changed_metrics)
+    notify_badges_unlocked(user_id, badge_updates['newly_earned_badges'], db)
+    db.commit()
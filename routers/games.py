@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Path, Request, Response
 from db.models import get_db, StandAloneGameQuestion, StandAloneGameOption, StandAloneGameAttempt, GameTypes, User
 from sqlalchemy.orm import Session
 from utils.file_handler import save_image, delete_file
@@ -8,6 +8,11 @@ from schemas.games import (
 )
 from typing import List, Optional
 from utils.auth import get_current_user
+from utils.progress import increment_progress, game_type_bit
+from utils.points import award_points, POINTS_GAME
+from utils.pagination import paginate, set_next_cursor, MAX_PAGE_LIMIT
+from utils.http_cache import catalog_response, PUBLIC_CACHE_CONTROL
+from utils.responses import response_cache
 import math
 import os
 import json
@@ -125,31 +130,45 @@ async def create_bulk_game_questions(
 # Get games with pagination
 @router.get("/questions", response_model=PaginatedGames)
 async def get_games(
+    request: Request,
+    response: Response,
     game_type: Optional[GameTypes] = None,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
+    after: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(StandAloneGameQuestion)
+    # Game questions are catalog content, unchanged until the catalog version moves
+    not_modified = catalog_response(request, response, cache_control=PUBLIC_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
     
-    if game_type:
-        query = query.filter(StandAloneGameQuestion.game_type == game_type)
-    
-    total = query.count()
-    pages = math.ceil(total / size)
-    
-    items = query.order_by(StandAloneGameQuestion.created_at.desc()) \
-                .offset((page - 1) * size) \
-                .limit(size) \
-                .all()
+    def build():
+        query = db.query(StandAloneGameQuestion)
+        
+        if game_type:
+            query = query.filter(StandAloneGameQuestion.game_type == game_type)
+        
+        total = query.count()
+        pages = math.ceil(total / size)
+        
+        # `after` continues from the previous page's next_cursor without an OFFSET scan
+        items, next_cursor = paginate(
+            query, StandAloneGameQuestion.created_at, StandAloneGameQuestion.id, after, size, descending=True,
+            offset=0 if after else (page - 1) * size
+        )
+        
+        return PaginatedGames.model_validate({
+            "total": total,
+            "items": items,
+            "page": page,
+            "size": size,
+            "pages": pages,
+            "next_cursor": next_cursor
+        }, from_attributes=True)
     
-    return {
-        "total": total,
-        "items": items,
-        "page": page,
-        "size": size,
-        "pages": pages
-    }
+    # Serialized once per page and catalog version, then served from memory
+    return response_cache.serve(request, response, build)
 
 # Get single game by ID
 @router.get("/questions/{question_id}", response_model=GameQuestion)
@@ -310,17 +329,22 @@ async def submit_game_attempt(
     )
     
     db.add(new_attempt)
-    db.commit()
-    db.refresh(new_attempt)
+    increment_progress(
+        db,
+        current_user.id,
+        game_type_bit(game.game_type),
+        games_played=1,
+        high_score_games=1 if option.is_correct else 0
+    )
     
     # Award points if the answer is correct (similar to quiz system)
     if option.is_correct:
-        profile = current_user.profile
-        profile.points += 5  # Award 5 points for correct answers
-        db.commit()
+        award_points(db, current_user.id, 5, POINTS_GAME, game.id)  # Award 5 points for correct answers
+    db.commit()
+    db.refresh(new_attempt)
     
-    from utils.badge_utils import evaluate_badge_progress
-    badge_updates = evaluate_badge_progress(current_user.id, db)
+    from utils.badge_utils import evaluate_badge_progress, GAME_METRICS
+    badge_updates = evaluate_badge_progress(current_user.id, db, GAME_METRICS)
     
     response = {
         "id": new_attempt.id,
@@ -339,12 +363,17 @@ async def submit_game_attempt(
 # Get user's game attempts
 @router.get("/attempts", response_model=List[GameAttempt])
 async def get_user_attempts(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    attempts = db.query(StandAloneGameAttempt).filter(
-        StandAloneGameAttempt.user_id == current_user.id
-    ).order_by(StandAloneGameAttempt.created_at.desc()).all()
+    attempts, next_cursor = paginate(
+        db.query(StandAloneGameAttempt).filter(StandAloneGameAttempt.user_id == current_user.id),
+        StandAloneGameAttempt.created_at, StandAloneGameAttempt.id, after, limit, descending=True
+    )
+    set_next_cursor(response, next_cursor)
     
     return attempts
 
@@ -1,20 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query, Request, Response
 from schemas.stories_timelines import (
     TimelineCreateModel, StoryCreateModel, OnThisDayCreateModel, OnThisDayResponseModel, 
     TimelineUpdateModel, StoryUpdateModel, TimeStampCreateModel, QuizCreateModel, 
     QuizResponseModel, QuestionCreateModel, OptionCreateModel, QuizUpdateModel, QuizSubmissionModel,
-    QuizAttemptResponseModel, CharacterCreateModel, CharacterUpdateModel, CharacterResponseModel
+    QuizAttemptResponseModel, CharacterCreateModel, CharacterUpdateModel, CharacterResponseModel,
+    TimelineSummaryModel, TimelineListItemModel, BookmarkedTimelineModel, StoryListItemModel,
+    StoryWithTimestampsModel, CatalogFacetsModel, VideoStatusModel
 )
 from schemas.users import LeaderboardEntryModel, LeaderboardResponseModel
-from db.models import get_db
-from sqlalchemy.orm import Session
-from db.models import User, Timeline, Story, OnThisDay, Timestamp, Quiz, Question, Option, Profile, QuizAttempt, StoryType, UserStoryLike, Character, UserStoryView, UserTimelineView, UserTimelineBookmark
-from utils.auth import get_current_user, get_admin_user
-from utils.file_handler import save_image, save_video, delete_file
+from db.models import get_db, get_async_db
+from sqlalchemy import select, func, desc
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import User, Timeline, TimelineCategoryLink, Story, VideoJob, OnThisDay, Timestamp, Quiz, Question, Option, Profile, QuizAttempt, StoryType, UserStoryLike, Character, UserStoryView, UserTimelineView, UserTimelineBookmark, UserTimelineProgress
+from utils.auth import get_current_user, get_current_user_async, get_admin_user
+from utils.progress import increment_progress, progress_increment, timeline_progress_increment, record_story_added, record_stories_removed, refresh_timeline_progress
+from utils.file_handler import save_image, save_pending_video, delete_file, ensure_upload_size, MAX_IMAGE_UPLOAD_BYTES, MAX_VIDEO_UPLOAD_BYTES
+from utils.transcoder import create_video_job, transcode_pool
 from utils.push_notification import send_otd_notification
+from utils.rank_service import rank_service
+from utils.counters import story_counters
+from utils.points import award_points, points_balance, get_points_balance, get_points_balance_async, POINTS_STORY_VIEW, POINTS_QUIZ
 from fastapi.responses import JSONResponse
+from utils.catalog import catalog_cache, get_catalog_facets
+from utils.http_cache import catalog_response, user_catalog_response, PUBLIC_CACHE_CONTROL
+from utils.responses import json_response, response_cache
+from utils.pagination import keyset, page, paginate, paginate_sorted, set_next_cursor, MAX_PAGE_LIMIT
 from datetime import date, datetime
 from typing import Optional, List
+import asyncio
 import json
 import re
 
@@ -70,31 +84,58 @@ async def create_otd(
             delete_file(image_url)
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/list/otd")
-async def get_all_otd(db: Session = Depends(get_db)):
-    otd_entries = db.query(OnThisDay).all()
-    return otd_entries
+@router.get("/list/otd", response_model=List[OnThisDayResponseModel])
+async def get_all_otd(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    db: Session = Depends(get_db)
+):
+    not_modified = catalog_response(request, response, cache_control=PUBLIC_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+    
+    def build():
+        otd_entries, next_cursor = paginate_sorted(catalog_cache.get().otd, after, limit)
+        set_next_cursor(response, next_cursor)
+        return otd_entries
+    
+    # Same bytes for every client until the catalog changes
+    return response_cache.serve(request, response, build)
     # Convert each entry to a dictionary with proper None handling
     #return [otd_to_dict(entry) for entry in otd_entries]
 
 @router.get('/leaderboard', response_model=LeaderboardResponseModel)
 async def get_leaderboard(
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Get the top users by points"""
-    # Query profiles ordered by points (descending)
-    top_profiles = db.query(
-        Profile.id,
-        Profile.user_id,
-        Profile.nickname,
-        Profile.avatar_url,
-        Profile.points,
-        Profile.current_login_streak,
-        Profile.max_login_streak,
-        User.email
-    ).join(User).order_by(Profile.points.desc()).limit(limit).all()
+    # Ranks come from the in-process index; only the top profiles are read from the database
+    await asyncio.to_thread(rank_service.refresh_if_stale)
+    top_user_ids = [user_id for user_id, _ in rank_service.top(limit)]
+    
+    result = await db.execute(
+        select(
+            Profile.id,
+            Profile.user_id,
+            Profile.nickname,
+            Profile.avatar_url,
+            points_balance(),
+            Profile.current_login_streak,
+            Profile.max_login_streak,
+            User.email
+        ).join(User).where(Profile.user_id.in_(top_user_ids))
+    )
+    profiles_by_user = {profile.user_id: profile for profile in result.all()}
+    top_profiles = [profiles_by_user[user_id] for user_id in top_user_ids if user_id in profiles_by_user]
+    # Awards from other processes reach the index at its next resync; rank the page
+    # by the balances just read so no one shows more points than those above them
+    for profile in top_profiles:
+        rank_service.set_points(profile.user_id, profile.points)
+    top_profiles.sort(key=lambda profile: -(profile.points or 0))
     
     # Format the results
     leaderboard = []
@@ -112,12 +153,7 @@ async def get_leaderboard(
         leaderboard.append(profile_dict)
     
     # Get the current user's rank
-    user_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
-    user_rank = None
-    
-    if user_profile:
-        higher_ranked_count = db.query(Profile).filter(Profile.points > user_profile.points).count()
-        user_rank = higher_ranked_count + 1
+    user_rank = rank_service.rank(current_user.id)
     
     return LeaderboardResponseModel(
         leaderboard=leaderboard,
@@ -135,33 +171,33 @@ async def get_user_rank(
     if not user_profile:
         raise HTTPException(status_code=404, detail="User profile not found")
     
-    # Count how many users have more points than the current user
-    higher_ranked_count = db.query(Profile).filter(Profile.points > user_profile.points).count()
-    
-    # The user's rank is the count of users with more points + 1
-    user_rank = higher_ranked_count + 1
-    
-    # Get total number of users for percentile calculation
-    total_users = db.query(Profile).count()
-    percentile = round((1 - (user_rank / total_users)) * 100) if total_users > 0 else 0
+    # Rank and percentile from the in-process leaderboard index
+    points = get_points_balance(current_user.id, db)
+    await asyncio.to_thread(rank_service.refresh_if_stale)
+    rank_info = rank_service.get_rank_info(current_user.id, points)
     
     return {
-        "rank": user_rank,
-        "total_users": total_users,
-        "percentile": percentile,
-        "points": user_profile.points,
+        "rank": rank_info["rank"],
+        "total_users": rank_info["total_users"],
+        "percentile": rank_info["percentile"],
+        "points": points,
         "current_streak": user_profile.current_login_streak,
         "max_streak": user_profile.max_login_streak
     }
 
-@router.get("/otd/date/{date}")
-async def get_otd_by_date(date: date, db: Session = Depends(get_db)):
-    otd_entry = db.query(OnThisDay).filter(OnThisDay.date == date).first()
-    if not otd_entry:
-        raise HTTPException(status_code=404, detail="No historical event found for this date")
-    
-    # Convert to dictionary with proper None handling
-    return (otd_entry)
+@router.get("/otd/date/{date}", response_model=OnThisDayResponseModel)
+async def get_otd_by_date(date: date, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = catalog_response(request, response, cache_control=PUBLIC_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+    
+    def build():
+        otd_entry = catalog_cache.get().otd_on(date)
+        if not otd_entry:
+            raise HTTPException(status_code=404, detail="No historical event found for this date")
+        return otd_entry
+    
+    return response_cache.serve(request, response, build)
 
 @router.delete("/otd/{id}")
 async def delete_otd(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -238,20 +274,20 @@ async def create_timeline(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get('/timeline/{timeline_id}')
-async def get_timeline(timeline_id: int, db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
-    timeline = db.query(Timeline).filter(Timeline.id == timeline_id).first()
+async def get_timeline(timeline_id: int, track: bool = True, db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
+    catalog, timeline = await catalog_cache.lookup("timelines_by_id", timeline_id)
     
     if not timeline:
         raise HTTPException(detail="Timeline not found", status_code=status.HTTP_404_NOT_FOUND)
     
-    # Track user's view of this timeline
+    # Track user's view of this timeline, unless the client reports it through POST /api/events/views
     user_timeline_view = db.query(UserTimelineView).filter(
         UserTimelineView.user_id == current_user.id,
         UserTimelineView.timeline_id == timeline_id
-    ).first()
+    ).first() if track else None
     
     badge_updates = None
-    if not user_timeline_view:
+    if track and not user_timeline_view:
         # Create new view record
         user_timeline_view = UserTimelineView(
             user_id=current_user.id,
@@ -260,8 +296,10 @@ async def get_timeline(timeline_id: int, db: Session= Depends(get_db), current_u
             viewed_at=datetime.utcnow()
         )
         db.add(user_timeline_view)
-        from utils.badge_utils import evaluate_badge_progress
-        badge_updates = evaluate_badge_progress(current_user.id, db)
+        # Timeline views only count towards badge retention
+        increment_progress(db, current_user.id)
+        from utils.badge_utils import evaluate_badge_progress, TIMELINE_VIEW_METRICS
+        badge_updates = evaluate_badge_progress(current_user.id, db, TIMELINE_VIEW_METRICS)
     
     # Check if timeline is bookmarked
     bookmark = db.query(UserTimelineBookmark).filter(
@@ -269,20 +307,17 @@ async def get_timeline(timeline_id: int, db: Session= Depends(get_db), current_u
         UserTimelineBookmark.timeline_id == timeline_id
     ).first()
     
-    db.commit()  # Commit the changes to the database
-    
     # Get main character info if exists
     main_character = None
-    if timeline.main_character_id:
-        character = db.query(Character).filter(Character.id == timeline.main_character_id).first()
-        if character:
-            main_character = {
-                "id": character.id,
-                "avatar_url": character.avatar_url,
-                "name": character.name,
-                "persona": character.persona,
-                "created_at": character.created_at
-            }
+    character = catalog.main_character(timeline)
+    if character:
+        main_character = {
+            "id": character.id,
+            "avatar_url": character.avatar_url,
+            "name": character.name,
+            "persona": character.persona,
+            "created_at": character.created_at
+        }
     
     # Create response with timeline and main character
     response = {
@@ -298,45 +333,57 @@ async def get_timeline(timeline_id: int, db: Session= Depends(get_db), current_u
         "bookmarked": bookmark is not None
     }
     
+    db.commit()  # Commit the changes to the database
+    
     if badge_updates and badge_updates['newly_earned_badges']:
         response['badge_updates'] = badge_updates
     return response
 
-@router.get('/list/timelines')
-async def get_all_timelines(db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
-    all_timelines = db.query(Timeline).all()
+@router.get('/list/timelines', response_model=List[TimelineListItemModel])
+async def get_all_timelines(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    # The payload only changes with the catalog and the user's views and bookmarks
+    not_modified = await db.run_sync(lambda session: user_catalog_response(request, response, session, current_user.id))
+    if not_modified:
+        return not_modified
     
-    # Get all timeline views for the current user
-    user_timeline_views = db.query(UserTimelineView).filter(
-        UserTimelineView.user_id == current_user.id
-    ).all()
+    # Timelines and characters come from the catalog cache, only the user's own state is queried
+    catalog = catalog_cache.get()
+    all_timelines, next_cursor = paginate_sorted(catalog.timelines, after, limit)
+    set_next_cursor(response, next_cursor)
     
     # Create a set of timeline IDs that the user has viewed
-    viewed_timeline_ids = {view.timeline_id for view in user_timeline_views}
-    
-    # Get all bookmarked timelines for the current user
-    user_timeline_bookmarks = db.query(UserTimelineBookmark).filter(
-        UserTimelineBookmark.user_id == current_user.id
-    ).all()
+    result = await db.execute(
+        select(UserTimelineView.timeline_id).where(UserTimelineView.user_id == current_user.id)
+    )
+    viewed_timeline_ids = set(result.scalars().all())
     
     # Create a set of timeline IDs that the user has bookmarked
-    bookmarked_timeline_ids = {bookmark.timeline_id for bookmark in user_timeline_bookmarks}
+    result = await db.execute(
+        select(UserTimelineBookmark.timeline_id).where(UserTimelineBookmark.user_id == current_user.id)
+    )
+    bookmarked_timeline_ids = set(result.scalars().all())
     
     # Add the is_seen flag to each timeline
     timelines_with_status = []
     for timeline in all_timelines:
         # Get main character info if exists
         main_character = None
-        if timeline.main_character_id:
-            character = db.query(Character).filter(Character.id == timeline.main_character_id).first()
-            if character:
-                main_character = {
-                    "id": character.id,
-                    "avatar_url": character.avatar_url,
-                    "name": character.name,
-                    "persona": character.persona,
-                    "created_at": character.created_at
-                }
+        character = catalog.main_character(timeline)
+        if character:
+            main_character = {
+                "id": character.id,
+                "avatar_url": character.avatar_url,
+                "name": character.name,
+                "persona": character.persona,
+                "created_at": character.created_at
+            }
         
         timelines_with_status.append({
             "id": timeline.id,
@@ -351,46 +398,49 @@ async def get_all_timelines(db: Session= Depends(get_db), current_user: User= De
             "bookmarked": timeline.id in bookmarked_timeline_ids
         })
     
-    return timelines_with_status
+    return json_response(timelines_with_status, response)
 
-@router.get('/timelines/filter')
+@router.get('/timelines/filter', response_model=List[TimelineSummaryModel])
 async def filter_timelines(
+    response: Response,
     categories: Optional[List[str]] = Query(None),
+    story_types: Optional[List[StoryType]] = Query(None),
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Filter timelines by categories"""
-    query = db.query(Timeline)
+    """Filter timelines by categories and/or the types of their stories"""
+    query = db.query(Timeline).options(selectinload(Timeline.main_character))
     
     if categories:
-        # Filter timelines that have at least one matching category
-        # This is a more complex query since we need to filter based on JSON array contents
-        filtered_timelines = []
-        all_timelines = query.all()
-        
-        for timeline in all_timelines:
-            if timeline.categories:
-                # Check if any specified category is in the timeline's categories
-                if any(category in timeline.categories for category in categories):
-                    filtered_timelines.append(timeline)
-    else:
-        # If no categories specified, return all timelines
-        filtered_timelines = query.all()
+        # Timelines that have at least one matching category, via the timeline_categories index
+        query = query.filter(Timeline.id.in_(
+            select(TimelineCategoryLink.timeline_id).where(TimelineCategoryLink.category.in_(categories))
+        ))
+    if story_types:
+        # Timelines that have at least one story of a matching type
+        query = query.filter(Timeline.id.in_(
+            select(Story.timeline_id).where(Story.story_type.in_([int(story_type) for story_type in story_types]))
+        ))
+    
+    filtered_timelines, next_cursor = paginate(query, Timeline.created_at, Timeline.id, after, limit)
+    set_next_cursor(response, next_cursor)
     
     # Convert timelines to response format with categories included
     result = []
     for timeline in filtered_timelines:
         # Get main character info if exists
         main_character = None
-        if timeline.main_character_id:
-            character = db.query(Character).filter(Character.id == timeline.main_character_id).first()
-            if character:
-                main_character = {
-                    "id": character.id,
-                    "avatar_url": character.avatar_url,
-                    "persona": character.persona,
-                    "created_at": character.created_at
-                }
+        character = timeline.main_character
+        if character:
+            main_character = {
+                "id": character.id,
+                "avatar_url": character.avatar_url,
+                "name": character.name,
+                "persona": character.persona,
+                "created_at": character.created_at
+            }
         
         # Create response with timeline and main character
         timeline_dict = {
@@ -405,7 +455,22 @@ async def filter_timelines(
         }
         result.append(timeline_dict)
     
-    return result
+    return json_response(result, response)
+
+@router.get('/timelines/facets', response_model=CatalogFacetsModel)
+async def get_timeline_facets(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Timeline counts per category and story counts per story type, cached until the catalog changes"""
+    return response_cache.serve(request, response, lambda: get_catalog_facets(db))
+
+@router.get('/catalog/metrics')
+async def get_catalog_metrics(current_user: User = Depends(get_admin_user)):
+    """Catalog cache hit/miss counters and snapshot size"""
+    return {**catalog_cache.metrics(), "response_cache": response_cache.metrics()}
 
 @router.patch('/timeline/update/{timeline_id}')
 async def update_timeline(
@@ -419,8 +484,7 @@ async def update_timeline(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    timeline_query = db.query(Timeline).filter(Timeline.id == timeline_id)
-    timeline_obj = timeline_query.first()
+    timeline_obj = db.query(Timeline).filter(Timeline.id == timeline_id).first()
     
     if not timeline_obj:
         raise HTTPException(
@@ -468,7 +532,9 @@ async def update_timeline(
         )
     
     try:
-        timeline_query.update(update_data, synchronize_session=False)
+        # Set on the instance, not Query.update(), so assigning categories also rewrites timeline_categories
+        for key, value in update_data.items():
+            setattr(timeline_obj, key, value)
         db.commit()
         
         # Delete old thumbnail if it was replaced
@@ -503,6 +569,8 @@ async def delete_timeline(
     stories = db.query(Story).filter(Story.timeline_id == timeline_id).all()
     story_files = [(story.thumbnail_url, story.video_url) for story in stories]
     
+    # The stories' views go with them, so adjust the counters first
+    record_stories_removed(db, [story.id for story in stories])
     db.delete(timeline_obj)
     try:
         db.commit()
@@ -616,26 +684,33 @@ async def create_story(
         print("Other timestamp error:", str(e))
         raise HTTPException(status_code=400, detail=f"Timestamp validation error: {str(e)}")
     
-    # Save files
+    # Reject oversized files before either of them is stored
+    ensure_upload_size(thumbnail_file, MAX_IMAGE_UPLOAD_BYTES)
+    ensure_upload_size(video_file, MAX_VIDEO_UPLOAD_BYTES)
+    
+    # Save files; the video is kept as uploaded and transcoded in the background
     thumbnail_url = await save_image(thumbnail_file)
-    video_url = await save_video(video_file)
+    video_source = await save_pending_video(video_file)
     
-    # Create Story instance
+    # Create Story instance, it gets its video_url once the video is transcoded
     new_story = Story(
         title=validated_data.title,
         desc=validated_data.desc,
         thumbnail_url=thumbnail_url,
-        video_url=video_url,
         timeline_id=current_timeline.id,
         story_date=validated_data.story_date,
         story_type=validated_data.story_type
     )
     
     db.add(new_story)
+    record_story_added(db, current_timeline.id)
     try:
         db.commit()
         db.refresh(new_story)
         
+        # Queue the video for transcoding
+        video_job = create_video_job(db, new_story.id, video_source) if video_source else None
+        
         # Add timestamps - create them one by one for better debugging
         for ts in timestamps_data:
             timestamp = Timestamp(
@@ -646,8 +721,10 @@ async def create_story(
             print(f"Creating timestamp: {timestamp.time_sec}, {timestamp.label} for story {timestamp.story_id}")
             db.add(timestamp)
         
-        # Commit the timestamps
+        # Commit the timestamps and the video job
         db.commit()
+        if video_job:
+            transcode_pool.enqueue(video_job.id)
         
         # Verify timestamps were created
         created_timestamps = db.query(Timestamp).filter(Timestamp.story_id == new_story.id).all()
@@ -664,9 +741,10 @@ async def create_story(
                 "timeline_id": new_story.timeline_id,
                 "story_date": new_story.story_date,
                 "story_type": new_story.story_type,
-                "views": new_story.views,
-                "likes": new_story.likes,
-                "created_at": new_story.created_at
+                "views": story_counters.value(new_story, 'views'),
+                "likes": story_counters.value(new_story, 'likes'),
+                "created_at": new_story.created_at,
+                "video_status": "processing" if video_job else None
             },
             "timestamps": [
                 {
@@ -683,47 +761,68 @@ async def create_story(
         # Delete uploaded files if there was an error
         if thumbnail_url:
             delete_file(thumbnail_url)
-        if video_url:
-            delete_file(video_url)
+        if video_source:
+            delete_file(video_source)
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get('/story/{story_id}')
-async def get_story(story_id: int, db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
-    story = db.query(Story).filter(Story.id == story_id).first()
-
-    if not story:
-        raise HTTPException(detail="Story not found", status_code=status.HTTP_404_NOT_FOUND)
-    # Increment the view count
-    story.views += 1
-    
-    # Track user's view of this story
-    user_story_view = db.query(UserStoryView).filter(
-        UserStoryView.user_id == current_user.id,
-        UserStoryView.story_id == story_id
-    ).first()
+async def _track_story_view(db: AsyncSession, story: Story, user_id: int):
+    """Record a user's view of a story and reward the first one; returns badge updates, if any"""
+    result = await db.execute(
+        select(UserStoryView).where(
+            UserStoryView.user_id == user_id,
+            UserStoryView.story_id == story.id
+        )
+    )
+    user_story_view = result.scalar_one_or_none()
     
     badge_updates = None
     if not user_story_view:
         # Create new view record
         user_story_view = UserStoryView(
-            user_id=current_user.id,
-            story_id=story_id,
+            user_id=user_id,
+            story_id=story.id,
             is_seen=True,
             viewed_at=datetime.utcnow()
         )
         db.add(user_story_view)
+        await db.execute(progress_increment(user_id, stories_completed=1))
+        if story.timeline_id:
+            await db.execute(timeline_progress_increment(user_id, story.timeline_id))
         
-        # Add points for first-time viewing a story (if points system is in use)
-        profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
-        if profile:
-            profile.points += 5  # 5 points for first time viewing a story
-        from utils.badge_utils import evaluate_badge_progress
-        badge_updates = evaluate_badge_progress(current_user.id, db)
+        # Add points for first-time viewing a story
+        award_points(db, user_id, 5, POINTS_STORY_VIEW, story.id)  # 5 points for first time viewing a story
+        from utils.badge_utils import evaluate_badge_progress, STORY_VIEW_METRICS
+        badge_updates = await db.run_sync(lambda session: evaluate_badge_progress(user_id, session, STORY_VIEW_METRICS))
     
-    db.commit()  # Commit the changes to the database
+    await db.commit()  # Commit the changes to the database
+    
+    # Increment the view count in the write-behind buffer rather than locking the story row
+    story_counters.increment(story.id, 'views')
+    return badge_updates
+
+@router.get('/story/{story_id}')
+async def get_story(
+    story_id: int,
+    track: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Get a story with its timestamps. Clients that report views through
+    POST /api/events/views pass track=false, which makes this a pure read.
+    """
+    catalog, story = await catalog_cache.lookup("stories_by_id", story_id)
+
+    if not story:
+        raise HTTPException(detail="Story not found", status_code=status.HTTP_404_NOT_FOUND)
+    
+    # Track user's view of this story
+    badge_updates = None
+    if track:
+        badge_updates = await _track_story_view(db, story, current_user.id)
     
-    # Get timestamps for this story
-    timestamps = db.query(Timestamp).filter(Timestamp.story_id == story_id).all()
+    timestamps = catalog.timestamps_by_story.get(story_id, [])
+    counts = catalog_cache.story_counts([story_id])[story_id]
     
     # Create a response dictionary with story and timestamps as structured data
     response = {
@@ -736,8 +835,8 @@ async def get_story(story_id: int, db: Session= Depends(get_db), current_user: U
             "timeline_id": story.timeline_id,
             "story_date": story.story_date,
             "story_type": story.story_type,
-            "views": story.views,
-            "likes": story.likes,
+            "views": counts["views"],
+            "likes": counts["likes"],
             "created_at": story.created_at,
             "is_seen": True  # Always true for the current story
         },
@@ -755,22 +854,59 @@ async def get_story(story_id: int, db: Session= Depends(get_db), current_user: U
         response['badge_updates'] = badge_updates
     return response
 
-@router.get('/list/stories')
-async def get_all_stories(db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
-    all_stories = db.query(Story).all()
+@router.get('/story/{story_id}/video/status', response_model=VideoStatusModel)
+async def get_story_video_status(
+    story_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Transcoding state of the story's latest video upload"""
+    story = db.query(Story.id, Story.video_url).filter(Story.id == story_id).first()
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+    
+    job = db.query(VideoJob).filter(VideoJob.story_id == story_id).order_by(VideoJob.id.desc()).first()
+    if not job:
+        # Videos stored before transcoding moved to the background
+        return {
+            "story_id": story_id,
+            "status": "ready" if story.video_url else "none",
+            "progress": 100 if story.video_url else 0,
+            "video_url": story.video_url
+        }
     
-    # Get all story views for the current user
-    user_story_views = db.query(UserStoryView).filter(
-        UserStoryView.user_id == current_user.id
-    ).all()
+    return {
+        "story_id": story_id,
+        "status": job.status,
+        "progress": job.progress,
+        "video_url": job.video_url or story.video_url,
+        "poster_url": job.poster_url,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+
+@router.get('/list/stories', response_model=List[StoryWithTimestampsModel])
+async def get_all_stories(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    db: Session= Depends(get_db),
+    current_user: User= Depends(get_current_user)
+):
+    catalog = catalog_cache.get()
+    all_stories, next_cursor = paginate_sorted(catalog.stories, after, limit)
+    set_next_cursor(response, next_cursor)
+    counts = catalog_cache.story_counts([story.id for story in all_stories])
     
     # Create a set of story IDs that the user has viewed
-    viewed_story_ids = {view.story_id for view in user_story_views}
+    viewed_story_ids = {
+        story_id for (story_id,) in db.query(UserStoryView.story_id).filter(UserStoryView.user_id == current_user.id)
+    }
     
     # Create a list of stories with their timestamps and view status
     stories_with_timestamps = []
     for story in all_stories:
-        timestamps = db.query(Timestamp).filter(Timestamp.story_id == story.id).all()
         stories_with_timestamps.append({
             "story": {
                 "id": story.id,
@@ -781,8 +917,8 @@ async def get_all_stories(db: Session= Depends(get_db), current_user: User= Depe
                 "timeline_id": story.timeline_id,
                 "story_date": story.story_date,
                 "story_type": story.story_type,
-                "views": story.views,
-                "likes": story.likes,
+                "views": counts[story.id]["views"],
+                "likes": counts[story.id]["likes"],
                 "created_at": story.created_at,
                 "is_seen": story.id in viewed_story_ids
             },
@@ -792,23 +928,30 @@ async def get_all_stories(db: Session= Depends(get_db), current_user: User= Depe
                     "story_id": ts.story_id,
                     "time_sec": ts.time_sec,
                     "label": ts.label
-                } for ts in timestamps
+                } for ts in catalog.timestamps_by_story.get(story.id, [])
             ]
         })
     
-    return stories_with_timestamps
+    return json_response(stories_with_timestamps, response)
 
-@router.get('/timeline/{timeline_id}/stories')
-async def get_stories_of_timeline(timeline_id: int, db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
-    stories = db.query(Story).filter(Story.timeline_id == timeline_id).all()
-    
-    # Get all story views for the current user
-    user_story_views = db.query(UserStoryView).filter(
-        UserStoryView.user_id == current_user.id
-    ).all()
+@router.get('/timeline/{timeline_id}/stories', response_model=List[StoryListItemModel])
+async def get_stories_of_timeline(timeline_id: int, request: Request, response: Response, db: Session= Depends(get_db), current_user: User= Depends(get_current_user)):
+    stories = catalog_cache.get().stories_by_timeline.get(timeline_id, [])
+    counts = catalog_cache.story_counts([story.id for story in stories])
+    
+    # Views and likes are part of the payload but not of any version, so they go into the ETag as values
+    not_modified = user_catalog_response(
+        request, response, db, current_user.id,
+        [(story_id, story_counts["views"], story_counts["likes"]) for story_id, story_counts in counts.items()],
+        use_last_modified=False
+    )
+    if not_modified:
+        return not_modified
     
     # Create a set of story IDs that the user has viewed
-    viewed_story_ids = {view.story_id for view in user_story_views}
+    viewed_story_ids = {
+        story_id for (story_id,) in db.query(UserStoryView.story_id).filter(UserStoryView.user_id == current_user.id)
+    }
     
     # Add is_seen status to each story
     stories_with_status = []
@@ -822,13 +965,13 @@ async def get_stories_of_timeline(timeline_id: int, db: Session= Depends(get_db)
             "timeline_id": story.timeline_id,
             "story_date": story.story_date,
             "story_type": story.story_type,
-            "views": story.views,
-            "likes": story.likes,
+            "views": counts[story.id]["views"],
+            "likes": counts[story.id]["likes"],
             "created_at": story.created_at,
             "is_seen": story.id in viewed_story_ids
         })
     
-    return stories_with_status
+    return json_response(stories_with_status, response)
 
 @router.patch('/story/update/{story_id}')
 async def update_story(
@@ -875,21 +1018,27 @@ async def update_story(
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
     
-    # Handle file updates
+    # Handle file updates, rejecting oversized files before either of them is stored
+    ensure_upload_size(thumbnail_file, MAX_IMAGE_UPLOAD_BYTES)
+    ensure_upload_size(video_file, MAX_VIDEO_UPLOAD_BYTES)
     old_thumbnail = None
-    old_video = None
+    video_job = None
     
     if thumbnail_file:
         old_thumbnail = story_obj.thumbnail_url
         update_data["thumbnail_url"] = await save_image(thumbnail_file)
         
     if video_file:
-        old_video = story_obj.video_url
-        update_data["video_url"] = await save_video(video_file)
+        # The current video stays until the new one is transcoded, then the worker swaps and deletes it
+        video_job = create_video_job(db, story_id, await save_pending_video(video_file))
     
     # Update story data if there's anything to update
     if update_data:
         story_query.update(update_data, synchronize_session=False)
+        
+        # Moving a story changes the totals of both timelines
+        if "timeline_id" in update_data and update_data["timeline_id"] != story_obj.timeline_id:
+            refresh_timeline_progress(db, [story_obj.timeline_id, update_data["timeline_id"]])
     
     # Handle timestamps separately if provided
     if timestamps_json is not None:
@@ -969,11 +1118,12 @@ async def update_story(
     try:
         db.commit()
         
+        if video_job:
+            transcode_pool.enqueue(video_job.id)
+        
         # Delete old files if they were replaced
         if old_thumbnail and thumbnail_file:
             delete_file(old_thumbnail)
-        if old_video and video_file:
-            delete_file(old_video)
             
         # Get the updated story with timestamps
         updated_story = db.query(Story).filter(Story.id == story_id).first()
@@ -990,9 +1140,10 @@ async def update_story(
                 "timeline_id": updated_story.timeline_id,
                 "story_date": updated_story.story_date,
                 "story_type": updated_story.story_type,
-                "views": updated_story.views,
-                "likes": updated_story.likes,
-                "created_at": updated_story.created_at
+                "views": story_counters.value(updated_story, 'views'),
+                "likes": story_counters.value(updated_story, 'likes'),
+                "created_at": updated_story.created_at,
+                "video_status": "processing" if video_job else None
             },
             "timestamps": [
                 {
@@ -1009,8 +1160,8 @@ async def update_story(
         # Delete new files if there was an error
         if thumbnail_file and "thumbnail_url" in update_data:
             delete_file(update_data["thumbnail_url"])
-        if video_file and "video_url" in update_data:
-            delete_file(update_data["video_url"])
+        if video_job:
+            delete_file(video_job.source_path)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/story/delete/{story_id}")
@@ -1029,9 +1180,22 @@ async def delete_story(
     # Store file paths before deleting the story
     thumbnail_url = story_obj.thumbnail_url
     video_url = story_obj.video_url
+    # Uploads still waiting for a transcoding worker; the jobs go with the story
+    pending_videos = [
+        source_path for (source_path,) in db.query(VideoJob.source_path).filter(
+            VideoJob.story_id == story_id, VideoJob.status == "processing", VideoJob.claimed_by.is_(None)
+        )
+    ]
+    
+    timeline_id = story_obj.timeline_id
     
+    # Views are removed by the database cascade, so adjust the counters first
+    record_stories_removed(db, [story_id])
     db.delete(story_obj)
     try:
+        # Flush so the cascaded view deletes are visible to the progress rebuild
+        db.flush()
+        refresh_timeline_progress(db, [timeline_id])
         db.commit()
         
         # Delete the files
@@ -1039,6 +1203,8 @@ async def delete_story(
             delete_file(thumbnail_url)
         if video_url:
             delete_file(video_url)
+        for source_path in pending_videos:
+            delete_file(source_path)
             
         return JSONResponse(
             {'detail': 'Story deleted successfully'},
@@ -1137,7 +1303,9 @@ async def get_quiz(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    quiz = db.query(Quiz).options(
+        selectinload(Quiz.questions).selectinload(Question.options)
+    ).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
@@ -1145,10 +1313,18 @@ async def get_quiz(
 
 @router.get('/list/quizzes', response_model=List[QuizResponseModel])
 async def get_all_quizzes(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    quizzes = db.query(Quiz).all()
+    # Questions and options are serialized with each quiz, load them in two queries
+    quizzes, next_cursor = paginate(
+        db.query(Quiz).options(selectinload(Quiz.questions).selectinload(Question.options)),
+        Quiz.created_at, Quiz.id, after, limit
+    )
+    set_next_cursor(response, next_cursor)
     return quizzes
 
 @router.patch('/quiz/{quiz_id}', response_model=QuizResponseModel)
@@ -1218,24 +1394,33 @@ async def delete_quiz(
 @router.post('/quiz/submit')
 async def submit_quiz(
     submission: QuizSubmissionModel,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     # Check if the quiz exists
-    quiz = db.query(Quiz).filter(Quiz.id == submission.quiz_id).first()
+    result = await db.execute(
+        select(Quiz).options(
+            selectinload(Quiz.questions).selectinload(Question.options)
+        ).where(Quiz.id == submission.quiz_id)
+    )
+    quiz = result.scalar_one_or_none()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
     # Get the user's profile to update points
-    profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    result = await db.execute(select(Profile).where(Profile.user_id == current_user.id))
+    profile = result.scalar_one_or_none()
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
     
     # Check if the user has already completed this quiz
-    quiz_attempt = db.query(QuizAttempt).filter(
-        QuizAttempt.user_id == current_user.id,
-        QuizAttempt.quiz_id == quiz.id
-    ).first()
+    result = await db.execute(
+        select(QuizAttempt).where(
+            QuizAttempt.user_id == current_user.id,
+            QuizAttempt.quiz_id == quiz.id
+        )
+    )
+    quiz_attempt = result.scalar_one_or_none()
     
     # If the quiz has already been completed, don't award points again
     if quiz_attempt and quiz_attempt.completed:
@@ -1245,7 +1430,7 @@ async def submit_quiz(
             "correct_answers": 0,
             "points_earned": 0,
             "completion_bonus": 0,
-            "new_total_points": profile.points
+            "new_total_points": await get_points_balance_async(current_user.id, db)
         }
     
     try:
@@ -1253,18 +1438,18 @@ async def submit_quiz(
         correct_answers = 0
         total_questions = len(quiz.questions)
         
+        # Questions and options were loaded with the quiz
+        questions_by_id = {question.id: question for question in quiz.questions}
+        
         # Process each answer
         for answer in submission.answers:
             # Get the question
-            question = db.query(Question).filter(Question.id == answer.question_id).first()
-            if not question or question.quiz_id != quiz.id:
+            question = questions_by_id.get(answer.question_id)
+            if not question:
                 raise HTTPException(status_code=400, detail=f"Invalid question ID: {answer.question_id}")
             
             # Check if the selected option is correct
-            selected_option = db.query(Option).filter(
-                Option.id == answer.selected_option_id,
-                Option.question_id == answer.question_id
-            ).first()
+            selected_option = next((option for option in question.options if option.id == answer.selected_option_id), None)
             
             if not selected_option:
                 raise HTTPException(status_code=400, detail=f"Invalid option ID: {answer.selected_option_id}")
@@ -1278,8 +1463,8 @@ async def submit_quiz(
         completion_bonus = 25 if len(submission.answers) == total_questions else 0  # 25 points for completing the quiz
         total_points_earned = correct_answer_points + completion_bonus
         
-        # Update user's profile points
-        profile.points += total_points_earned
+        # Record the points in the ledger
+        award_points(db, current_user.id, total_points_earned, POINTS_QUIZ, quiz.id)
         
         # Update or create quiz attempt record
         if not quiz_attempt:
@@ -1295,17 +1480,18 @@ async def submit_quiz(
             quiz_attempt.completed = True
             quiz_attempt.score = total_points_earned
             quiz_attempt.completed_at = datetime.utcnow()
+        await db.execute(progress_increment(current_user.id, quizzes_completed=1))
         
-        from utils.badge_utils import evaluate_badge_progress
-        badge_updates = evaluate_badge_progress(current_user.id, db)
-        db.commit()
+        from utils.badge_utils import evaluate_badge_progress, QUIZ_METRICS
+        badge_updates = await db.run_sync(lambda session: evaluate_badge_progress(current_user.id, session, QUIZ_METRICS))
+        await db.commit()
         
         response = {
             "total_questions": total_questions,
             "correct_answers": correct_answers,
             "points_earned": total_points_earned,
             "completion_bonus": completion_bonus,
-            "new_total_points": profile.points
+            "new_total_points": await get_points_balance_async(current_user.id, db)
         }
         
         # Add badge updates if there are any newly earned badges
@@ -1314,18 +1500,23 @@ async def submit_quiz(
         
         return response
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get('/user/quiz-history', response_model=list[QuizAttemptResponseModel])
 async def get_user_quiz_history(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get the quiz history for the current user"""
-    quiz_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.user_id == current_user.id
-    ).all()
+    quiz_attempts, next_cursor = paginate(
+        db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id),
+        QuizAttempt.created_at, QuizAttempt.id, after, limit
+    )
+    set_next_cursor(response, next_cursor)
     
     return quiz_attempts
 
@@ -1346,10 +1537,35 @@ async def get_user_points(
     ).count()
     
     return {
-        "points": profile.points,
+        "points": get_points_balance(current_user.id, db),
         "completed_quizzes": completed_quizzes
     }
 
+@router.get('/user/timeline-progress')
+async def get_user_timeline_progress(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get how far the current user is through each timeline they've started"""
+    rows = db.query(UserTimelineProgress, Timeline).join(
+        Timeline, Timeline.id == UserTimelineProgress.timeline_id
+    ).filter(
+        UserTimelineProgress.user_id == current_user.id
+    ).order_by(UserTimelineProgress.completed_at.is_(None), desc(UserTimelineProgress.completed_at)).all()
+    
+    return [
+        {
+            "timeline_id": timeline.id,
+            "title": timeline.title,
+            "thumbnail_url": timeline.thumbnail_url,
+            "categories": timeline.categories,
+            "stories_seen": progress.stories_seen,
+            "stories_total": progress.stories_total,
+            "completed": progress.completed_at is not None,
+            "completed_at": progress.completed_at
+        } for progress, timeline in rows
+    ]
+
 @router.post('/story/{story_id}/like')
 async def like_story(
     story_id: int, 
@@ -1371,16 +1587,16 @@ async def like_story(
     if existing_like:
         # Unlike: remove the like record and decrement story likes
         db.delete(existing_like)
-        story.likes = max(0, story.likes - 1)  # Ensure likes doesn't go below 0
         db.commit()
-        return {"likes": story.likes, "liked": False}
+        story_counters.increment(story_id, 'likes', -1)
+        return {"likes": story_counters.value(story, 'likes'), "liked": False}
     else:
         # Like: create new like record and increment story likes
         new_like = UserStoryLike(user_id=current_user.id, story_id=story_id)
         db.add(new_like)
-        story.likes += 1
         db.commit()
-        return {"likes": story.likes, "liked": True}
+        story_counters.increment(story_id, 'likes')
+        return {"likes": story_counters.value(story, 'likes'), "liked": True}
 
 @router.get('/story/{story_id}/liked')
 async def check_story_liked(
@@ -1400,26 +1616,41 @@ async def check_story_liked(
         UserStoryLike.story_id == story_id
     ).first() is not None
     
-    return {"story_id": story_id, "likes": story.likes, "liked": liked}
+    return {"story_id": story_id, "likes": story_counters.value(story, 'likes'), "liked": liked}
 
-@router.get('/list/characters')
-async def get_characters(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get('/list/characters', response_model=List[CharacterResponseModel])
+async def get_characters(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """Get a list of all characters for selection in timelines"""
-    characters = db.query(Character).all()
+    not_modified = catalog_response(request, response)
+    if not_modified:
+        return not_modified
     
-    # Format response
-    response = []
-    for character in characters:
-        character_data = {
-            "id": character.id,
-            "name": character.name,
-            "persona": character.persona,
-            "avatar_url": character.avatar_url,
-            "created_at": character.created_at
-        }
-        response.append(character_data)
+    def build():
+        characters, next_cursor = paginate_sorted(catalog_cache.get().characters, after, limit)
+        set_next_cursor(response, next_cursor)
+        
+        # Format response
+        characters_data = [
+            {
+                "id": character.id,
+                "name": character.name,
+                "persona": character.persona,
+                "avatar_url": character.avatar_url,
+                "created_at": character.created_at
+            }
+            for character in characters
+        ]
+        return characters_data
     
-    return response
+    # Not user specific, so the serialized page is shared by everyone until the catalog changes
+    return response_cache.serve(request, response, build)
 
 @router.post('/character/create', response_model=CharacterResponseModel)
 async def create_character(
@@ -1468,7 +1699,7 @@ async def get_character(
     current_user: User = Depends(get_current_user)
 ):
     """Get character details"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    _, character = await catalog_cache.lookup("characters_by_id", character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
@@ -1624,16 +1855,21 @@ async def check_timeline_bookmarked(
     
     return {"timeline_id": timeline_id, "bookmarked": bookmark is not None}
 
-@router.get('/user/bookmarked-timelines')
+@router.get('/user/bookmarked-timelines', response_model=List[BookmarkedTimelineModel])
 async def get_bookmarked_timelines(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all timelines bookmarked by the current user"""
-    # Get all bookmarked timeline IDs for the user
-    bookmarks = db.query(UserTimelineBookmark).filter(
-        UserTimelineBookmark.user_id == current_user.id
-    ).all()
+    """Get all timelines bookmarked by the current user, most recently bookmarked first"""
+    # Get the user's bookmarks, one page at a time when a limit or cursor is given
+    bookmarks, next_cursor = paginate(
+        db.query(UserTimelineBookmark).filter(UserTimelineBookmark.user_id == current_user.id),
+        UserTimelineBookmark.bookmarked_at, UserTimelineBookmark.id, after, limit, descending=True
+    )
+    set_next_cursor(response, next_cursor)
     
     # Create a list of bookmarked timeline IDs
     bookmarked_timeline_ids = [bookmark.timeline_id for bookmark in bookmarks]
@@ -1641,37 +1877,40 @@ async def get_bookmarked_timelines(
     if not bookmarked_timeline_ids:
         return []
     
-    # Get the timeline details for bookmarked timelines
-    bookmarked_timelines = db.query(Timeline).filter(
-        Timeline.id.in_(bookmarked_timeline_ids)
-    ).all()
-    
-    # Get all timeline views for the current user
-    user_timeline_views = db.query(UserTimelineView).filter(
-        UserTimelineView.user_id == current_user.id
-    ).all()
+    # Get the timeline details for bookmarked timelines, with their main characters
+    timelines_by_id = {
+        timeline.id: timeline
+        for timeline in db.query(Timeline).options(selectinload(Timeline.main_character)).filter(
+            Timeline.id.in_(bookmarked_timeline_ids)
+        )
+    }
     
     # Create a set of viewed timeline IDs for efficient lookup
-    viewed_timeline_ids = {view.timeline_id for view in user_timeline_views}
+    viewed_timeline_ids = {
+        timeline_id for (timeline_id,) in db.query(UserTimelineView.timeline_id).filter(
+            UserTimelineView.user_id == current_user.id,
+            UserTimelineView.timeline_id.in_(bookmarked_timeline_ids)
+        )
+    }
     
-    # Add viewed status to each timeline
+    # Bookmarks are already ordered most recent first
     result = []
-    for timeline in bookmarked_timelines:
+    for bookmark in bookmarks:
+        timeline = timelines_by_id.get(bookmark.timeline_id)
+        if not timeline:
+            continue
+        
         # Get main character info if exists
         main_character = None
-        if timeline.main_character_id:
-            character = db.query(Character).filter(Character.id == timeline.main_character_id).first()
-            if character:
-                main_character = {
-                    "id": character.id,
-                    "avatar_url": character.avatar_url,
-                    "name": character.name,
-                    "persona": character.persona,
-                    "created_at": character.created_at
-                }
-                
-        # Find the bookmark timestamp
-        bookmark = next((b for b in bookmarks if b.timeline_id == timeline.id), None)
+        character = timeline.main_character
+        if character:
+            main_character = {
+                "id": character.id,
+                "avatar_url": character.avatar_url,
+                "name": character.name,
+                "persona": character.persona,
+                "created_at": character.created_at
+            }
         
         result.append({
             "id": timeline.id,
@@ -1683,10 +1922,7 @@ async def get_bookmarked_timelines(
             "main_character": main_character,
             "categories": timeline.categories,
             "is_seen": timeline.id in viewed_timeline_ids,
-            "bookmarked_at": bookmark.bookmarked_at if bookmark else None
+            "bookmarked_at": bookmark.bookmarked_at
         })
     
-    # Sort by most recently bookmarked
-    result.sort(key=lambda x: x.get("bookmarked_at", datetime.min), reverse=True)
-    
-    return result
\ No newline at end of file
+    return json_response(result, response)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, status, UploadFile, File, Form
-from db.models import get_db, User, Profile, QuizAttempt, UserFollow, VerificationOTP
-from sqlalchemy.orm import Session
+from db.models import get_db, User, Profile, QuizAttempt, UserFollow, VerificationOTP, UserNotification, Community, CommunityMember
+from sqlalchemy.orm import Session, joinedload
 from schemas.users import (
     UserCreateModel, 
     LoginModel, 
@@ -17,11 +17,16 @@ from schemas.users import (
 from fastapi.responses import JSONResponse
 from db.models import pwd_context, Feedback
 from utils.auth import get_current_user, create_session, end_session
+from utils.identity_cache import invalidate_user, record_identity_change
+from utils.badge_utils import get_user_badges
+from utils.rank_service import rank_service
+from utils.points import get_points_balance
 from utils.file_handler import save_image, delete_file
 from utils.email_sender import generate_otp, send_verification_email, send_password_reset_email
+import asyncio
 import json
 from datetime import datetime, date, timedelta
-from sqlalchemy import desc
+from sqlalchemy import desc, select, func
 from schemas.users import FeedbackCreateModel
 
 router = APIRouter(prefix="/api/auth")
@@ -181,6 +186,8 @@ async def verify_email(data: EmailVerificationRequest, db: Session = Depends(get
     
     try:
         db.commit()
+        if user:
+            invalidate_user(user.id)
         return {"message": "Email verified successfully"}
     except Exception as e:
         db.rollback()
@@ -191,8 +198,13 @@ async def delete_user(current_user: User = Depends(get_current_user), db: Sessio
     my_user = db.query(User).filter(User.id == current_user.id).first()
     if not my_user:
         return HTTPException(detail="User not found, Unexpected error", status_code=status.HTTP_404_NOT_FOUND)
+    # The user's memberships go with them, keep the denormalized member counts in step
+    db.query(Community).filter(
+        Community.id.in_(select(CommunityMember.community_id).where(CommunityMember.user_id == my_user.id))
+    ).update({Community.member_count: Community.member_count - 1}, synchronize_session=False)
     db.delete(my_user)
     db.commit()
+    invalidate_user(current_user.id)
     return JSONResponse({'detail': "User deleted"}, status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/login")
@@ -281,10 +293,13 @@ async def update_profile(
 
     # Update the profile
     db.query(Profile).filter(Profile.user_id == current_user.id).update(update_data)
+    # Bulk updates skip the ORM hooks that tell other processes to drop the snapshot
+    record_identity_change(db, [current_user.id])
     
     try:
         db.commit()
         db.refresh(profile)
+        invalidate_user(current_user.id)
         
         # Delete old avatar if it was replaced
         if old_avatar and avatar_file:
@@ -318,6 +333,7 @@ async def update_user_profile(
 
     db.commit()
     db.refresh(my_user)
+    invalidate_user(my_user.id)
 
     return {"message": "Email updated successfully", "email": my_user.email}
 
@@ -355,9 +371,58 @@ async def change_password(
     
     db.commit()
     db.refresh(my_user)
+    invalidate_user(my_user.id)
 
     return {"message": "Password changed successfully."}
 
+def get_todays_streak_bonus(user_id: int, db: Session) -> int:
+    """Points from today's login bonus notification, until it has been read"""
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    notification = db.query(UserNotification).filter(
+        UserNotification.user_id == user_id,
+        UserNotification.notification_type.in_(["daily_login", "streak_milestone"]),
+        UserNotification.is_read == False,
+        UserNotification.created_at >= today_start
+    ).order_by(desc(UserNotification.created_at)).first()
+    
+    if not notification or not notification.data:
+        return 0
+    return notification.data.get("points", 0)
+
+def _follow_entry(profile: Profile, follow: UserFollow) -> dict:
+    return {
+        "id": profile.id,
+        "nickname": profile.nickname,
+        "avatar_url": profile.avatar_url,
+        "user_id": profile.user_id,
+        "follow_date": follow.created_at
+    }
+
+def _follow_summary(db: Session, profile_id: int) -> dict:
+    """Follower/following counts and the 5 most recent of each, with their profiles joined in"""
+    followers_count, following_count = db.query(
+        select(func.count(UserFollow.id)).where(UserFollow.followed_id == profile_id).scalar_subquery(),
+        select(func.count(UserFollow.id)).where(UserFollow.follower_id == profile_id).scalar_subquery()
+    ).one()
+    
+    recent_followers = db.query(UserFollow).options(joinedload(UserFollow.follower)).filter(
+        UserFollow.followed_id == profile_id
+    ).order_by(desc(UserFollow.created_at)).limit(5).all()
+    recent_following = db.query(UserFollow).options(joinedload(UserFollow.followed)).filter(
+        UserFollow.follower_id == profile_id
+    ).order_by(desc(UserFollow.created_at)).limit(5).all()
+    
+    return {
+        "followers": {
+            "count": followers_count,
+            "recent": [_follow_entry(follow.follower, follow) for follow in recent_followers]
+        },
+        "following": {
+            "count": following_count,
+            "recent": [_follow_entry(follow.followed, follow) for follow in recent_following]
+        }
+    }
+
 @router.get("/user/me")
 async def get_profile(
     request: Request,
@@ -372,14 +437,15 @@ async def get_profile(
     # Ensure user has default badges
     from utils.badge_utils import ensure_default_badges
     ensure_default_badges(current_user.id, db)
+    badges = get_user_badges(current_user.id, db)
     
-    # Calculate user rank
-    higher_ranked_count = db.query(Profile).filter(Profile.points > profile.points).count()
-    user_rank = higher_ranked_count + 1
-    
-    # Get total number of users for percentile calculation
-    total_users = db.query(Profile).count()
-    percentile = round((1 - (user_rank / total_users)) * 100) if total_users > 0 else 0
+    # Calculate user rank and percentile from the leaderboard index
+    points = get_points_balance(profile.user_id, db)
+    await asyncio.to_thread(rank_service.refresh_if_stale)
+    rank_info = rank_service.get_rank_info(profile.user_id, points)
+    user_rank = rank_info["rank"]
+    total_users = rank_info["total_users"]
+    percentile = rank_info["percentile"]
     
     # Get completed quizzes count
     completed_quizzes = db.query(QuizAttempt).filter(
@@ -391,57 +457,14 @@ async def get_profile(
     next_milestone = 7 if profile.current_login_streak < 7 else 30
     days_to_milestone = next_milestone - (profile.current_login_streak % next_milestone)
     
-    # Get streak bonus information from the session
-    streak_bonus = request.session.get("streak_bonus", 0)
-    
-    # Clear the streak bonus from the session after reading it
-    if streak_bonus:
-        request.session.pop("streak_bonus", None)
-    
-    badge_updates = request.session.get("badge_updates", None)
-    if badge_updates:
-        request.session.pop("badge_updates", None)
+    # Get today's streak bonus from the unread login notification
+    streak_bonus = get_todays_streak_bonus(current_user.id, db)
     
-    # Get followers and following counts
-    followers_count = db.query(UserFollow).filter(UserFollow.followed_id == profile.id).count()
-    following_count = db.query(UserFollow).filter(UserFollow.follower_id == profile.id).count()
+    # Get followers and following counts, and the 5 most recent of each
+    follow_summary = _follow_summary(db, profile.id)
     
-    # Get followers and following (limited to 5 most recent)
-    recent_followers = db.query(UserFollow).filter(UserFollow.followed_id == profile.id).order_by(desc(UserFollow.created_at)).limit(5).all()
-    recent_following = db.query(UserFollow).filter(UserFollow.follower_id == profile.id).order_by(desc(UserFollow.created_at)).limit(5).all()
-    
-    # Check if current user is following this profile
+    # This is the user's own profile, which they can't follow
     is_following = False
-    if current_user.id != id:  # Don't check if viewing own profile
-        current_user_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
-        if current_user_profile:
-            is_following = db.query(UserFollow).filter(
-                UserFollow.follower_id == current_user_profile.id,
-                UserFollow.followed_id == profile.id
-            ).first() is not None
-    
-    # Format followers and following data
-    followers_data = []
-    for follow in recent_followers:
-        follower_profile = follow.follower
-        followers_data.append({
-            "id": follower_profile.id,
-            "nickname": follower_profile.nickname,
-            "avatar_url": follower_profile.avatar_url,
-            "user_id": follower_profile.user_id,
-            "follow_date": follow.created_at
-        })
-    
-    following_data = []
-    for follow in recent_following:
-        followed_profile = follow.followed
-        following_data.append({
-            "id": followed_profile.id,
-            "nickname": followed_profile.nickname,
-            "avatar_url": followed_profile.avatar_url,
-            "user_id": followed_profile.user_id,
-            "follow_date": follow.created_at
-        })
     
     return {
         "user": {
@@ -453,25 +476,19 @@ async def get_profile(
         },
         "profile": {
             "id": profile.id,
-            "badges": profile.badges,
+            "badges": badges,
             "is_premium": profile.is_premium,
             "nickname": profile.nickname,
             "avatar_url": profile.avatar_url,
-            "points": profile.points,
+            "points": points,
             "referral_code": profile.referral_code,
             "total_referrals": profile.total_referrals,
             "language_preference": profile.language_preference,
             "pronouns": profile.pronouns,
             "location": profile.location,
             "personalization_questions": profile.personalization_questions,
-            "followers": {
-                "count": followers_count,
-                "recent": followers_data
-            },
-            "following": {
-                "count": following_count,
-                "recent": following_data
-            },
+            "followers": follow_summary["followers"],
+            "following": follow_summary["following"],
             "is_following": is_following
         },
         "stats": {
@@ -488,7 +505,8 @@ async def get_profile(
     }
 
 
-@router.get("/user/{id}")
+# :int keeps this from shadowing /user/streak
+@router.get("/user/{id:int}")
 async def get_profile(
     request: Request,
     id: int,
@@ -500,13 +518,13 @@ async def get_profile(
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    # Calculate user rank
-    higher_ranked_count = db.query(Profile).filter(Profile.points > profile.points).count()
-    user_rank = higher_ranked_count + 1
-    
-    # Get total number of users for percentile calculation
-    total_users = db.query(Profile).count()
-    percentile = round((1 - (user_rank / total_users)) * 100) if total_users > 0 else 0
+    # Calculate user rank and percentile from the leaderboard index
+    points = get_points_balance(profile.user_id, db)
+    await asyncio.to_thread(rank_service.refresh_if_stale)
+    rank_info = rank_service.get_rank_info(profile.user_id, points)
+    user_rank = rank_info["rank"]
+    total_users = rank_info["total_users"]
+    percentile = rank_info["percentile"]
     
     # Get completed quizzes count
     completed_quizzes = db.query(QuizAttempt).filter(
@@ -518,54 +536,22 @@ async def get_profile(
     next_milestone = 7 if profile.current_login_streak < 7 else 30
     days_to_milestone = next_milestone - (profile.current_login_streak % next_milestone)
     
-    # Get streak bonus information from the session
-    streak_bonus = request.session.get("streak_bonus", 0)
-    
-    # Clear the streak bonus from the session after reading it
-    if streak_bonus:
-        request.session.pop("streak_bonus", None)
+    # Get today's streak bonus from the unread login notification
+    streak_bonus = get_todays_streak_bonus(current_user.id, db)
     
-    # Get followers and following counts
-    followers_count = db.query(UserFollow).filter(UserFollow.followed_id == profile.id).count()
-    following_count = db.query(UserFollow).filter(UserFollow.follower_id == profile.id).count()
-    
-    # Get followers and following (limited to 5 most recent)
-    recent_followers = db.query(UserFollow).filter(UserFollow.followed_id == profile.id).order_by(desc(UserFollow.created_at)).limit(5).all()
-    recent_following = db.query(UserFollow).filter(UserFollow.follower_id == profile.id).order_by(desc(UserFollow.created_at)).limit(5).all()
+    # Get followers and following counts, and the 5 most recent of each
+    follow_summary = _follow_summary(db, profile.id)
     
     # Check if current user is following this profile
     is_following = False
     if current_user.id != id:  # Don't check if viewing own profile
-        current_user_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+        current_user_profile = current_user.profile
         if current_user_profile:
             is_following = db.query(UserFollow).filter(
                 UserFollow.follower_id == current_user_profile.id,
                 UserFollow.followed_id == profile.id
             ).first() is not None
     
-    # Format followers and following data
-    followers_data = []
-    for follow in recent_followers:
-        follower_profile = follow.follower
-        followers_data.append({
-            "id": follower_profile.id,
-            "nickname": follower_profile.nickname,
-            "avatar_url": follower_profile.avatar_url,
-            "user_id": follower_profile.user_id,
-            "follow_date": follow.created_at
-        })
-    
-    following_data = []
-    for follow in recent_following:
-        followed_profile = follow.followed
-        following_data.append({
-            "id": followed_profile.id,
-            "nickname": followed_profile.nickname,
-            "avatar_url": followed_profile.avatar_url,
-            "user_id": followed_profile.user_id,
-            "follow_date": follow.created_at
-        })
-    
     return {
         "user": {
             "id": current_user.id,
@@ -576,24 +562,18 @@ async def get_profile(
         "profile": {
             "id": profile.id,
             "nickname": profile.nickname,
-            "badges": profile.badges,
+            "badges": get_user_badges(profile.user_id, db),
             "is_premium": profile.is_premium,
             "avatar_url": profile.avatar_url,
-            "points": profile.points,
+            "points": points,
             "referral_code": profile.referral_code,
             "total_referrals": profile.total_referrals,
             "language_preference": profile.language_preference,
             "pronouns": profile.pronouns,
             "location": profile.location,
             "personalization_questions": profile.personalization_questions,
-            "followers": {
-                "count": followers_count,
-                "recent": followers_data
-            },
-            "following": {
-                "count": following_count,
-                "recent": following_data
-            },
+            "followers": follow_summary["followers"],
+            "following": follow_summary["following"],
             "is_following": is_following
         },
         "stats": {
@@ -624,8 +604,8 @@ async def get_user_streak(
     next_milestone = 7 if profile.current_login_streak < 7 else 30
     days_to_milestone = next_milestone - (profile.current_login_streak % next_milestone)
     
-    # Get streak bonus information from the session
-    streak_bonus = request.session.get("streak_bonus", 0)
+    # Get today's streak bonus from the unread login notification
+    streak_bonus = get_todays_streak_bonus(current_user.id, db)
     current_streak = profile.current_login_streak
     
     # Calculate streak status
@@ -636,10 +616,6 @@ async def get_user_streak(
     if profile.last_login_date:
         days_since_last_login = (date.today() - profile.last_login_date).days
     
-    # Clear the streak bonus from the session after reading it
-    if streak_bonus:
-        request.session.pop("streak_bonus", None)
-    
     return {
         "current_streak": current_streak,
         "max_streak": profile.max_login_streak,
@@ -660,37 +636,24 @@ async def get_notifications(
     """Get notifications for the current user, including streak updates"""
     notifications = []
     
-    # Check for streak bonus notification
-    streak_bonus = request.session.get("streak_bonus", 0)
-    current_streak = request.session.get("current_streak", 0)
+    # Notifications left by the background worker (streak bonuses, badge unlocks)
+    unread = db.query(UserNotification).filter(
+        UserNotification.user_id == current_user.id,
+        UserNotification.is_read == False
+    ).order_by(UserNotification.created_at).all()
+    
+    for notification in unread:
+        notifications.append({
+            "type": notification.notification_type,
+            "title": notification.title,
+            "message": notification.message,
+            **(notification.data or {})
+        })
+        # Mark as read so each notification is only delivered once
+        notification.is_read = True
     
-    if streak_bonus > 0:
-        # Create a notification for the streak bonus
-        if current_streak == 7:
-            notifications.append({
-                "type": "streak_milestone",
-                "title": "7-Day Streak Achieved!",
-                "message": f"You've logged in for 7 days in a row! You earned a bonus of {streak_bonus} points.",
-                "points": streak_bonus
-            })
-        elif current_streak == 30:
-            notifications.append({
-                "type": "streak_milestone",
-                "title": "30-Day Streak Achieved!",
-                "message": f"Amazing! You've logged in for 30 days in a row! You earned a bonus of {streak_bonus} points.",
-                "points": streak_bonus
-            })
-        else:
-            notifications.append({
-                "type": "daily_login",
-                "title": "Daily Login Bonus",
-                "message": f"Thanks for coming back! You earned {streak_bonus} points for logging in today.",
-                "points": streak_bonus
-            })
-        
-        # Clear the notifications from the session after reading them
-        request.session.pop("streak_bonus", None)
-        request.session.pop("current_streak", None)
+    if unread:
+        db.commit()
     
     # Get profile for streak information
     profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
@@ -749,7 +712,7 @@ async def follow_user(
 ):
     """Follow another user's profile"""
     # Get current user's profile
-    follower_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    follower_profile = current_user.profile
     if not follower_profile:
         raise HTTPException(status_code=404, detail="Your profile not found")
     
@@ -793,7 +756,7 @@ async def unfollow_user(
 ):
     """Unfollow a user"""
     # Get current user's profile
-    follower_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    follower_profile = current_user.profile
     if not follower_profile:
         raise HTTPException(status_code=404, detail="Your profile not found")
     
@@ -829,21 +792,12 @@ async def get_followers(
         raise HTTPException(status_code=404, detail="Profile not found")
     
     # Get followers with pagination
-    follows = db.query(UserFollow).filter(
+    follows = db.query(UserFollow).options(joinedload(UserFollow.follower)).filter(
         UserFollow.followed_id == profile_id
     ).order_by(desc(UserFollow.created_at)).offset(skip).limit(limit).all()
     
     # Format response
-    followers_data = []
-    for follow in follows:
-        follower_profile = follow.follower
-        followers_data.append({
-            "id": follower_profile.id,
-            "nickname": follower_profile.nickname,
-            "avatar_url": follower_profile.avatar_url,
-            "user_id": follower_profile.user_id,
-            "follow_date": follow.created_at
-        })
+    followers_data = [_follow_entry(follow.follower, follow) for follow in follows]
     
     # Get total count
     total_count = db.query(UserFollow).filter(UserFollow.followed_id == profile_id).count()
@@ -869,21 +823,12 @@ async def get_following(
         raise HTTPException(status_code=404, detail="Profile not found")
     
     # Get following with pagination
-    follows = db.query(UserFollow).filter(
+    follows = db.query(UserFollow).options(joinedload(UserFollow.followed)).filter(
         UserFollow.follower_id == profile_id
     ).order_by(desc(UserFollow.created_at)).offset(skip).limit(limit).all()
     
     # Format response
-    following_data = []
-    for follow in follows:
-        followed_profile = follow.followed
-        following_data.append({
-            "id": followed_profile.id,
-            "nickname": followed_profile.nickname,
-            "avatar_url": followed_profile.avatar_url,
-            "user_id": followed_profile.user_id,
-            "follow_date": follow.created_at
-        })
+    following_data = [_follow_entry(follow.followed, follow) for follow in follows]
     
     # Get total count
     total_count = db.query(UserFollow).filter(UserFollow.follower_id == profile_id).count()
@@ -917,21 +862,37 @@ async def search_users(
     # Using ILIKE for case-insensitive matching with wildcards
     search_pattern = f"%{query}%"
     
-    # Query users and join with their profiles
-    results = db.query(User, Profile).join(Profile, User.id == Profile.user_id).filter(
+    # Query users and join with their profiles; the window count gives the
+    # total number of matches in the same pass, without re-running the ILIKE filter
+    search_query = db.query(User, Profile).join(Profile, User.id == Profile.user_id).filter(
         (User.username.ilike(search_pattern)) | 
         (Profile.nickname.ilike(search_pattern))
-    ).offset(skip).limit(limit).all()
+    )
+    results = search_query.add_columns(func.count().over().label("total")).order_by(User.id).offset(skip).limit(limit).all()
+    
+    if results:
+        total_count = results[0].total
+    elif skip:
+        # Paged past the end, the window count has no row to ride on
+        total_count = search_query.count()
+    else:
+        total_count = 0
+    
+    # Check which of the results the current user follows, with one query
+    followed_profile_ids = set()
+    if current_user.profile and results:
+        followed_profile_ids = {
+            followed_id for (followed_id,) in db.query(UserFollow.followed_id).filter(
+                UserFollow.follower_id == current_user.profile.id,
+                UserFollow.followed_id.in_([profile.id for _, profile, _ in results])
+            )
+        }
     
     # Format the results
     users_data = []
-    for user, profile in results:
+    for user, profile, _ in results:
         if user.id != current_user.id:  # Exclude current user from results
-            # Check if current user is following this profile
-            is_following = db.query(UserFollow).filter(
-                UserFollow.follower_id == current_user.profile.id,
-                UserFollow.followed_id == profile.id
-            ).first() is not None
+            is_following = profile.id in followed_profile_ids
             
             users_data.append({
                 "user_id": user.id,
@@ -942,12 +903,6 @@ async def search_users(
                 "is_following": is_following
             })
     
-    # Count total matching results (without pagination)
-    total_count = db.query(User, Profile).join(Profile, User.id == Profile.user_id).filter(
-        (User.username.ilike(search_pattern)) | 
-        (Profile.nickname.ilike(search_pattern))
-    ).count()
-    
     return {
         "users": users_data,
         "total": total_count,
@@ -1055,6 +1010,7 @@ async def reset_password(data: PasswordResetVerification, db: Session = Depends(
     
     try:
         db.commit()
+        invalidate_user(user.id)
         return {"message": "Password reset successfully"}
     except Exception as e:
         db.rollback()
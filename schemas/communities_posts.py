@@ -180,3 +180,12 @@ class ReportWithDetails(Report):
     
     class Config:
         from_attributes = True
+
+class ReportQueueItem(BaseModel):
+    """All reports against one community or post, for the moderation queue"""
+    report_type: ReportTypeEnum
+    reported_item_id: int
+    reported_item_title: Optional[str] = None
+    report_count: int
+    first_reported_at: datetime
+    last_reported_at: datetime
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
+from typing import List, Optional
+
+MAX_VIEW_EVENTS_PER_BATCH = 500
+
+class ViewEventModel(BaseModel):
+    story_id: Optional[int] = None
+    timeline_id: Optional[int] = None
+    viewed_at: Optional[datetime] = None  # Client time of the view, defaults to when the batch arrives
+
+    @model_validator(mode='after')
+    def exactly_one_target(self):
+        if (self.story_id is None) == (self.timeline_id is None):
+            raise ValueError('Each view event needs exactly one of story_id or timeline_id')
+        return self
+
+class ViewEventsBatchModel(BaseModel):
+    events: List[ViewEventModel] = Field(..., min_length=1, max_length=MAX_VIEW_EVENTS_PER_BATCH)
+
+class ViewEventsResponseModel(BaseModel):
+    accepted: int
+    new_story_views: int
+    new_timeline_views: int
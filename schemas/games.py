@@ -60,4 +60,5 @@ class PaginatedGames(BaseModel):
     items: List[GameQuestion]
     page: int
     size: int
-    pages: int
\ No newline at end of file
+    pages: int
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -184,4 +184,78 @@ class CharacterResponseModel(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Response schemas for the catalog list endpoints
+class MainCharacterModel(BaseModel):
+    id: int
+    avatar_url: Optional[str] = None
+    name: Optional[str] = None
+    persona: str
+    created_at: Optional[datetime] = None
+
+class TimelineSummaryModel(BaseModel):
+    id: int
+    title: str
+    year_range: str
+    overview: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    main_character: Optional[MainCharacterModel] = None
+    categories: Optional[List[str]] = None
+
+class TimelineListItemModel(TimelineSummaryModel):
+    is_seen: bool
+    bookmarked: bool
+
+class BookmarkedTimelineModel(TimelineSummaryModel):
+    is_seen: bool
+    bookmarked_at: Optional[datetime] = None
+
+class StoryListItemModel(BaseModel):
+    id: int
+    title: str
+    desc: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    video_url: Optional[str] = None
+    timeline_id: Optional[int] = None
+    story_date: date
+    story_type: Optional[StoryType] = None
+    views: int
+    likes: int
+    created_at: Optional[datetime] = None
+    is_seen: bool
+
+class TimestampResponseModel(BaseModel):
+    id: int
+    story_id: int
+    time_sec: int
+    label: Optional[str] = None
+
+class StoryWithTimestampsModel(BaseModel):
+    story: StoryListItemModel
+    timestamps: List[TimestampResponseModel]
+
+class CategoryCountModel(BaseModel):
+    category: str
+    count: int
+
+class StoryTypeCountModel(BaseModel):
+    story_type: int
+    name: Optional[str] = None
+    count: int
+
+class CatalogFacetsModel(BaseModel):
+    catalog_version: int
+    categories: List[CategoryCountModel]
+    story_types: List[StoryTypeCountModel]
+
+class VideoStatusModel(BaseModel):
+    story_id: int
+    status: str  # none, processing, ready, failed
+    progress: int
+    video_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
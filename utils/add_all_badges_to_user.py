@@ -11,8 +11,8 @@ from datetime import datetime
 # Add the parent directory to the path so we can import from the project
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db.models import get_db, Profile
-from utils.badge_utils import ALL_BADGES
+from db.models import get_db, Profile, UserBadge
+from utils.badge_utils import ALL_BADGES, grant_badge, badge_to_dict
 from sqlalchemy.orm import Session
 
 def add_all_badges_to_user(user_id: int):
@@ -29,22 +29,15 @@ def add_all_badges_to_user(user_id: int):
         
         print(f"👤 Found user: {profile.nickname or 'No nickname'} (ID: {user_id})")
         
-        # Create all badges
+        # Grant all badges, reactivating any that were revoked
+        now = datetime.utcnow()
+        rows = {row.badge_id: row for row in db.query(UserBadge).filter(UserBadge.user_id == user_id)}
         all_badges = []
         for badge in ALL_BADGES:
-            earned_badge = {
-                'id': badge['id'],
-                'name': badge['name'],
-                'path': badge['path'],
-                'tier': badge['tier'],
-                'description': badge['description'],
-                'icon_url': badge['icon_url'],
-                'earned_at': datetime.utcnow().isoformat()
-            }
-            all_badges.append(earned_badge)
+            grant_badge(db, user_id, badge['id'], rows, now)
+            all_badges.append(badge_to_dict(badge['id'], now))
         
         # Update user's badges
-        profile.badges = all_badges
         db.commit()
         
         print(f"✅ Successfully added {len(all_badges)} badges to user {user_id}!")
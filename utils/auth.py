@@ -1,20 +1,17 @@
 from fastapi import Depends, HTTPException, status, Response, Request
-from sqlalchemy.orm import Session
-from db.models import User, Profile, get_db
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import User, Profile, UserNotification, get_db, get_async_db
+from utils.background import register_handler, enqueue_event
+from utils.points import award_points, POINTS_LOGIN_STREAK
+from utils.identity_cache import CurrentUser, identity_cache
 from typing import Optional
 from datetime import date, datetime, timedelta
 
 SECRET_KEY=  "enter-your-secret-key"
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
-    user_id = request.session.get("user_id")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+def _check_user(user: Optional[CurrentUser]) -> CurrentUser:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -24,68 +21,154 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> O
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account de-activated"
-        )   
+        )
+    return user
+
+def _get_session_user_id(request: Request) -> int:
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    return user_id
+
+def _streak_notification(streak: int, streak_bonus: int) -> UserNotification:
+    if streak == 7:
+        notification_type = "streak_milestone"
+        title = "7-Day Streak Achieved!"
+        message = f"You've logged in for 7 days in a row! You earned a bonus of {streak_bonus} points."
+    elif streak == 30:
+        notification_type = "streak_milestone"
+        title = "30-Day Streak Achieved!"
+        message = f"Amazing! You've logged in for 30 days in a row! You earned a bonus of {streak_bonus} points."
+    else:
+        notification_type = "daily_login"
+        title = "Daily Login Bonus"
+        message = f"Thanks for coming back! You earned {streak_bonus} points for logging in today."
+    return UserNotification(
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        data={"points": streak_bonus, "streak": streak}
+    )
+
+@register_handler("login")
+def process_login_event(db: Session, user_id: int):
+    """Update the login streak, award the streak bonus and evaluate badges for the user's first login of the day"""
+    # Lock the profile so concurrent login events for the same user apply once
+    profile = db.query(Profile).filter(Profile.user_id == user_id).with_for_update().first()
+    if not profile:
+        return
+    
+    today_date = date.today()
+    
+    # Already processed today (another session or worker got here first)
+    if profile.last_login_date == today_date:
+        return
     
-    # Update login streak - only check once per day
+    # Check if this is the first login ever
+    if profile.last_login_date is None:
+        profile.current_login_streak = 1
+        profile.max_login_streak = 1
+    else:
+        # Calculate days since last login
+        days_since_last_login = (today_date - profile.last_login_date).days
+        
+        # If it's a new day (not today) and they logged in yesterday, increment streak
+        if days_since_last_login == 1:
+            profile.current_login_streak += 1
+            # Update max streak if current streak is higher
+            if profile.current_login_streak > profile.max_login_streak:
+                profile.max_login_streak = profile.current_login_streak
+        # If they missed a day or more, reset streak to 1
+        elif days_since_last_login > 1:
+            profile.current_login_streak = 1
+    
+    # Update last login date to today
+    profile.last_login_date = today_date
+    
+    # Add bonus points for login streaks
+    streak_bonus = 0
+    # Bonus for 7-day streak
+    if profile.current_login_streak == 7:
+        streak_bonus += 50
+    # Bonus for 30-day streak
+    elif profile.current_login_streak == 30:
+        streak_bonus += 200
+    # Daily login bonus (always give this when we update the streak)
+    streak_bonus += 5
+    
+    # Record the streak bonus in the points ledger and leave a notification for /api/auth/notifications
+    award_points(db, user_id, streak_bonus, POINTS_LOGIN_STREAK)
+    notification = _streak_notification(profile.current_login_streak, streak_bonus)
+    notification.user_id = user_id
+    db.add(notification)
+    
+    from utils.badge_utils import evaluate_badge_progress, notify_badges_unlocked
+    badge_updates = evaluate_badge_progress(user_id, db)
+    notify_badges_unlocked(user_id, badge_updates['newly_earned_badges'], db)
+    # Save changes
+    db.commit()
+
+def _should_check_streak(request: Request) -> bool:
+    """Only check the streak once per day; marks today's check in the session"""
     last_streak_check = request.session.get("last_streak_check")
     today = date.today().isoformat()
     
     if last_streak_check != today:
         # Update the session to mark that we've checked the streak today
         request.session["last_streak_check"] = today
-        
-        # Get the user's profile
-        profile = db.query(Profile).filter(Profile.user_id == user.id).first()
-        if profile:
-            today_date = date.today()
-            
-            # Check if this is the first login ever
-            if profile.last_login_date is None:
-                profile.current_login_streak = 1
-                profile.max_login_streak = 1
-            else:
-                # Calculate days since last login
-                days_since_last_login = (today_date - profile.last_login_date).days
-                
-                # If it's a new day (not today) and they logged in yesterday, increment streak
-                if days_since_last_login == 1:
-                    profile.current_login_streak += 1
-                    # Update max streak if current streak is higher
-                    if profile.current_login_streak > profile.max_login_streak:
-                        profile.max_login_streak = profile.current_login_streak
-                # If they missed a day or more, reset streak to 1
-                elif days_since_last_login > 1:
-                    profile.current_login_streak = 1
-            
-            # Update last login date to today
-            profile.last_login_date = today_date
-            
-            # Add bonus points for login streaks
-            streak_bonus = 0
-            # Bonus for 7-day streak
-            if profile.current_login_streak == 7:
-                streak_bonus += 50
-            # Bonus for 30-day streak
-            elif profile.current_login_streak == 30:
-                streak_bonus += 200
-            # Daily login bonus (always give this when we update the streak)
-            streak_bonus += 5
-            
-            # Apply streak bonus
-            if streak_bonus > 0:
-                profile.points += streak_bonus
-                
-                # Store the bonus in the session so we can display it to the user
-                request.session["streak_bonus"] = streak_bonus
-                request.session["current_streak"] = profile.current_login_streak
-            from utils.badge_utils import evaluate_badge_progress
-            badge_updates = evaluate_badge_progress(user.id, db)
-            
-            if badge_updates and badge_updates['newly_earned_badges']:
-                request.session["badge_updates"] = badge_updates
-            # Save changes
-            db.commit()
-    return user
+        return True
+    return False
+
+def _get_cached_user(request: Request, user_id: int) -> Optional[CurrentUser]:
+    """Look up the snapshot on the request first, then in the process-level cache"""
+    current_user = getattr(request.state, "current_user", None)
+    if current_user is not None and current_user.id == user_id:
+        return current_user
+    return identity_cache.get(user_id)
+
+def _remember_user(user: Optional[User]) -> Optional[CurrentUser]:
+    if not user:
+        return None
+    current_user = CurrentUser.from_model(user)
+    identity_cache.set(current_user)
+    return current_user
+
+async def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[CurrentUser]:
+    user_id = _get_session_user_id(request)
+    
+    current_user = _get_cached_user(request, user_id)
+    if current_user is None:
+        # Load the user and profile together with one join
+        user = db.query(User).options(joinedload(User.profile)).filter(User.id == user_id).first()
+        current_user = _remember_user(user)
+    
+    current_user = _check_user(current_user)
+    request.state.current_user = current_user
+    
+    # Queue the daily streak update - only once per day per session
+    if _should_check_streak(request):
+        enqueue_event("login", user_id=current_user.id)
+    return current_user
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> Optional[CurrentUser]:
+    """Same as get_current_user, but on an AsyncSession so the lookup doesn't block the event loop"""
+    user_id = _get_session_user_id(request)
+    
+    current_user = _get_cached_user(request, user_id)
+    if current_user is None:
+        result = await db.execute(select(User).options(joinedload(User.profile)).where(User.id == user_id))
+        current_user = _remember_user(result.scalar_one_or_none())
+    
+    current_user = _check_user(current_user)
+    request.state.current_user = current_user
+    
+    # Queue the daily streak update - only once per day per session
+    if _should_check_streak(request):
+        enqueue_event("login", user_id=current_user.id)
+    return current_user
 
 def create_session(request: Request, user: User):
     request.session["user_id"] = user.id
@@ -94,7 +177,7 @@ def create_session(request: Request, user: User):
 def end_session(request: Request):
     request.session.clear()
 
-def get_admin_user(current_user: User = Depends(get_current_user)):
+def get_admin_user(current_user: CurrentUser = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
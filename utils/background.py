@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from db.models import SessionLocal
+
+# In-process event queue drained by a single worker task started with the app.
+# Handlers are plain sync functions taking (db, **payload); they run in a thread
+# so the existing Session-based helpers can be reused without blocking the loop.
+BACKGROUND_QUEUE_MAX_SIZE = 10000
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+_queue: Optional[asyncio.Queue] = None
+_worker_task: Optional[asyncio.Task] = None
+# Periodic jobs are sync functions taking (db), run every interval and once more on shutdown
+_periodic_jobs: List[Tuple[str, float, Callable[..., Any]]] = []
+_periodic_tasks: List[asyncio.Task] = []
+_periodic_wakeups: Dict[str, asyncio.Event] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def register_handler(event_type: str):
+    """Decorator registering the function that processes `event_type` events"""
+    def decorator(func: Callable[..., Any]):
+        _handlers[event_type] = func
+        return func
+    return decorator
+
+def register_periodic(name: str, interval_seconds: float):
+    """Decorator registering a job the worker runs every `interval_seconds`"""
+    def decorator(func: Callable[..., Any]):
+        _periodic_jobs.append((name, interval_seconds, func))
+        return func
+    return decorator
+
+def wake_periodic(name: str):
+    """Run a periodic job now instead of at its next interval; safe to call from any thread"""
+    wakeup = _periodic_wakeups.get(name)
+    if wakeup is None or _loop is None:
+        # No worker running, whoever needs the job's result runs it themselves
+        return
+    try:
+        _loop.call_soon_threadsafe(wakeup.set)
+    except RuntimeError:
+        # The loop closed while the worker was stopping
+        pass
+
+def run_periodic_job(name: str, func: Callable[..., Any]):
+    """Run one periodic job in its own session"""
+    db = SessionLocal()
+    try:
+        func(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Error running periodic job {name}: {e}")
+    finally:
+        db.close()
+
+def process_event(event_type: str, payload: Dict[str, Any]):
+    """Run the handler for one event in its own session"""
+    handler = _handlers.get(event_type)
+    if handler is None:
+        print(f"No background handler registered for event: {event_type}")
+        return
+
+    db = SessionLocal()
+    try:
+        handler(db, **payload)
+    except Exception as e:
+        db.rollback()
+        print(f"Error processing background event {event_type}: {e}")
+    finally:
+        db.close()
+
+def _process_off_queue(event_type: str, payload: Dict[str, Any]):
+    """Process an event the worker can't take, without blocking the event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Not on the event loop (scripts, threadpool handlers), inline only holds up the caller
+        process_event(event_type, payload)
+        return
+    loop.run_in_executor(None, process_event, event_type, payload)
+
+def enqueue_event(event_type: str, **payload):
+    """Queue an event for the background worker"""
+    if _queue is None or _worker_task is None or _worker_task.done():
+        # No worker running (scripts, app started without lifespan)
+        _process_off_queue(event_type, payload)
+        return
+
+    try:
+        _queue.put_nowait((event_type, payload))
+    except asyncio.QueueFull:
+        print(f"Background queue full, processing {event_type} event in a thread")
+        _process_off_queue(event_type, payload)
+
+async def _worker():
+    while True:
+        event_type, payload = await _queue.get()
+        try:
+            await asyncio.to_thread(process_event, event_type, payload)
+        finally:
+            _queue.task_done()
+
+async def _periodic(name: str, interval_seconds: float, func: Callable[..., Any]):
+    wakeup = _periodic_wakeups[name] = asyncio.Event()
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        await asyncio.to_thread(run_periodic_job, name, func)
+
+async def start_background_worker():
+    global _queue, _worker_task, _loop
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue(maxsize=BACKGROUND_QUEUE_MAX_SIZE)
+    _worker_task = asyncio.create_task(_worker())
+    for name, interval_seconds, func in _periodic_jobs:
+        _periodic_tasks.append(asyncio.create_task(_periodic(name, interval_seconds, func)))
+
+async def stop_background_worker():
+    """Drain pending events, stop the worker, then give periodic jobs a final run"""
+    global _queue, _worker_task, _loop
+    if _worker_task is None:
+        return
+
+    await _queue.join()
+    for task in [_worker_task, *_periodic_tasks]:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _periodic_tasks.clear()
+    _periodic_wakeups.clear()
+    _loop = None
+    _queue = None
+    _worker_task = None
+
+    for name, _, func in _periodic_jobs:
+        await asyncio.to_thread(run_periodic_job, name, func)
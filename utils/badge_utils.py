@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any
 from sqlalchemy.orm import Session
-from db.models import Profile, UserStoryView, UserTimelineView, QuizAttempt, StandAloneGameAttempt, StandAloneGameQuestion, User
+from db.models import Profile, UserBadge, UserNotification, UserStoryView, UserTimelineView, QuizAttempt, StandAloneGameAttempt, StandAloneGameQuestion, User
 from sqlalchemy import func, text
+from utils.progress import get_progress_counters, get_timeline_completion
 
 # Badge path constants
 BADGE_PATH_ILLUMINATION = 'illumination'
@@ -183,83 +184,118 @@ DEFAULT_BADGES = [
 # All badges combined
 ALL_BADGES = ILLUMINATION_BADGES + GAME_BADGES + STREAK_BADGES + DEFAULT_BADGES
 
-def get_user_progress(user_id: int, db: Session) -> Dict[str, Any]:
+# Rule index compiled once at import
+BADGES_BY_ID = {badge['id']: badge for badge in ALL_BADGES}
+
+# Tier-ordered badges per path
+BADGE_TIERS_BY_PATH: Dict[str, List[Dict[str, Any]]] = {}
+for _badge in sorted(ALL_BADGES, key=lambda badge: int(badge['tier'])):
+    BADGE_TIERS_BY_PATH.setdefault(_badge['path'], []).append(_badge)
+
+# Retention fallback: badge id -> badge one tier below on the same path
+PREVIOUS_TIER_BADGE: Dict[str, Optional[Dict[str, Any]]] = {}
+for _path_badges in BADGE_TIERS_BY_PATH.values():
+    _by_tier = {int(badge['tier']): badge for badge in _path_badges}
+    for _badge in _path_badges:
+        _tier = int(_badge['tier'])
+        PREVIOUS_TIER_BADGE[_badge['id']] = _by_tier.get(_tier - 1) if _tier > 1 else None
+
+# Metric name -> badges whose criteria depend on it
+BADGES_BY_METRIC: Dict[str, List[Dict[str, Any]]] = {}
+for _badge in ALL_BADGES:
+    for _metric in _badge['criteria']:
+        BADGES_BY_METRIC.setdefault(_metric, []).append(_badge)
+
+# Metrics changed by each kind of activity, passed as update_user_badges hints
+STORY_VIEW_METRICS = frozenset({'stories_completed', 'timelines_completed', 'timelines_completed_across_categories'})
+QUIZ_METRICS = frozenset({'quizzes_completed'})
+GAME_METRICS = frozenset({'games_played', 'high_score_games', 'game_types_played'})
+TIMELINE_VIEW_METRICS = frozenset()
+
+def get_user_progress(user_id: int, db: Session, profile: Optional[Profile] = None) -> Dict[str, Any]:
     """Calculate user progress for badge evaluation"""
     
-    # Get stories completed
-    stories_completed = db.query(UserStoryView).filter(
-        UserStoryView.user_id == user_id,
-        UserStoryView.is_seen == True
-    ).count()
-    
-    # Get timelines completed (assuming a timeline is completed when all its stories are viewed)
-    timelines_completed_query = text("""
-        SELECT COUNT(DISTINCT t.id) as timeline_count
-        FROM timelines t
-        WHERE t.id IN (
-            SELECT DISTINCT s.timeline_id
-            FROM stories s
-            WHERE s.timeline_id = t.id
-            AND NOT EXISTS (
-                SELECT 1 FROM stories s2
-                WHERE s2.timeline_id = t.id
-                AND s2.id NOT IN (
-                    SELECT story_id FROM user_story_views
-                    WHERE user_id = :user_id AND is_seen = true
-                )
-            )
-        )
-    """)
-    
-    timelines_completed = db.execute(timelines_completed_query, {"user_id": user_id}).scalar() or 0
-    
-    # Get games played
-    games_played = db.query(StandAloneGameAttempt).filter(
-        StandAloneGameAttempt.user_id == user_id
-    ).count()
+    # Story, quiz and game counters are maintained incrementally in user_progress
+    counters = get_progress_counters(user_id, db)
     
-    # Get high score games (80%+ correct)
-    high_score_games = db.query(StandAloneGameAttempt).filter(
-        StandAloneGameAttempt.user_id == user_id,
-        StandAloneGameAttempt.is_correct == True
-    ).count()
-    
-    # Get different game types played
-    game_types_played = db.query(func.count(func.distinct(StandAloneGameQuestion.game_type))).select_from(
-        StandAloneGameAttempt
-    ).join(
-        StandAloneGameQuestion, StandAloneGameAttempt.game_id == StandAloneGameQuestion.id
-    ).filter(StandAloneGameAttempt.user_id == user_id).scalar() or 0
+    # Timeline completion is materialized in user_timeline_progress
+    timeline_completion = get_timeline_completion(user_id, db)
     
     # Get current streak
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
+    if profile is None:
+        profile = db.query(Profile).filter(Profile.user_id == user_id).first()
     current_streak = profile.current_login_streak if profile else 0
     
-    # Get completed quizzes
-    quizzes_completed = db.query(QuizAttempt).filter(
-        QuizAttempt.user_id == user_id,
-        QuizAttempt.completed == True
-    ).count()
-    
     return {
-        'stories_completed': stories_completed,
-        'timelines_completed': timelines_completed,
-        'games_played': games_played,
-        'high_score_games': high_score_games,
-        'game_types_played': game_types_played,
+        'stories_completed': counters['stories_completed'],
+        'timelines_completed': timeline_completion['timelines_completed'],
+        'games_played': counters['games_played'],
+        'high_score_games': counters['high_score_games'],
+        'game_types_played': counters['game_types_played'],
         'streak_days': current_streak,
-        'quizzes_completed': quizzes_completed,
-        'timelines_completed_across_categories': 0,  # TODO: Implement category tracking
-        'challenge_sets_completed': 0  # TODO: Implement challenge set tracking
+        'quizzes_completed': counters['quizzes_completed'],
+        'timelines_completed_across_categories': timeline_completion['timelines_completed_across_categories'],
+        'challenge_sets_completed': 0,  # TODO: Implement challenge set tracking
+        'last_qualifying_activity_at': counters['last_qualifying_activity_at']
     }
 
+def badge_to_dict(badge_id: str, earned_at: Optional[datetime]) -> Optional[Dict[str, Any]]:
+    """Shape a stored badge the way the API has always returned it"""
+    badge = BADGES_BY_ID.get(badge_id)
+    if not badge:
+        return None
+    return {
+        'id': badge['id'],
+        'name': badge['name'],
+        'path': badge['path'],
+        'tier': badge['tier'],
+        'description': badge['description'],
+        'icon_url': badge['icon_url'],
+        'earned_at': (earned_at or datetime.utcnow()).isoformat()
+    }
+
+def _active_badge_dicts(rows: Iterable[UserBadge]) -> List[Dict[str, Any]]:
+    badges = []
+    for row in sorted(rows, key=lambda row: (row.earned_at or datetime.min, row.id or 0)):
+        if row.revoked_at is None:
+            badge = badge_to_dict(row.badge_id, row.earned_at)
+            if badge:
+                badges.append(badge)
+    return badges
+
 def get_user_badges(user_id: int, db: Session) -> List[Dict[str, Any]]:
     """Get all badges earned by a user"""
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    if not profile or not profile.badges:
-        return []
-    
-    return profile.badges
+    rows = db.query(UserBadge).filter(
+        UserBadge.user_id == user_id,
+        UserBadge.revoked_at.is_(None)
+    ).all()
+    return _active_badge_dicts(rows)
+
+def get_badges_for_users(user_ids: Iterable[int], db: Session) -> Dict[int, List[Dict[str, Any]]]:
+    """Badges for several users with one query"""
+    user_ids = list(user_ids)
+    badges_by_user = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return badges_by_user
+    
+    rows_by_user: Dict[int, List[UserBadge]] = {}
+    for row in db.query(UserBadge).filter(UserBadge.user_id.in_(user_ids), UserBadge.revoked_at.is_(None)):
+        rows_by_user.setdefault(row.user_id, []).append(row)
+    for user_id, rows in rows_by_user.items():
+        badges_by_user[user_id] = _active_badge_dicts(rows)
+    return badges_by_user
+
+def grant_badge(db: Session, user_id: int, badge_id: str, rows: Dict[str, UserBadge], now: datetime) -> UserBadge:
+    """Insert a badge row, or reactivate a previously revoked one"""
+    row = rows.get(badge_id)
+    if row is None:
+        row = UserBadge(user_id=user_id, badge_id=badge_id, earned_at=now)
+        db.add(row)
+        rows[badge_id] = row
+    else:
+        row.earned_at = now
+        row.revoked_at = None
+    return row
 
 def check_badge_earned(badge: Dict[str, Any], progress: Dict[str, Any]) -> bool:
     """Check if a badge has been earned based on user progress"""
@@ -271,108 +307,85 @@ def check_badge_earned(badge: Dict[str, Any], progress: Dict[str, Any]) -> bool:
     
     return True
 
-def check_badge_retention(badge: Dict[str, Any], user_id: int, db: Session) -> bool:
+def check_badge_retention(badge: Dict[str, Any], progress: Dict[str, Any]) -> bool:
     """Check if user maintains badge retention requirements"""
     
     # Only apply retention to Illumination and Game badges
     if badge['path'] not in [BADGE_PATH_ILLUMINATION, BADGE_PATH_GAME]:
         return True
     
-    # Check if user has qualifying activity in the last 7 days
+    # Check if user has qualifying activity (story, timeline, quiz or game) in the last 7 days
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
+    last_activity_at = progress.get('last_qualifying_activity_at')
     
-    # Check for story completion
-    recent_story_views = db.query(UserStoryView).filter(
-        UserStoryView.user_id == user_id,
-        UserStoryView.viewed_at >= seven_days_ago
-    ).count()
-    
-    # Check for timeline completion
-    recent_timeline_views = db.query(UserTimelineView).filter(
-        UserTimelineView.user_id == user_id,
-        UserTimelineView.viewed_at >= seven_days_ago
-    ).count()
-    
-    # Check for quiz completion
-    recent_quiz_completion = db.query(QuizAttempt).filter(
-        QuizAttempt.user_id == user_id,
-        QuizAttempt.completed_at >= seven_days_ago
-    ).count()
-    
-    # Check for game completion
-    recent_game_attempts = db.query(StandAloneGameAttempt).filter(
-        StandAloneGameAttempt.user_id == user_id,
-        StandAloneGameAttempt.created_at >= seven_days_ago
-    ).count()
-    
-    return (recent_story_views + recent_timeline_views + recent_quiz_completion + recent_game_attempts) > 0
+    return last_activity_at is not None and last_activity_at >= seven_days_ago
 
-def update_user_badges(user_id: int, db: Session) -> List[Dict[str, Any]]:
-    """Update user badges based on current progress and return newly earned badges"""
+def _evaluate_user_badges(user_id: int, db: Session, changed_metrics: Optional[Iterable[str]] = None):
+    """Returns (newly earned badges, current badges, progress)"""
     
-    # Get current progress
+    # Get current progress and badges (revoked rows are kept so re-earning reuses them)
     progress = get_user_progress(user_id, db)
+    rows = {row.badge_id: row for row in db.query(UserBadge).filter(UserBadge.user_id == user_id)}
+    current_badge_ids = {badge_id for badge_id, row in rows.items() if row.revoked_at is None}
+    
+    if changed_metrics is not None:
+        # Only badges that depend on a changed metric can have crossed a threshold.
+        # Hinted evaluations come from qualifying activity, so retention holds again:
+        # revoked badges whose criteria are still met are due back as well. There is
+        # nothing to write unless one of those is earned.
+        candidates = {
+            badge['id']: badge
+            for metric in changed_metrics
+            for badge in BADGES_BY_METRIC.get(metric, [])
+        }
+        candidates.update(
+            (badge_id, BADGES_BY_ID[badge_id])
+            for badge_id, row in rows.items()
+            if row.revoked_at is not None and badge_id in BADGES_BY_ID
+        )
+        if not any(
+            badge_id not in current_badge_ids and check_badge_earned(badge, progress)
+            for badge_id, badge in candidates.items()
+        ):
+            return [], _active_badge_dicts(rows.values()), progress
     
-    # Get current badges
-    current_badges = get_user_badges(user_id, db)
-    current_badge_ids = {badge['id'] for badge in current_badges}
-    
-    # Get user profile
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    if not profile:
-        return []
-    
+    now = datetime.utcnow()
     newly_earned_badges = []
-    updated_badges = []
+    lost_badge_ids = set()
+    fallback_badge_ids = set()
     
     # Process each badge
     for badge in ALL_BADGES:
-        badge_earned = check_badge_earned(badge, progress)
-        
-        if badge_earned and badge['id'] not in current_badge_ids:
-            # New badge earned
-            earned_badge = {
-                'id': badge['id'],
-                'name': badge['name'],
-                'path': badge['path'],
-                'tier': badge['tier'],
-                'description': badge['description'],
-                'icon_url': badge['icon_url'],
-                'earned_at': datetime.utcnow().isoformat()
-            }
-            updated_badges.append(earned_badge)
-            newly_earned_badges.append(earned_badge)
-            
-        elif badge['id'] in current_badge_ids:
-            # Existing badge - check retention
-            existing_badge = next((b for b in current_badges if b['id'] == badge['id']), None)
-            if existing_badge:
-                if check_badge_retention(badge, user_id, db):
-                    # Keep the badge
-                    updated_badges.append(existing_badge)
-                else:
-                    # Badge lost due to retention rules - revert to previous tier
-                    previous_tier_badge = get_previous_tier_badge(badge['path'], badge['tier'])
-                    if previous_tier_badge and previous_tier_badge['id'] in current_badge_ids:
-                        updated_badges.append(previous_tier_badge)
-    
-    # Update profile with new badges
-    profile.badges = updated_badges
-    db.commit()
+        if badge['id'] not in current_badge_ids:
+            if check_badge_earned(badge, progress):
+                # New badge earned
+                grant_badge(db, user_id, badge['id'], rows, now)
+                newly_earned_badges.append(badge_to_dict(badge['id'], now))
+        elif not check_badge_retention(badge, progress):
+            # Badge lost due to retention rules - revert to previous tier
+            lost_badge_ids.add(badge['id'])
+            previous_tier_badge = PREVIOUS_TIER_BADGE.get(badge['id'])
+            if previous_tier_badge and previous_tier_badge['id'] in current_badge_ids:
+                fallback_badge_ids.add(previous_tier_badge['id'])
+    
+    # Revoke lost badges, keeping any that another lost badge falls back to
+    for badge_id in lost_badge_ids - fallback_badge_ids:
+        rows[badge_id].revoked_at = now
+    
+    # Only write when something changed
+    if newly_earned_badges or lost_badge_ids - fallback_badge_ids:
+        db.commit()
     
-    return newly_earned_badges
+    return newly_earned_badges, _active_badge_dicts(rows.values()), progress
 
-def get_previous_tier_badge(path: str, current_tier: str) -> Optional[Dict[str, Any]]:
-    """Get the previous tier badge for retention fallback"""
-    path_badges = [badge for badge in ALL_BADGES if badge['path'] == path]
-    path_badges.sort(key=lambda x: int(x['tier']))
-    
-    current_tier_num = int(current_tier)
-    if current_tier_num > 1:
-        previous_tier_num = current_tier_num - 1
-        return next((badge for badge in path_badges if int(badge['tier']) == previous_tier_num), None)
-    
-    return None
+def update_user_badges(user_id: int, db: Session, changed_metrics: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Update user badges based on current progress and return newly earned badges.
+    `changed_metrics` limits the check to badges depending on those metrics and
+    returns early when none of them crossed a threshold.
+    """
+    newly_earned_badges, _, _ = _evaluate_user_badges(user_id, db, changed_metrics)
+    return newly_earned_badges
 
 def get_badge_unlock_message(badge: Dict[str, Any]) -> str:
     """Generate unlock message for a badge"""
@@ -391,13 +404,20 @@ def get_badge_unlock_message(badge: Dict[str, Any]) -> str:
     
     return messages.get(badge['id'], f"🎉 Badge Unlocked: {badge['name']}\n{badge['description']}")
 
-def evaluate_badge_progress(user_id: int, db: Session) -> Dict[str, Any]:
+def notify_badges_unlocked(user_id: int, badges: List[Dict[str, Any]], db: Session):
+    """Leave badge_unlocked notifications for badges earned outside a request that could return them"""
+    for badge in badges:
+        db.add(UserNotification(
+            user_id=user_id,
+            notification_type="badge_unlocked",
+            title=f"Badge Unlocked: {badge['name']}",
+            message=get_badge_unlock_message(badge),
+            data={"badge": badge}
+        ))
+
+def evaluate_badge_progress(user_id: int, db: Session, changed_metrics: Optional[Iterable[str]] = None) -> Dict[str, Any]:
     """Evaluate and update badge progress for a user"""
-    newly_earned_badges = update_user_badges(user_id, db)
-    
-    # Get current badges and progress
-    current_badges = get_user_badges(user_id, db)
-    progress = get_user_progress(user_id, db)
+    newly_earned_badges, current_badges, progress = _evaluate_user_badges(user_id, db, changed_metrics)
     
     return {
         'newly_earned_badges': newly_earned_badges,
@@ -408,71 +428,33 @@ def evaluate_badge_progress(user_id: int, db: Session) -> Dict[str, Any]:
 
 def get_default_badges() -> List[Dict[str, Any]]:
     """Get default badges that should be given to all new users"""
-    default_badges = []
-    
-    for badge in DEFAULT_BADGES:
-        earned_badge = {
-            'id': badge['id'],
-            'name': badge['name'],
-            'path': badge['path'],
-            'tier': badge['tier'],
-            'description': badge['description'],
-            'icon_url': badge['icon_url'],
-            'earned_at': datetime.utcnow().isoformat()
-        }
-        default_badges.append(earned_badge)
-    
-    return default_badges
+    now = datetime.utcnow()
+    return [badge_to_dict(badge['id'], now) for badge in DEFAULT_BADGES]
 
 def initialize_user_badges(user_id: int, db: Session) -> List[Dict[str, Any]]:
     """Initialize badges for a new user with default starter badges"""
-    # Get user profile
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    if not profile:
-        return []
-    
-    # Set default badges
-    default_badges = get_default_badges()
-    profile.badges = default_badges
-    db.commit()
-    
-    return default_badges 
+    return ensure_default_badges(user_id, db)
 
 def ensure_default_badges(user_id: int, db: Session) -> List[Dict[str, Any]]:
-    """Ensure user has default badges - give them if they don't have any badges yet"""
-    # Get user profile
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    if not profile:
-        return []
-    
-    # If user has no badges, give them default ones
-    if not profile.badges or len(profile.badges) == 0:
-        default_badges = get_default_badges()
-        profile.badges = default_badges
-        db.commit()
-        return default_badges
+    """Ensure user has default badges - give them if they don't have them yet"""
+    rows = {
+        row.badge_id: row
+        for row in db.query(UserBadge).filter(
+            UserBadge.user_id == user_id,
+            UserBadge.badge_id.in_([badge['id'] for badge in DEFAULT_BADGES])
+        )
+    }
     
-    # Check if user has default badges, if not add them
-    current_badge_ids = {badge['id'] for badge in profile.badges}
+    now = datetime.utcnow()
     missing_default_badges = []
-    
     for default_badge in DEFAULT_BADGES:
-        if default_badge['id'] not in current_badge_ids:
-            earned_badge = {
-                'id': default_badge['id'],
-                'name': default_badge['name'],
-                'path': default_badge['path'],
-                'tier': default_badge['tier'],
-                'description': default_badge['description'],
-                'icon_url': default_badge['icon_url'],
-                'earned_at': datetime.utcnow().isoformat()
-            }
-            missing_default_badges.append(earned_badge)
+        row = rows.get(default_badge['id'])
+        if row is None or row.revoked_at is not None:
+            grant_badge(db, user_id, default_badge['id'], rows, now)
+            missing_default_badges.append(badge_to_dict(default_badge['id'], now))
     
     # Add missing default badges
     if missing_default_badges:
-        profile.badges.extend(missing_default_badges)
         db.commit()
-        return missing_default_badges
     
-    return [] 
\ No newline at end of file
+    return missing_default_badges
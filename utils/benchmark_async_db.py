@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark script comparing the sync (get_db) and async (get_async_db) session
+dependencies under concurrent load, both used from `async def` handlers as the
+routers do: the sync Session blocks the event loop while its query runs.
+Each request holds a connection for a fixed simulated query latency, so the
+results show how many requests per second each dependency can sustain.
+
+Usage: python utils/benchmark_async_db.py [--requests 200] [--concurrency 50] [--delay 0.05]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import get_db, get_async_db, async_engine, IS_SQLITE
+
+def build_app(delay: float) -> FastAPI:
+    """Build a bare app with one sync-session and one async-session route"""
+    app = FastAPI()
+    # SQLite has no server-side sleep, fall back to a cheap query
+    query = text("SELECT 1") if IS_SQLITE else text("SELECT pg_sleep(:delay)")
+    params = {} if IS_SQLITE else {"delay": delay}
+
+    # The baseline: an async handler running a sync Session query, which blocks the event loop
+    @app.get("/sync")
+    async def sync_route(db: Session = Depends(get_db)):
+        db.execute(query, params)
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(query, params)
+        return {"ok": True}
+
+    return app
+
+async def run_load(app: FastAPI, path: str, total: int, concurrency: int):
+    """Fire `total` requests at `path` with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return {
+        "requests_per_sec": total / elapsed if elapsed else 0,
+        "p95_ms": p95 * 1000,
+        "errors": errors,
+        "elapsed": elapsed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async DB session throughput")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests per route")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+    parser.add_argument("--delay", type=float, default=0.05, help="Simulated query latency in seconds")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args))
+
+async def benchmark(args):
+    app = build_app(args.delay)
+    print(f"Running {args.requests} requests per route, concurrency {args.concurrency}, query delay {args.delay}s")
+
+    try:
+        for path in ("/sync", "/async"):
+            # Warm up the connection pool before measuring
+            await run_load(app, path, min(args.concurrency, args.requests), args.concurrency)
+            result = await run_load(app, path, args.requests, args.concurrency)
+            print(
+                f"{path:<7} {result['requests_per_sec']:8.1f} req/s  "
+                f"p95 {result['p95_ms']:7.1f} ms  errors {result['errors']}  ({result['elapsed']:.2f}s)"
+            )
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark script comparing per-worker catalog copies with the shared, memory-mapped
+catalog snapshot (utils/catalog_snapshot.py), as several worker processes would use them.
+"copy" is each worker loading the catalog from the database into Python objects.
+"mapped" is each worker mapping the snapshot file the first worker built.
+For each worker it reports the time until it serves a first page of timelines,
+the time to read the full timelines and stories lists, and how much its private
+memory (USS, from /proc/self/smaps_rollup, Linux only) grew: mapped pages are
+shared with the other workers, so they don't count towards it.
+Temporary timelines and stories are inserted for the run and deleted afterwards.
+
+Usage: python utils/benchmark_catalog_snapshot.py [--timelines 2000] [--stories 20] [--workers 4]
+"""
+
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from datetime import date
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from db.models import get_db, Timeline, Story
+# Registers the catalog version hooks, so the inserts below invalidate the snapshot
+from utils.catalog import catalog_cache
+
+BENCHMARK_TITLE = "Catalog snapshot benchmark"
+
+def private_memory_kb() -> int:
+    """Unique set size: resident pages this process doesn't share with any other"""
+    with open("/proc/self/smaps_rollup") as smaps:
+        fields = dict(line.split(":", 1) for line in smaps if ":" in line)
+    return sum(int(fields[field].split()[0]) for field in ("Private_Clean", "Private_Dirty"))
+
+def run_worker(mode: str, results):
+    baseline_kb = private_memory_kb()
+    started = time.perf_counter()
+    if mode == "copy":
+        # The worker's own copy stays loaded, it is its cache
+        catalog = catalog_cache._load()
+    else:
+        catalog = catalog_cache.get()
+        catalog = {"timelines": catalog.timelines, "stories": catalog.stories}
+    first_page = catalog["timelines"][:20]
+    first_page_ms = (time.perf_counter() - started) * 1000
+
+    # Every row, as the unpaginated list endpoints return them; dropped afterwards, like a finished response
+    started = time.perf_counter()
+    timelines, stories = catalog["timelines"][:], catalog["stories"][:]
+    full_list_ms = (time.perf_counter() - started) * 1000
+    count = len(timelines) + len(stories)
+    del first_page, timelines, stories
+    results.put((first_page_ms, full_list_ms, private_memory_kb() - baseline_kb, count))
+
+def seed(db, timelines: int, stories: int):
+    for start in range(0, timelines, 500):
+        rows = db.execute(insert(Timeline).returning(Timeline.id), [
+            {"title": f"{BENCHMARK_TITLE} {i}", "year_range": "1900-2000", "overview": "Overview " * 20,
+             "categories": ["Benchmark", f"Category {i % 10}"]}
+            for i in range(start, min(start + 500, timelines))
+        ]).scalars().all()
+        db.execute(insert(Story), [
+            {"title": BENCHMARK_TITLE, "desc": "Description " * 20, "story_date": date.today(),
+             "timeline_id": timeline_id, "story_type": 1, "views": 0, "likes": 0}
+            for timeline_id in rows for _ in range(stories)
+        ])
+        db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-worker catalog copies with the shared snapshot")
+    parser.add_argument("--timelines", type=int, default=2000, help="Temporary timelines to insert")
+    parser.add_argument("--stories", type=int, default=20, help="Stories per temporary timeline")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per mode")
+    args = parser.parse_args()
+
+    db = next(get_db())
+    try:
+        print(f"🌱 Inserting {args.timelines} timelines with {args.stories} stories each...")
+        seed(db, args.timelines, args.stories)
+
+        # Build the snapshot once, as the first worker to see the new version would
+        catalog_cache.refresh()
+
+        context = multiprocessing.get_context("spawn")
+        for mode in ("copy", "mapped"):
+            results = context.Queue()
+            workers = [context.Process(target=run_worker, args=(mode, results)) for _ in range(args.workers)]
+            for worker in workers:
+                worker.start()
+            rows = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            first_page = sorted(row[0] for row in rows)
+            full_list = sorted(row[1] for row in rows)
+            memory = sorted(row[2] for row in rows)
+            print(
+                f"📦 {mode:<6} {args.workers} workers, {rows[0][3]} rows  "
+                f"first page {first_page[len(rows) // 2]:8.1f} ms  "
+                f"full lists {full_list[len(rows) // 2]:7.1f} ms  (medians)  "
+                f"catalog memory {memory[len(rows) // 2] / 1024:6.1f} MiB per worker, "
+                f"{sum(memory) / 1024:6.1f} MiB total"
+            )
+        print(f"🗂️  Snapshot file: {os.path.getsize(catalog_cache.path) / 1024 / 1024:.1f} MiB at {catalog_cache.path}")
+
+    except Exception as e:
+        print(f"❌ Benchmark failed: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        print("🧹 Removing benchmark timelines and stories...")
+        db.query(Story).filter(Story.title == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.query(Timeline).filter(Timeline.title.like(f"{BENCHMARK_TITLE}%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
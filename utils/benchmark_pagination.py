@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark script comparing OFFSET pagination with keyset (cursor) pagination
+on the stories list, at page 1 and at a deep page.
+"offset" is the old path: ORDER BY created_at, id OFFSET (page - 1) * size.
+"keyset" is utils.pagination: WHERE (created_at, id) > cursor, served by the
+ix_stories_created_at_id index, so a deep page should cost the same as page 1.
+Temporary stories are inserted for the run and deleted afterwards.
+
+Usage: python utils/benchmark_pagination.py [--rows 250000] [--size 20] [--page 10000] [--repeat 20]
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from db.models import get_db, Story
+from utils.pagination import encode_cursor, paginate
+
+BENCHMARK_TITLE = "Pagination benchmark"
+INSERT_BATCH_SIZE = 10000
+
+def seed_stories(db, rows: int):
+    started_at = datetime.utcnow() - timedelta(seconds=rows)
+    for start in range(0, rows, INSERT_BATCH_SIZE):
+        db.execute(insert(Story), [
+            {"title": BENCHMARK_TITLE, "story_date": date.today(), "views": 0, "likes": 0,
+             "created_at": started_at + timedelta(seconds=i)}
+            for i in range(start, min(start + INSERT_BATCH_SIZE, rows))
+        ])
+        db.commit()
+
+def time_query(run, repeat: int):
+    """Median wall time of `run()` in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OFFSET and keyset pagination latency")
+    parser.add_argument("--rows", type=int, default=250000, help="Temporary stories to insert")
+    parser.add_argument("--size", type=int, default=20, help="Page size")
+    parser.add_argument("--page", type=int, default=10000, help="Deep page to compare with page 1")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+    args = parser.parse_args()
+
+    db = next(get_db())
+    try:
+        print(f"🌱 Inserting {args.rows} stories...")
+        seed_stories(db, args.rows)
+
+        for page in (1, args.page):
+            skip = (page - 1) * args.size
+            # The cursor a client would hold after reading the previous page
+            cursor = None
+            if skip:
+                previous = db.query(Story.created_at, Story.id).order_by(Story.created_at, Story.id).offset(skip - 1).first()
+                if previous is None:
+                    print(f"⚠️  Page {page} is past the end of the table, use more --rows")
+                    continue
+                cursor = encode_cursor(previous.created_at, previous.id)
+
+            offset_ms = time_query(
+                lambda: db.query(Story).order_by(Story.created_at, Story.id).offset(skip).limit(args.size).all(),
+                args.repeat
+            )
+            keyset_ms = time_query(
+                lambda: paginate(db.query(Story), Story.created_at, Story.id, cursor, args.size),
+                args.repeat
+            )
+            db.rollback()
+            print(f"📄 page {page:>6}  offset {offset_ms:8.2f} ms  keyset {keyset_ms:8.2f} ms")
+
+    except Exception as e:
+        print(f"❌ Benchmark failed: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        print("🧹 Removing benchmark stories...")
+        db.query(Story).filter(Story.title == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the JSON serialization paths of the catalog list endpoints,
+on the /api/list/stories payload (stories with their timestamps) of a catalog
+with a few thousand stories:
+  jsonable_encoder  FastAPI's path for a returned dict: jsonable_encoder + json.dumps
+  response_model    FastAPI's path with a response_model: validation + serialization + orjson
+  orjson            json_response() (utils/responses.py): the dicts straight to orjson
+  cached bytes      a response_cache hit: the serialized bytes replayed
+It also reports the body size and compression time with gzip and brotli.
+json_response() and the cached bytes skip FastAPI's response_model validation,
+so it then calls each endpoint serving them and validates one payload against
+its declared response_model.
+Temporary stories, a character, an OTD entry and a user with a bookmark are
+inserted for the run and deleted afterwards.
+
+Usage: python utils/benchmark_serialization.py [--stories 5000] [--rounds 5]
+"""
+
+import sys
+import os
+import time
+import json
+import argparse
+from datetime import date
+from typing import List
+from uuid import uuid4
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert
+from starlette.requests import Request
+from db.models import get_db, User, Profile, Character, Timeline, Story, Timestamp, OnThisDay, UserTimelineBookmark
+from routers import stories_timelines
+from schemas.stories_timelines import StoryWithTimestampsModel
+from utils.auth import get_current_user, get_current_user_async
+# Registers the catalog version hooks, so the inserts below reach the catalog cache
+from utils.catalog import catalog_cache
+from utils.identity_cache import CurrentUser
+from utils.responses import json_response, response_cache, compress, dump_json
+
+BENCHMARK_TITLE = "Serialization benchmark"
+STORIES_PER_TIMELINE = 50
+OTD_DATE = date(1900, 1, 1)
+
+# Endpoints returning json_response() or response_cache bytes, whose payloads
+# FastAPI doesn't check against the response_model
+UNVALIDATED_ENDPOINTS = [
+    "/api/list/timelines",
+    "/api/timelines/filter",
+    "/api/timelines/facets",
+    "/api/list/stories",
+    "/api/timeline/{timeline_id}/stories",
+    "/api/user/bookmarked-timelines",
+    "/api/list/characters",
+    "/api/list/otd",
+    "/api/otd/date/{date}",
+]
+
+def seed(db, stories: int):
+    character_id = db.execute(insert(Character).returning(Character.id), [
+        {"name": BENCHMARK_TITLE, "persona": "Persona " * 20}
+    ]).scalar_one()
+    timeline_ids = db.execute(insert(Timeline).returning(Timeline.id), [
+        {"title": f"{BENCHMARK_TITLE} {i}", "year_range": "1900-2000", "overview": "Overview " * 20, "categories": ["Benchmark"],
+         "main_character_id": character_id}
+        for i in range(-(-stories // STORIES_PER_TIMELINE))
+    ]).scalars().all()
+    story_ids = db.execute(insert(Story).returning(Story.id), [
+        {"title": BENCHMARK_TITLE, "desc": "Description " * 20, "story_date": date.today(),
+         "timeline_id": timeline_ids[i // STORIES_PER_TIMELINE], "story_type": 1, "views": i, "likes": i // 2,
+         "thumbnail_url": f"media/images/{i}.png", "video_url": f"media/videos/{i}.mp4"}
+        for i in range(stories)
+    ]).scalars().all()
+    db.execute(insert(Timestamp), [
+        {"story_id": story_id, "time_sec": (k + 1) * 30, "label": f"Chapter {k + 1}"}
+        for story_id in story_ids for k in range(3)
+    ])
+    if db.query(OnThisDay.id).filter(OnThisDay.date == OTD_DATE).first() is None:
+        db.execute(insert(OnThisDay), [
+            {"date": OTD_DATE, "title": BENCHMARK_TITLE, "short_desc": "Short description", "story_id": story_ids[0]}
+        ])
+    db.commit()
+    return timeline_ids[0]
+
+def stories_payload():
+    """The /api/list/stories payload, built the way the endpoint builds it"""
+    catalog_cache.refresh()
+    catalog = catalog_cache.get()
+    stories = catalog.stories[:]
+    counts = catalog_cache.story_counts([story.id for story in stories])
+    return [
+        {
+            "story": {
+                "id": story.id,
+                "title": story.title,
+                "desc": story.desc,
+                "thumbnail_url": story.thumbnail_url,
+                "video_url": story.video_url,
+                "timeline_id": story.timeline_id,
+                "story_date": story.story_date,
+                "story_type": story.story_type,
+                "views": counts[story.id]["views"],
+                "likes": counts[story.id]["likes"],
+                "created_at": story.created_at,
+                "is_seen": False
+            },
+            "timestamps": [ts._asdict() for ts in catalog.timestamps_by_story.get(story.id, [])]
+        }
+        for story in stories
+    ]
+
+def check_response_models(db, timeline_id: int) -> int:
+    """Validate one payload of each endpoint in UNVALIDATED_ENDPOINTS; returns how many failed"""
+    tag = f"serialization-{uuid4().hex[:8]}"
+    user = User(email=f"{tag}@example.com", username=tag, password="-", is_verified=True)
+    user.profile = Profile()
+    db.add(user)
+    db.flush()
+    db.add(UserTimelineBookmark(user_id=user.id, timeline_id=timeline_id))
+    db.commit()
+    current_user = CurrentUser.from_model(user)
+
+    app = FastAPI()
+    app.include_router(stories_timelines.router)
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    app.dependency_overrides[get_current_user_async] = lambda: current_user
+    models = {route.path: route.response_model for route in stories_timelines.router.routes if "GET" in route.methods}
+
+    failures = 0
+    try:
+        with TestClient(app) as client:
+            for endpoint in UNVALIDATED_ENDPOINTS:
+                response = client.get(endpoint.format(timeline_id=timeline_id, date=OTD_DATE.isoformat()))
+                try:
+                    if response.status_code != 200:
+                        raise RuntimeError(f"status {response.status_code}: {response.text[:200]}")
+                    adapter = TypeAdapter(models[endpoint])
+                    payload = adapter.validate_json(response.content)
+                    # Re-serialized through the model, as FastAPI would: extra or reshaped fields show up as a difference
+                    if json.loads(adapter.dump_json(payload)) != json.loads(response.content):
+                        raise RuntimeError("payload differs from its response_model serialization")
+                    items = len(payload) if isinstance(payload, list) else 1
+                    print(f"  ✅ {endpoint:<38} {items:>6} items match {models[endpoint]}")
+                except (RuntimeError, ValidationError) as e:
+                    failures += 1
+                    print(f"  ❌ {endpoint:<38} {str(e)[:300]}")
+    finally:
+        db.delete(user)
+        db.commit()
+    return failures
+
+def timed(rounds: int, run):
+    result = run()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        run()
+    return result, (time.perf_counter() - started) / rounds * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON serialization paths on the stories list")
+    parser.add_argument("--stories", type=int, default=5000, help="Temporary stories to insert")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per path")
+    args = parser.parse_args()
+
+    db = next(get_db())
+    try:
+        print(f"🌱 Inserting {args.stories} stories with 3 timestamps each...")
+        timeline_id = seed(db, args.stories)
+        payload = stories_payload()
+        print(f"📚 {len(payload)} stories in the payload")
+
+        adapter = TypeAdapter(List[StoryWithTimestampsModel])
+        request = Request({"type": "http", "method": "GET", "path": "/api/list/stories", "query_string": b"", "headers": []})
+        response_cache.serve(request, Response(), lambda: payload)
+
+        paths = {
+            "jsonable_encoder": lambda: json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode(),
+            "response_model": lambda: dump_json(adapter.dump_python(adapter.validate_python(payload), mode="json")),
+            "orjson": lambda: json_response(payload).body,
+            "cached bytes": lambda: response_cache.get(request).body,
+        }
+        baseline = None
+        for name, run in paths.items():
+            body, elapsed = timed(args.rounds, run)
+            baseline = baseline or elapsed
+            print(f"⏱️  {name:<17} {elapsed:9.2f} ms  {baseline / elapsed:8.1f}x  {len(body) / 1024:8.1f} KiB")
+
+        for encoding in ("gzip", "br"):
+            compressed, elapsed = timed(args.rounds, lambda: compress(body, encoding))
+            print(f"🗜️  {encoding:<17} {elapsed:9.2f} ms  {len(compressed) / 1024:8.1f} KiB ({len(compressed) / len(body):.1%} of the body)")
+
+        print("🔎 Validating the payloads FastAPI doesn't validate against their response_model...")
+        failures = check_response_models(db, timeline_id)
+        if failures:
+            print(f"❌ {failures} endpoints return payloads that don't match their response_model")
+        else:
+            print("✅ Every payload matches its response_model")
+
+    except Exception as e:
+        print(f"❌ Benchmark failed: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        print("🧹 Removing benchmark timelines and stories...")
+        story_ids = db.query(Story.id).filter(Story.title == BENCHMARK_TITLE)
+        db.query(Timestamp).filter(Timestamp.story_id.in_(story_ids.scalar_subquery())).delete(synchronize_session=False)
+        db.query(Story).filter(Story.title == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.query(Timeline).filter(Timeline.title.like(f"{BENCHMARK_TITLE}%")).delete(synchronize_session=False)
+        db.query(OnThisDay).filter(OnThisDay.title == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.query(Character).filter(Character.name == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
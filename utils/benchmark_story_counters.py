@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark script comparing per-request story view writes with the write-behind
+counter buffer, all requests hitting one story.
+"direct" is the old path: load the story, views += 1, commit on every request.
+"buffered" increments utils.counters.story_counters and flushes once at the end.
+A temporary story is created for the run and deleted afterwards.
+
+Usage: python utils/benchmark_story_counters.py [--requests 2000] [--concurrency 100]
+"""
+
+import sys
+import os
+import asyncio
+import argparse
+from datetime import date
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Depends
+from sqlalchemy.orm import Session
+from db.models import get_db, SessionLocal, Story, async_engine
+from utils.counters import story_counters
+from utils.benchmark_async_db import run_load
+
+def build_app() -> FastAPI:
+    """Bare app with the old read-modify-write view route and the buffered one"""
+    app = FastAPI()
+
+    @app.get("/direct/{story_id}")
+    def direct_route(story_id: int, db: Session = Depends(get_db)):
+        story = db.query(Story).filter(Story.id == story_id).first()
+        story.views += 1
+        db.commit()
+        return {"views": story.views}
+
+    @app.get("/buffered/{story_id}")
+    def buffered_route(story_id: int, db: Session = Depends(get_db)):
+        story = db.query(Story).filter(Story.id == story_id).first()
+        story_counters.increment(story.id, 'views')
+        return {"views": story_counters.value(story, 'views')}
+
+    return app
+
+def read_views(story_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Story.views).filter(Story.id == story_id).scalar()
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare direct and buffered story view counters")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests per route")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight at once")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args))
+
+async def benchmark(args):
+    app = build_app()
+    db = SessionLocal()
+    story = Story(title="Counter benchmark", story_date=date.today(), views=0, likes=0)
+    db.add(story)
+    db.commit()
+    story_id = story.id
+    print(f"Running {args.requests} requests per route against story {story_id}, concurrency {args.concurrency}")
+
+    try:
+        for route in ("direct", "buffered"):
+            before = read_views(story_id)
+            result = await run_load(app, f"/{route}/{story_id}", args.requests, args.concurrency)
+            if route == "buffered":
+                story_counters.flush(db)
+            recorded = read_views(story_id) - before
+            print(
+                f"{route:<9} {result['requests_per_sec']:8.1f} req/s  "
+                f"p95 {result['p95_ms']:7.1f} ms  errors {result['errors']}  "
+                f"views recorded {recorded}/{args.requests}  ({result['elapsed']:.2f}s)"
+            )
+    finally:
+        db.query(Story).filter(Story.id == story_id).delete()
+        db.commit()
+        db.close()
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+import asyncio
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from utils.background import register_periodic, wake_periodic
+from utils.counters import story_counters, STORY_COUNTER_FLUSH_SECONDS
+from utils.catalog_snapshot import (
+    CatalogSnapshot, CachedCharacter, CachedTimeline, CachedStory, CachedTimestamp, CachedOnThisDay,
+    open_snapshot, write_snapshot
+)
+from db.models import (
+    DATABASE_URL, SessionLocal, IS_SQLITE, CatalogVersion, Timeline, TimelineCategoryLink, Story, StoryType, Timestamp,
+    Character, OnThisDay, Quiz, Question, Option, StandAloneGameQuestion, StandAloneGameOption
+)
+
+# Catalog version: the admin-authored content (timelines, stories, characters, OTD,
+# quizzes, games) changes rarely, so anything derived from it can be cached until
+# it does. Every transaction that writes catalog rows bumps the single
+# catalog_version row before it commits. The background worker re-reads the row
+# every CATALOG_VERSION_POLL_SECONDS, and right away after a commit made in this
+# process, and swaps in the catalog cache for the new version. Requests only read
+# the version the cache currently serves, so they never query it themselves.
+CATALOG_VERSION_POLL_SECONDS = 2
+CATALOG_VERSION_ID = 1
+
+CATALOG_MODELS = (
+    Timeline, TimelineCategoryLink, Story, Timestamp, Character, OnThisDay,
+    Quiz, Question, Option, StandAloneGameQuestion, StandAloneGameOption
+)
+
+# Model behind each of the snapshot's *_by_id indexes, for lookups that miss it
+INDEX_MODELS = {
+    "characters_by_id": Character, "timelines_by_id": Timeline, "stories_by_id": Story, "otd_by_id": OnThisDay
+}
+
+# Counters that change with traffic, not with catalog edits
+VOLATILE_COLUMNS = {Story: {'views', 'likes'}}
+
+class CatalogState(NamedTuple):
+    version: int
+    # The stamp adds the time of the last bump, so a database that was recreated
+    # and counted back up to the same version doesn't match old snapshots
+    stamp: str
+    updated_at: Optional[datetime]
+
+class CatalogVersionTracker:
+    """
+    The catalog version this process serves, as published by the catalog cache once
+    it has swapped in that version. Reading it never touches the database.
+    """
+
+    def __init__(self):
+        # Replaced as a whole, so readers never see a version with another's stamp
+        self._state = CatalogState(0, "0:", None)
+
+    def read(self) -> CatalogState:
+        """The latest committed version, from the database; call it off the event loop"""
+        db = SessionLocal()
+        try:
+            row = db.query(CatalogVersion.version, CatalogVersion.updated_at).filter(CatalogVersion.id == CATALOG_VERSION_ID).first()
+        finally:
+            db.close()
+
+        version, updated_at = row if row else (0, None)
+        return CatalogState(version, f"{version}:{updated_at.isoformat() if updated_at else ''}", updated_at)
+
+    def publish(self, state: CatalogState):
+        self._state = state
+
+    def current_state(self) -> Tuple[int, str]:
+        """(version, stamp) of the catalog being served"""
+        state = self._state
+        return state.version, state.stamp
+
+    def current(self) -> int:
+        """Current catalog version, 0 until the catalog is first written"""
+        return self._state.version
+
+    def updated_at(self) -> Optional[datetime]:
+        """When the current version was committed"""
+        return self._state.updated_at
+
+catalog_version = CatalogVersionTracker()
+
+def bump_catalog_version(session: Session):
+    """Bump the version inside the session's transaction, once per transaction"""
+    if session.info.get("catalog_changed"):
+        return
+    now = datetime.utcnow()
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    stmt = insert(CatalogVersion).values(id=CATALOG_VERSION_ID, version=1, updated_at=now).on_conflict_do_update(
+        index_elements=['id'],
+        set_={'version': CatalogVersion.version + 1, 'updated_at': now}
+    )
+    # On the connection, not session.execute(), so the ORM hooks below don't see it
+    session.connection().execute(stmt)
+    session.info["catalog_changed"] = True
+
+def _is_catalog_change(obj, is_update: bool) -> bool:
+    if not isinstance(obj, CATALOG_MODELS):
+        return False
+    volatile = VOLATILE_COLUMNS.get(type(obj))
+    if not is_update or not volatile:
+        return True
+    state = inspect(obj)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in volatile
+    )
+
+# Session hooks: bump the version when a flush touches catalog rows, have the
+# background worker pick it up once the transaction commits
+@event.listens_for(Session, "after_flush")
+def _detect_catalog_changes(session, flush_context):
+    if session.info.get("catalog_changed"):
+        return
+    if (
+        any(_is_catalog_change(obj, False) for obj in session.new)
+        or any(_is_catalog_change(obj, False) for obj in session.deleted)
+        or any(_is_catalog_change(obj, True) for obj in session.dirty)
+    ):
+        bump_catalog_version(session)
+
+@event.listens_for(Session, "do_orm_execute")
+def _detect_bulk_catalog_changes(orm_execute_state):
+    """Bulk insert(Model), Query.update() and Query.delete() skip the flush, catch them here"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, CATALOG_MODELS):
+        bump_catalog_version(orm_execute_state.session)
+
+@event.listens_for(Session, "after_commit")
+def _apply_catalog_changes(session):
+    if session.info.pop("catalog_changed", None):
+        wake_periodic('catalog_snapshot')
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
+
+_facets_lock = Lock()
+_facets: Optional[Dict[str, Any]] = None
+
+def get_catalog_facets(db: Session) -> Dict[str, Any]:
+    """
+    Timeline counts per category and story counts per story type, computed once per
+    catalog version
+    """
+    global _facets
+    version = catalog_version.current()
+    with _facets_lock:
+        if _facets is not None and _facets["catalog_version"] == version:
+            return _facets
+
+    category_rows = db.query(
+        TimelineCategoryLink.category, func.count(TimelineCategoryLink.timeline_id)
+    ).group_by(TimelineCategoryLink.category).all()
+
+    story_type_rows = db.query(
+        Story.story_type, func.count(Story.id)
+    ).filter(Story.story_type.isnot(None)).group_by(Story.story_type).all()
+
+    story_types = []
+    for story_type, count in story_type_rows:
+        try:
+            name = StoryType(story_type).name
+        except ValueError:
+            name = None
+        story_types.append({"story_type": story_type, "name": name, "count": count})
+
+    facets = {
+        "catalog_version": version,
+        "categories": [
+            {"category": category, "count": count}
+            for category, count in sorted(category_rows, key=lambda row: (-row[1], row[0]))
+        ],
+        "story_types": sorted(story_types, key=lambda row: (-row["count"], row["story_type"]))
+    }
+    with _facets_lock:
+        _facets = facets
+    return facets
+
+# Catalog cache: the timelines, stories, timestamps, characters and OTD entries the
+# list and detail endpoints serve, as a snapshot file per catalog version (see
+# utils/catalog_snapshot.py). The first worker to see a new version rebuilds the
+# file under a file lock and swaps it in; every other worker just maps it, so a
+# cold worker serves from the existing file without loading the catalog itself.
+# Both happen in the background worker: requests only read the current snapshot.
+# Per-user state (is_seen, bookmarked, liked) is not cached here; endpoints overlay
+# it from the user's own id sets.
+# Story views and likes move with traffic rather than the catalog version, so they
+# are cached per process and reloaded by the worker every STORY_STATS_REFRESH_SECONDS
+# or after the counter buffer flushes, matching the write-behind delay they already have.
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "knowledge-catalog"))
+STORY_STATS_REFRESH_SECONDS = STORY_COUNTER_FLUSH_SECONDS
+# How often the worker checks whether the stats are due
+STORY_STATS_CHECK_SECONDS = 1
+
+class StoryStats(NamedTuple):
+    id: int
+    views: Optional[int]
+    likes: Optional[int]
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock shared by every process on the host"""
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class CatalogCache:
+    def __init__(self, snapshot_dir: str = CATALOG_SNAPSHOT_DIR, stats_refresh_seconds: int = STORY_STATS_REFRESH_SECONDS):
+        # One file per database, so apps on one host using different databases don't share it
+        database = hashlib.sha1(DATABASE_URL.encode()).hexdigest()[:12]
+        self.path = os.path.join(snapshot_dir, f"catalog-{database}.bin")
+        self.stats_refresh_seconds = stats_refresh_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stats: Dict[int, StoryStats] = {}
+        self._stats_loaded_at: Optional[float] = None
+        self._build_lock = Lock()
+        self._metrics_lock = Lock()
+        self._metrics = {"hits": 0, "misses": 0, "snapshots_built": 0, "snapshots_mapped": 0, "stats_reloads": 0}
+        self._last_build_ms: Optional[float] = None
+
+    def _count(self, metric: str):
+        with self._metrics_lock:
+            self._metrics[metric] += 1
+
+    def get(self) -> CatalogSnapshot:
+        """The snapshot being served, as last swapped in by refresh()"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Only an app started without the lifespan (scripts, bare test apps) gets
+            # here. It maps whatever file exists and leaves rebuilding to refresh(),
+            # unless there is no file at all yet.
+            self._count("misses")
+            self.refresh(build=False)
+            return self._snapshot
+        self._count("hits")
+        return snapshot
+
+    def refresh(self, build: bool = True):
+        """
+        Swap in the snapshot for the latest catalog version and publish that version.
+        Queries the database, so it runs in the background worker, never on a request.
+        build=False maps the existing file even if it is for an older version, without
+        waiting for the file lock.
+        """
+        with self._build_lock:
+            state = catalog_version.read()
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.stamp == state.stamp:
+                catalog_version.publish(state)
+                return
+            snapshot = open_snapshot(self.path)
+            if snapshot is not None and not build and snapshot.stamp != state.stamp:
+                # Served under its own version, so ETags and cached bytes match its rows
+                state = CatalogState(snapshot.version, snapshot.stamp, None)
+            if snapshot is None or snapshot.stamp != state.stamp:
+                snapshot, state = self._rebuild()
+            else:
+                self._count("snapshots_mapped")
+            # Snapshot first: a request between the two sees newer rows under the older
+            # version, never a new version's ETag or cache key on old rows
+            self._snapshot = snapshot
+            catalog_version.publish(state)
+
+    def _rebuild(self) -> Tuple[CatalogSnapshot, CatalogState]:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with _file_lock(f"{self.path}.lock"):
+            # Another worker may have rebuilt it while we waited for the lock
+            state = catalog_version.read()
+            snapshot = open_snapshot(self.path)
+            if snapshot is not None and snapshot.stamp == state.stamp:
+                self._count("snapshots_mapped")
+                return snapshot, state
+
+            started = time.perf_counter()
+            write_snapshot(self.path, state.version, state.stamp, self._load())
+            self._last_build_ms = (time.perf_counter() - started) * 1000
+            self._count("snapshots_built")
+            snapshot = open_snapshot(self.path)
+            if snapshot is None:
+                raise RuntimeError(f"Catalog snapshot {self.path} could not be read back")
+            return snapshot, state
+
+    async def lookup(self, index: str, row_id: int):
+        """
+        (snapshot, row) for an id in one of the snapshot's *_by_id indexes. A miss can
+        be a row committed since the snapshot was swapped in, by another worker or by
+        a request the woken worker hasn't caught up with, so it's checked against the
+        database off the event loop before it counts as not found.
+        """
+        snapshot = self.get()
+        row = getattr(snapshot, index).get(row_id)
+        if row is None:
+            return await asyncio.to_thread(self._lookup_missing, index, row_id)
+        return snapshot, row
+
+    def _lookup_missing(self, index: str, row_id: int):
+        model = INDEX_MODELS[index]
+        db = SessionLocal()
+        try:
+            exists = db.query(model.id).filter(model.id == row_id).first() is not None
+        finally:
+            db.close()
+        if exists:
+            # Newer than the snapshot: swap in the current one rather than wait for the worker
+            self.refresh()
+        snapshot = self._snapshot
+        return snapshot, getattr(snapshot, index).get(row_id)
+
+    def warm(self):
+        """Map (or build) the snapshot and load story stats ahead of the first request"""
+        self.refresh()
+        self._reload_stats()
+
+    def _load(self) -> Dict[str, List[NamedTuple]]:
+        db = SessionLocal()
+        try:
+            return {
+                "characters": [CachedCharacter(*row) for row in db.query(
+                    Character.id, Character.name, Character.persona, Character.avatar_url, Character.created_at
+                )],
+                "timelines": [CachedTimeline(*row) for row in db.query(
+                    Timeline.id, Timeline.title, Timeline.year_range, Timeline.overview, Timeline.thumbnail_url,
+                    Timeline.main_character_id, Timeline.categories, Timeline.created_at
+                )],
+                "stories": [CachedStory(*row) for row in db.query(
+                    Story.id, Story.timeline_id, Story.title, Story.desc, Story.story_date, Story.story_type,
+                    Story.thumbnail_url, Story.video_url, Story.created_at
+                )],
+                "timestamps": [CachedTimestamp(*row) for row in db.query(
+                    Timestamp.id, Timestamp.story_id, Timestamp.time_sec, Timestamp.label
+                )],
+                "otd": [CachedOnThisDay(*row) for row in db.query(
+                    OnThisDay.id, OnThisDay.date, OnThisDay.title, OnThisDay.short_desc, OnThisDay.image_url,
+                    OnThisDay.story_id, OnThisDay.created_at
+                )],
+            }
+        finally:
+            db.close()
+
+    def _reload_stats(self):
+        db = SessionLocal()
+        try:
+            stats = {row[0]: StoryStats(*row) for row in db.query(Story.id, Story.views, Story.likes)}
+        finally:
+            db.close()
+        self._stats = stats
+        self._stats_loaded_at = time.monotonic()
+        self._count("stats_reloads")
+
+    def refresh_stats(self):
+        """Reload story stats when they're older than stats_refresh_seconds or the counter buffer flushed since"""
+        loaded_at = self._stats_loaded_at
+        if (
+            loaded_at is None
+            or time.monotonic() - loaded_at > self.stats_refresh_seconds
+            or (story_counters.flushed_at is not None and story_counters.flushed_at > loaded_at)
+        ):
+            self._reload_stats()
+
+    def story_counts(self, story_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """
+        Views and likes per story: stored values as of the last reload plus this
+        process's buffered increments. Stories created since then count from zero.
+        """
+        if self._stats_loaded_at is None:
+            # Only an app started without the lifespan (scripts, bare test apps) gets here
+            self._reload_stats()
+
+        stats = self._stats
+        counts = {}
+        for story_id in story_ids:
+            row = stats.get(story_id) or StoryStats(story_id, 0, 0)
+            counts[story_id] = {
+                "views": story_counters.value(row, 'views'),
+                "likes": story_counters.value(row, 'likes')
+            }
+        return counts
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        snapshot = self._snapshot
+        metrics.update({
+            "hit_ratio": round(metrics["hits"] / lookups, 4) if lookups else None,
+            "catalog_version": snapshot.version if snapshot else None,
+            "last_build_ms": round(self._last_build_ms, 2) if self._last_build_ms is not None else None,
+            "snapshot_path": self.path,
+            "snapshot_bytes": snapshot.size if snapshot else 0,
+            "timelines": len(snapshot.timelines) if snapshot else 0,
+            "stories": len(snapshot.stories) if snapshot else 0,
+            "characters": len(snapshot.characters) if snapshot else 0,
+            "otd": len(snapshot.otd) if snapshot else 0
+        })
+        return metrics
+
+catalog_cache = CatalogCache()
+
+@register_periodic('catalog_snapshot', CATALOG_VERSION_POLL_SECONDS)
+def refresh_catalog_snapshot(db: Session):
+    """Pick up catalog changes from this and other processes"""
+    catalog_cache.refresh()
+
+@register_periodic('story_stats', STORY_STATS_CHECK_SECONDS)
+def refresh_story_stats(db: Session):
+    catalog_cache.refresh_stats()
@@ -0,0 +1,292 @@
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import json
+import mmap
+import os
+import struct
+from utils.pagination import sort_key
+
+# Catalog snapshot file: the catalog at one version, written once and memory-mapped
+# read-only by every worker, so the data lives once in the OS page cache however
+# many workers there are. Records are decoded only when a request touches them.
+#
+# Layout (little-endian):
+#   header   MAGIC, catalog version (q), version stamp length (I) + utf-8 stamp, section count (I)
+#   table    per section: name (32s), typecode (c), offset (Q), length (Q)
+#   sections 8-byte aligned; "B" sections are blobs, others are arrays of that typecode
+#
+# Per kind of record:
+#   <kind>.data     JSON records, back to back, in (created_at, id) order
+#   <kind>.offsets  Q[n + 1], record i is data[offsets[i]:offsets[i + 1]]
+# Per index (unique key -> record): <index>.keys q[], <index>.pos I[] (position in order)
+# Per group (key -> records):       <group>.keys q[], <group>.starts Q[keys + 1], <group>.pos I[]
+MAGIC = b"KCATSNP1"
+SECTION = struct.Struct("<32scQQ")
+_decode_json = json.JSONDecoder().decode
+
+class CachedCharacter(NamedTuple):
+    id: int
+    name: Optional[str]
+    persona: str
+    avatar_url: Optional[str]
+    created_at: Optional[datetime]
+
+class CachedTimeline(NamedTuple):
+    id: int
+    title: str
+    year_range: str
+    overview: Optional[str]
+    thumbnail_url: Optional[str]
+    main_character_id: Optional[int]
+    categories: Optional[list]
+    created_at: Optional[datetime]
+
+class CachedStory(NamedTuple):
+    id: int
+    timeline_id: Optional[int]
+    title: str
+    desc: Optional[str]
+    story_date: date
+    story_type: Optional[int]
+    thumbnail_url: Optional[str]
+    video_url: Optional[str]
+    created_at: Optional[datetime]
+
+class CachedTimestamp(NamedTuple):
+    id: int
+    story_id: int
+    time_sec: int
+    label: Optional[str]
+
+class CachedOnThisDay(NamedTuple):
+    id: int
+    date: date
+    title: str
+    short_desc: str
+    image_url: Optional[str]
+    story_id: Optional[int]
+    created_at: Optional[datetime]
+
+KINDS = {
+    "characters": CachedCharacter,
+    "timelines": CachedTimeline,
+    "stories": CachedStory,
+    "timestamps": CachedTimestamp,
+    "otd": CachedOnThisDay,
+}
+DATETIME_FIELDS = {"created_at"}
+DATE_FIELDS = {"story_date", "date"}
+
+def _encode(row: NamedTuple) -> bytes:
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in row]
+    return json.dumps(values, separators=(",", ":")).encode()
+
+def _decoder(record_type) -> Callable[[str], Any]:
+    parsers = {}
+    for index, field in enumerate(record_type._fields):
+        if field in DATETIME_FIELDS:
+            parsers[index] = datetime.fromisoformat
+        elif field in DATE_FIELDS:
+            parsers[index] = date.fromisoformat
+
+    def decode(raw: str):
+        values = _decode_json(raw)
+        for index, parse in parsers.items():
+            if values[index] is not None:
+                values[index] = parse(values[index])
+        return record_type(*values)
+    return decode
+
+def write_snapshot(path: str, version: int, stamp: str, rows: Dict[str, Iterable[NamedTuple]]):
+    """
+    Write the snapshot next to `path` and swap it in with os.replace(), so a worker
+    opening `path` sees either the old file or the new one, never a partial write.
+    Workers that already mapped the old file keep reading it until they reopen.
+    """
+    sections: List[Tuple[str, str, bytes]] = []
+
+    def add_array(name: str, typecode: str, values: Iterable[int]):
+        sections.append((name, typecode, array(typecode, values).tobytes()))
+
+    for kind, record_type in KINDS.items():
+        records = sorted(rows.get(kind, []), key=lambda row: sort_key(getattr(row, "created_at", None), row.id))
+        offsets, data = [0], bytearray()
+        for record in records:
+            data += _encode(record)
+            offsets.append(len(data))
+        sections.append((f"{kind}.data", "B", bytes(data)))
+        add_array(f"{kind}.offsets", "Q", offsets)
+
+        by_id = sorted(range(len(records)), key=lambda position: records[position].id)
+        add_array(f"{kind}.id.keys", "q", (records[position].id for position in by_id))
+        add_array(f"{kind}.id.pos", "I", by_id)
+
+        if kind == "otd":
+            by_date = sorted(range(len(records)), key=lambda position: records[position].date)
+            add_array("otd.date.keys", "q", (records[position].date.toordinal() for position in by_date))
+            add_array("otd.date.pos", "I", by_date)
+
+    # Stories of a timeline and timestamps of a story, each group in id order
+    for group, kind, key in (("stories.timeline", "stories", "timeline_id"), ("timestamps.story", "timestamps", "story_id")):
+        records = sorted(rows.get(kind, []), key=lambda row: sort_key(getattr(row, "created_at", None), row.id))
+        grouped: Dict[int, List[int]] = {}
+        for position in sorted(range(len(records)), key=lambda position: records[position].id):
+            group_key = getattr(records[position], key)
+            if group_key is not None:
+                grouped.setdefault(group_key, []).append(position)
+        keys = sorted(grouped)
+        starts = [0]
+        for group_key in keys:
+            starts.append(starts[-1] + len(grouped[group_key]))
+        add_array(f"{group}.keys", "q", keys)
+        add_array(f"{group}.starts", "Q", starts)
+        add_array(f"{group}.pos", "I", (position for group_key in keys for position in grouped[group_key]))
+
+    stamp_bytes = stamp.encode()
+    header = MAGIC + struct.pack("<qI", version, len(stamp_bytes)) + stamp_bytes + struct.pack("<I", len(sections))
+    offset = _align(len(header) + SECTION.size * len(sections))
+    table, layout = b"", []
+    for name, typecode, payload in sections:
+        table += SECTION.pack(name.encode(), typecode.encode(), offset, len(payload))
+        layout.append((offset, payload))
+        offset = _align(offset + len(payload))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(header + table)
+            for section_offset, payload in layout:
+                file.write(b"\0" * (section_offset - file.tell()))
+                file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except Exception:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+class RecordList(Sequence):
+    """Records of one kind in (created_at, id) order, decoded on access"""
+
+    def __init__(self, data: memoryview, offsets: memoryview, decode: Callable[[str], Any]):
+        self._data = data
+        self._offsets = offsets
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self._decode(str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8"))
+
+class RecordIndex:
+    """Unique integer key -> record"""
+
+    def __init__(self, records: RecordList, keys: memoryview, positions: memoryview):
+        self._records = records
+        self._keys = keys
+        self._positions = positions
+
+    def get(self, key: int, default=None):
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return self._records[self._positions[index]]
+        return default
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+class RecordGroups:
+    """Integer key -> list of records"""
+
+    def __init__(self, records: RecordList, keys: memoryview, starts: memoryview, positions: memoryview):
+        self._records = records
+        self._keys = keys
+        self._starts = starts
+        self._positions = positions
+
+    def get(self, key: int, default=None):
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return [self._records[position] for position in self._positions[self._starts[index]:self._starts[index + 1]]]
+        return default
+
+class CatalogSnapshot:
+    """A memory-mapped snapshot file; lists are sorted by (created_at, id) for keyset paging"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        position = len(MAGIC)
+        self.version, stamp_length = struct.unpack_from("<qI", view, position)
+        position += 12
+        self.stamp = bytes(view[position:position + stamp_length]).decode()
+        position += stamp_length
+        (section_count,) = struct.unpack_from("<I", view, position)
+        position += 4
+
+        sections: Dict[str, memoryview] = {}
+        for _ in range(section_count):
+            name, typecode, offset, length = SECTION.unpack_from(view, position)
+            position += SECTION.size
+            section = view[offset:offset + length]
+            typecode = typecode.decode()
+            sections[name.rstrip(b"\0").decode()] = section if typecode == "B" else section.cast(typecode)
+
+        def records(kind: str) -> RecordList:
+            return RecordList(sections[f"{kind}.data"], sections[f"{kind}.offsets"], _decoder(KINDS[kind]))
+
+        def index(records: RecordList, name: str) -> RecordIndex:
+            return RecordIndex(records, sections[f"{name}.keys"], sections[f"{name}.pos"])
+
+        def groups(records: RecordList, name: str) -> RecordGroups:
+            return RecordGroups(records, sections[f"{name}.keys"], sections[f"{name}.starts"], sections[f"{name}.pos"])
+
+        self.characters = records("characters")
+        self.timelines = records("timelines")
+        self.stories = records("stories")
+        self.otd = records("otd")
+        timestamps = records("timestamps")
+        self.characters_by_id = index(self.characters, "characters.id")
+        self.timelines_by_id = index(self.timelines, "timelines.id")
+        self.stories_by_id = index(self.stories, "stories.id")
+        self.otd_by_id = index(self.otd, "otd.id")
+        self._otd_by_date = index(self.otd, "otd.date")
+        self.stories_by_timeline = groups(self.stories, "stories.timeline")
+        self.timestamps_by_story = groups(timestamps, "timestamps.story")
+        self.size = len(self._map)
+
+    def main_character(self, timeline: CachedTimeline) -> Optional[CachedCharacter]:
+        if timeline.main_character_id is None:
+            return None
+        return self.characters_by_id.get(timeline.main_character_id)
+
+    def otd_on(self, day: date) -> Optional[CachedOnThisDay]:
+        return self._otd_by_date.get(day.toordinal())
+
+def open_snapshot(path: str) -> Optional[CatalogSnapshot]:
+    """The snapshot at `path`, or None when there is none or it can't be read"""
+    try:
+        return CatalogSnapshot(path)
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, struct.error, OSError) as e:
+        print(f"Ignoring unreadable catalog snapshot {path}: {e}")
+        return None
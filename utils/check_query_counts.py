@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Script to check that the stories/timelines, community and user list endpoints,
+and the badge evaluation behind them, run a constant number of SQL statements,
+however large the catalog is.
+Catalog reads served from the catalog cache should run none at all.
+Seeds a small and a large temporary catalog (timelines with main characters,
+stories with timestamps, quizzes with questions and options, bookmarks, joined
+communities with reported posts, followers, the user's progress), calls
+each endpoint against both and counts the statements it sends to the database.
+A count that grows with the catalog means an N+1 query crept back in.
+Usage: python utils/check_query_counts.py [small_size] [large_size]
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from db.models import (
+    get_db, engine, async_engine, User, Profile, Character, Timeline, Story, Timestamp,
+    Quiz, Question, Option, UserTimelineBookmark, Community, CommunityMember, Post, Report, UserFollow
+)
+from routers import stories_timelines, communities_posts, users
+from utils.auth import get_current_user, get_current_user_async
+from utils.catalog import catalog_cache
+from utils.identity_cache import CurrentUser
+from utils.progress import increment_progress
+from utils.badge_utils import update_user_badges, STORY_VIEW_METRICS
+
+# Endpoint -> most statements it may run, whatever the catalog size
+MAX_STATEMENTS = {
+    "/api/list/timelines": 3,
+    "/api/timelines/filter": 2,
+    "/api/list/stories": 1,
+    "/api/list/characters": 0,
+    "/api/list/otd": 0,
+    "/api/timeline/{timeline_id}/stories": 2,
+    "/api/story/{story_id}?track=false": 0,
+    "/api/list/quizzes": 3,
+    "/api/user/bookmarked-timelines": 4,
+    "/api/timeline/{timeline_id}?track=false": 1,
+    "/api/community/?limit=100": 2,
+    "/api/community/my-communities?limit=100": 1,
+    "/api/community/{community_id}": 2,
+    "/api/community/reports?limit=100": 4,
+    "/api/community/reports/queue?limit=100": 3,
+    "/api/auth/search?query={tag}&limit=100": 2,
+    "/api/auth/followers/{profile_id}?limit=100": 3,
+    "/api/auth/following/{profile_id}?limit=100": 3,
+    "/api/auth/user/{user_id}": 8,
+    "/api/auth/user/me": 10,
+    "/api/auth/user/streak": 2,
+}
+
+# update_user_badges call -> (changed_metrics hint, most statements it may run)
+BADGE_CHECKS = {
+    "update_user_badges()": (None, 4),
+    "update_user_badges(STORY_VIEW_METRICS)": (STORY_VIEW_METRICS, 4),
+}
+
+@contextmanager
+def count_statements():
+    """Count statements sent by both the sync and the async engine"""
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*args):
+        counter["statements"] += 1
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+def seed_catalog(db, user: User, tag: str, catalog: dict, size: int):
+    """
+    Grow `catalog` to `size` timelines, each with a main character, a bookmark and
+    a story with timestamps and a quiz, and as many communities joined by the user
+    (each reported along with one of its posts) and users following each other with the user
+    """
+    user_id = user.id
+    timelines, communities, followers = [], [], []
+    for i in range(len(catalog["timelines"]), size):
+        character = Character(name=f"{tag} character {i}", persona="Query count check")
+        timeline = Timeline(
+            title=f"{tag} timeline {i}", year_range="1900-2000", main_character=character,
+            categories=["Query count check"]
+        )
+        story = Story(title=f"{tag} story {i}", story_date=date.today(), timeline=timeline, views=0, likes=0)
+        story.timestamps = [Timestamp(time_sec=second, label=f"{second}s") for second in (0, 30, 60)]
+        story.quiz = Quiz(questions=[
+            Question(text=f"Question {q}", options=[Option(text=f"Option {o}", is_correct=o == 0) for o in range(4)])
+            for q in range(2)
+        ])
+        db.add(timeline)
+        timelines.append(timeline)
+
+        community = Community(name=f"{tag} community {i}", created_by=user_id, member_count=1)
+        community.members = [CommunityMember(user_id=user_id)]
+        community.posts = [Post(title=f"{tag} post {i}", created_by=user_id)]
+        db.add(community)
+        communities.append(community)
+
+        follower = User(email=f"{tag}-{i}@example.com", username=f"{tag}-{i}", password="-")
+        follower.profile = Profile(nickname=f"{tag} follower {i}")
+        follower.profile.following = [UserFollow(followed=user.profile)]
+        follower.profile.followers = [UserFollow(follower=user.profile)]
+        db.add(follower)
+        followers.append(follower)
+    db.flush()
+    db.add_all([UserTimelineBookmark(user_id=user_id, timeline_id=timeline.id) for timeline in timelines])
+    for community in communities:
+        db.add(Report(reporter_id=user_id, report_type="community", reported_item_id=community.id, reason="spam"))
+        db.add(Report(reporter_id=user_id, report_type="post", reported_item_id=community.posts[0].id, reason="spam"))
+    db.commit()
+    # One story and quiz completed per seeded timeline, so the user holds more badges in the large catalog
+    increment_progress(db, user_id, stories_completed=len(timelines), quizzes_completed=len(timelines))
+    db.commit()
+    catalog["timelines"] += timelines
+    catalog["communities"] += communities
+    catalog["users"] += followers
+
+def remove_catalog(db, catalog: dict):
+    for follower in catalog["users"]:
+        db.delete(follower)
+    for community in catalog["communities"]:
+        db.delete(community)
+    for timeline in catalog["timelines"]:
+        character = timeline.main_character
+        db.delete(timeline)
+        if character:
+            db.delete(character)
+    db.commit()
+
+def measure(client: TestClient, ids: dict):
+    counts = {}
+    for endpoint in MAX_STATEMENTS:
+        # Warm up first, so one-off work (rank index load, default badges) isn't counted
+        client.get(endpoint.format(**ids))
+        with count_statements() as counter:
+            response = client.get(endpoint.format(**ids))
+        if response.status_code != 200:
+            raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+        counts[endpoint] = counter["statements"]
+    return counts
+
+def measure_badges(db, user_id: int):
+    counts = {}
+    for name, (changed_metrics, _) in BADGE_CHECKS.items():
+        # Warm up first, so badges earned from the newly seeded progress aren't counted
+        update_user_badges(user_id, db, changed_metrics)
+        db.commit()
+        with count_statements() as counter:
+            update_user_badges(user_id, db, changed_metrics)
+            db.commit()
+        counts[name] = counter["statements"]
+    return counts
+
+def check_query_counts(small_size: int = 5, large_size: int = 50):
+    """Compare statement counts per endpoint between a small and a large catalog"""
+    db = next(get_db())
+    tag = f"qc-{uuid4().hex[:8]}"
+
+    # Admin, for the moderation endpoints
+    user = User(email=f"{tag}@example.com", username=tag, password="-", is_verified=True, is_admin=True)
+    user.profile = Profile()
+    db.add(user)
+    db.commit()
+    current_user = CurrentUser.from_model(user)
+
+    app = FastAPI()
+    app.include_router(stories_timelines.router)
+    app.include_router(communities_posts.router)
+    app.include_router(users.router)
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    app.dependency_overrides[get_current_user_async] = lambda: current_user
+
+    catalog = {"timelines": [], "communities": [], "users": []}
+    try:
+        results = {}
+        # One client for every request, so async connections stay on one event loop
+        with TestClient(app) as client:
+            for size in (small_size, large_size):
+                seed_catalog(db, user, tag, catalog, size)
+                # No background worker here, so swap in the new catalog as it would
+                catalog_cache.refresh()
+                results[size] = measure(client, {
+                    "tag": tag,
+                    "timeline_id": catalog["timelines"][0].id,
+                    "story_id": catalog["timelines"][0].stories[0].id,
+                    "community_id": catalog["communities"][0].id,
+                    "profile_id": user.profile.id,
+                    "user_id": user.id
+                })
+                results[size].update(measure_badges(db, user.id))
+        print(f"Statements per endpoint with {small_size} and {large_size} of each seeded item")
+
+        failures = 0
+        limits = {**MAX_STATEMENTS, **{name: limit for name, (_, limit) in BADGE_CHECKS.items()}}
+        for endpoint, limit in limits.items():
+            small, large = results[small_size][endpoint], results[large_size][endpoint]
+            ok = small == large and large <= limit
+            failures += not ok
+            print(f"  {'✅' if ok else '❌'} {endpoint:<46} {small:>3} / {large:>3}  (max {limit})")
+
+        if failures:
+            print(f"❌ {failures} endpoints or badge checks don't run a constant number of statements")
+        else:
+            print("✅ Every endpoint runs a constant number of statements")
+
+    except Exception as e:
+        print(f"❌ Error checking query counts: {str(e)}")
+    finally:
+        db.rollback()
+        remove_catalog(db, catalog)
+        db.delete(user)
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:3]]
+    check_query_counts(*sizes)
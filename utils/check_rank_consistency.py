@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Script to check the in-process leaderboard index against SQL ground truth.
+Loads the rank service from the profiles table, then compares its rank,
+percentile and top-N answers with COUNT(*) / ORDER BY queries over the same
+points balance (Profile.points plus pending points events).
+Usage: python utils/check_rank_consistency.py [sample_size]
+"""
+
+import sys
+import os
+import random
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import get_db, Profile
+from utils.rank_service import RankService
+from utils.points import points_balance
+
+TOP_N = 50
+
+def check_rank_consistency(sample_size: int = 1000):
+    """Compare rank service answers with SQL for a sample of users and the top of the board"""
+    db = next(get_db())
+
+    try:
+        service = RankService()
+        service.resync(db)
+
+        total_users = db.query(Profile).count()
+        balance = points_balance()
+        profiles = db.query(Profile.user_id, balance).all()
+        sample = random.sample(profiles, min(sample_size, len(profiles)))
+        print(f"Checking {len(sample)} of {total_users} users")
+
+        mismatches = 0
+        if service.total() != total_users:
+            print(f"  total users: service {service.total()} != sql {total_users}")
+            mismatches += 1
+
+        for user_id, points in sample:
+            higher_ranked_count = db.query(Profile).filter(balance > (points or 0)).count()
+            expected_rank = higher_ranked_count + 1
+            expected_percentile = round((1 - (expected_rank / total_users)) * 100) if total_users > 0 else 0
+
+            rank_info = service.get_rank_info(user_id)
+            if rank_info != {"rank": expected_rank, "total_users": total_users, "percentile": expected_percentile}:
+                print(f"  user {user_id}: service {rank_info} != sql rank {expected_rank}, percentile {expected_percentile}")
+                mismatches += 1
+
+        # Ties may be ordered differently, so compare the points sequence
+        expected_top = [points or 0 for (points,) in db.query(balance).order_by(balance.desc().nulls_last()).limit(TOP_N)]
+        service_top = [points for _, points in service.top(TOP_N)]
+        if service_top != expected_top:
+            print(f"  top {TOP_N}: service {service_top} != sql {expected_top}")
+            mismatches += 1
+
+        if mismatches:
+            print(f"❌ Found {mismatches} mismatches")
+        else:
+            print(f"✅ Rank service matches SQL for {len(sample)} users and the top {TOP_N}")
+
+    except Exception as e:
+        print(f"❌ Error checking rank consistency: {str(e)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    check_rank_consistency(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
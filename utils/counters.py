@@ -0,0 +1,83 @@
+from threading import Lock
+from typing import Dict, Iterable, Optional
+import time
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.orm import Session
+from db.models import Story
+from utils.background import register_periodic
+
+# Write-behind counters: hot increments (story views and likes) are coalesced in
+# memory and written with one additive UPDATE per row every few seconds, instead
+# of every request taking the row lock. Additive updates let several processes
+# flush their own buffers into the same rows.
+STORY_COUNTER_FLUSH_SECONDS = 5
+
+class CounterBuffer:
+    """Pending integer deltas for `columns` of `model`, keyed by primary key"""
+
+    def __init__(self, model, columns: Iterable[str]):
+        self.model = model
+        self.columns = tuple(columns)
+        self._pending: Dict[int, Dict[str, int]] = {}
+        self._lock = Lock()
+        # monotonic time of the last successful flush, for caches of the stored values
+        self.flushed_at: Optional[float] = None
+
+    def increment(self, row_id: int, column: str, delta: int = 1):
+        with self._lock:
+            deltas = self._pending.setdefault(row_id, dict.fromkeys(self.columns, 0))
+            deltas[column] += delta
+
+    def pending(self, row_id: int, column: str) -> int:
+        with self._lock:
+            deltas = self._pending.get(row_id)
+            return deltas[column] if deltas else 0
+
+    def value(self, row, column: str) -> int:
+        """Stored value plus buffered increments not yet flushed, never below zero"""
+        return max(0, (getattr(row, column) or 0) + self.pending(row.id, column))
+
+    def _take(self) -> Dict[int, Dict[str, int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def _restore(self, pending: Dict[int, Dict[str, int]]):
+        """Put deltas back after a failed flush so the next one retries them"""
+        for row_id, deltas in pending.items():
+            for column, delta in deltas.items():
+                self.increment(row_id, column, delta)
+
+    def flush(self, db: Session) -> int:
+        """Write every buffered delta with one UPDATE per row; returns the number of rows flushed"""
+        pending = self._take()
+        if not pending:
+            return 0
+
+        table = self.model.__table__
+        # Deltas can be negative (unlikes); counters are clamped at zero
+        values = {}
+        for column in self.columns:
+            updated = func.coalesce(table.c[column], 0) + bindparam(f'delta_{column}')
+            values[column] = case((updated < 0, 0), else_=updated)
+        try:
+            db.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(**values),
+                [
+                    {'row_id': row_id, **{f'delta_{column}': delta for column, delta in deltas.items()}}
+                    for row_id, deltas in pending.items()
+                ]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(pending)
+            raise
+        self.flushed_at = time.monotonic()
+        return len(pending)
+
+story_counters = CounterBuffer(Story, ('views', 'likes'))
+
+@register_periodic('story_counters', STORY_COUNTER_FLUSH_SECONDS)
+def flush_story_counters(db: Session):
+    story_counters.flush(db)
@@ -1,10 +1,15 @@
 import os
 import shutil
 import uuid
-from fastapi import UploadFile
+import asyncio
+from typing import BinaryIO, Optional
+from fastapi import UploadFile, HTTPException, status
+from fastapi.responses import JSONResponse
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 from .s3_handler import (
     upload_image_to_s3, 
     upload_video_to_s3, 
@@ -20,9 +25,88 @@ MEDIA_ROOT = Path("media")
 IMAGES_DIR = MEDIA_ROOT / "images"
 VIDEOS_DIR = MEDIA_ROOT / "videos"
 
+# Original story videos waiting to be transcoded (utils/transcoder.py), outside
+# of the publicly served media directory
+PENDING_VIDEOS_DIR = Path(os.getenv("PENDING_VIDEOS_DIR", "uploads/videos"))
+
 # Create directories if they don't exist
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
+PENDING_VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Upload limits, per file and for a whole request. Uploads are spooled to disk by
+# the multipart parser and copied in chunks from there, so memory per upload stays
+# at about one chunk whatever the file size.
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_VIDEO_UPLOAD_BYTES = int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", 1024 * 1024 * 1024))
+# A video, its thumbnail and the form fields
+MAX_UPLOAD_REQUEST_BYTES = MAX_VIDEO_UPLOAD_BYTES + MAX_IMAGE_UPLOAD_BYTES + 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with a 413 before they are parsed: up
+    front from Content-Length, or as soon as a chunked body goes over the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Request body is larger than {self.max_bytes // (1024 * 1024)} MiB"
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the endpoint's body parsing, so it is answered like any HTTPException
+                    raise _too_large(detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+def upload_size(upload_file: UploadFile) -> int:
+    """Size of an uploaded file, without reading it"""
+    if upload_file.size is not None:
+        return upload_file.size
+    position = upload_file.file.tell()
+    upload_file.file.seek(0, os.SEEK_END)
+    size = upload_file.file.tell()
+    upload_file.file.seek(position)
+    return size
+
+def ensure_upload_size(upload_file: Optional[UploadFile], max_bytes: int):
+    """413 when the uploaded file is larger than max_bytes, before anything is stored"""
+    if upload_file and upload_size(upload_file) > max_bytes:
+        raise _too_large(f"{upload_file.filename} is larger than {max_bytes // (1024 * 1024)} MiB")
+
+def copy_in_chunks(source: BinaryIO, destination: str):
+    """Blocking chunked copy from the start of `source`; removes the partial file on failure"""
+    source.seek(0)
+    try:
+        with open(destination, "wb") as buffer:
+            shutil.copyfileobj(source, buffer, UPLOAD_CHUNK_SIZE)
+    except Exception:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
 
 async def save_upload_file(upload_file: UploadFile, directory: Path) -> str:
     """
@@ -45,9 +129,8 @@ async def save_upload_file(upload_file: UploadFile, directory: Path) -> str:
     # Create the full file path
     file_path = directory / unique_filename
     
-    # Save the file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+    # Save the file in chunks, off the event loop
+    await asyncio.to_thread(copy_in_chunks, upload_file.file, str(file_path))
     
     # Return the relative path from the media root
     return str(file_path.relative_to(MEDIA_ROOT.parent))
@@ -56,6 +139,7 @@ async def save_image(image: UploadFile) -> str:
     """Save an uploaded image and return its path or S3 URL"""
     if not image:
         return None
+    ensure_upload_size(image, MAX_IMAGE_UPLOAD_BYTES)
     
     # Try S3 upload first if enabled
     if S3_ENABLED:
@@ -70,6 +154,7 @@ async def save_video(video: UploadFile) -> str:
     """Save an uploaded video and return its path or S3 URL"""
     if not video:
         return None
+    ensure_upload_size(video, MAX_VIDEO_UPLOAD_BYTES)
     
     if S3_ENABLED:
         s3_url = await upload_video_to_s3(video)
@@ -78,6 +163,16 @@ async def save_video(video: UploadFile) -> str:
     
     return await save_upload_file(video, VIDEOS_DIR)
 
+async def save_pending_video(video: UploadFile) -> str:
+    """Store an uploaded video as it is for the transcoding queue and return its local path"""
+    if not video:
+        return None
+    ensure_upload_size(video, MAX_VIDEO_UPLOAD_BYTES)
+    
+    file_path = PENDING_VIDEOS_DIR / f"{uuid.uuid4()}{os.path.splitext(video.filename)[1]}"
+    await asyncio.to_thread(copy_in_chunks, video.file, str(file_path))
+    return str(file_path)
+
 def delete_file(file_path: str) -> bool:
     """Delete a file given its path or S3 URL"""
     if not file_path:
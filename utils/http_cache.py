@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+import hashlib
+from fastapi import Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from db.models import IS_SQLITE, User, UserStateVersion, UserTimelineView, UserTimelineBookmark, UserStoryView, UserStoryLike
+from utils.catalog import catalog_version
+
+# Conditional GET: catalog endpoints send a strong ETag built from the catalog
+# version stamp (utils/catalog.py) plus, where the payload has per-user flags,
+# the user's state version. A client that sends it back in If-None-Match gets a
+# 304 before anything is loaded or serialized. Last-Modified / If-Modified-Since
+# work the same way with the time of the last bump, rounded up to the second HTTP
+# dates are limited to, and only sent once that second is over: a second bump
+# within it would otherwise share the date and be answered with a stale 304.
+# Bump RESPONSE_FORMAT when the shape of a cached payload changes, so clients
+# don't keep a stale body under an unchanged version.
+RESPONSE_FORMAT = "1"
+# Authenticated responses: clients may store them but must revalidate every time
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# Public catalog responses: shared caches may serve them for a minute
+PUBLIC_CACHE_CONTROL = "public, max-age=60"
+
+USER_STATE_MODELS = (UserTimelineView, UserTimelineBookmark, UserStoryView, UserStoryLike)
+
+def bump_user_state_version(session: Session, user_id: int):
+    """Bump the user's state version inside the session's transaction, once per transaction"""
+    bumped = session.info.setdefault("user_state_bumped", set())
+    if user_id in bumped:
+        return
+    now = datetime.utcnow()
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    stmt = insert(UserStateVersion).values(user_id=user_id, version=1, updated_at=now).on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': UserStateVersion.version + 1, 'updated_at': now}
+    )
+    session.connection().execute(stmt)
+    bumped.add(user_id)
+
+# Session hooks: views, likes and bookmarks made through the ORM bump the owner's
+# state version. Bulk inserts (POST /api/events/views) call bump_user_state_version().
+@event.listens_for(Session, "after_flush")
+def _detect_user_state_changes(session, flush_context):
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    user_ids = {
+        obj.user_id
+        for obj in (*session.new, *session.deleted, *session.dirty)
+        if isinstance(obj, USER_STATE_MODELS) and obj.user_id is not None
+    }
+    for user_id in sorted(user_ids - deleted_users):
+        bump_user_state_version(session, user_id)
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_user_state_changes(session):
+    session.info.pop("user_state_bumped", None)
+
+def user_state(db: Session, user_id: int) -> Tuple[str, Optional[datetime]]:
+    """(stamp, updated_at) of the user's views, likes and bookmarks"""
+    row = db.query(UserStateVersion.version, UserStateVersion.updated_at).filter(UserStateVersion.user_id == user_id).first()
+    version, updated_at = row if row else (0, None)
+    return f"{version}:{updated_at.isoformat() if updated_at else ''}", updated_at
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+def _whole_second(value: datetime) -> datetime:
+    """`value` rounded up to the second"""
+    second = value.replace(microsecond=0)
+    return second + timedelta(seconds=1) if value.microsecond else second
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/"x" matches "x" """
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    if "*" in candidates:
+        return True
+    return etag in {candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates}
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc) <= since
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    parts: Iterable[object],
+    last_modified: Optional[datetime] = None,
+    cache_control: str = PRIVATE_CACHE_CONTROL
+) -> Optional[Response]:
+    """
+    Set ETag / Last-Modified / Cache-Control on `response` and return a 304 to send
+    instead when the client's copy is current, or None to build the body as usual.
+    `parts` must cover everything the payload depends on besides the URL.
+    """
+    digest = hashlib.sha256()
+    for part in (RESPONSE_FORMAT, request.url.path, request.url.query, *parts):
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    etag = f'"{digest.hexdigest()[:32]}"'
+
+    if last_modified is not None:
+        last_modified = _whole_second(last_modified)
+        if last_modified > datetime.utcnow():
+            last_modified = None
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        # If-Modified-Since only counts when there is no If-None-Match
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+def catalog_response(request: Request, response: Response, *parts, cache_control: str = PRIVATE_CACHE_CONTROL) -> Optional[Response]:
+    """conditional_response() for payloads that only depend on the catalog"""
+    _, stamp = catalog_version.current_state()
+    return conditional_response(request, response, (stamp, *parts), catalog_version.updated_at(), cache_control)
+
+def user_catalog_response(request: Request, response: Response, db: Session, user_id: int, *parts, use_last_modified: bool = True) -> Optional[Response]:
+    """
+    conditional_response() for catalog payloads with the user's views, likes or bookmarks
+    overlaid. Payloads with parts that have no modification time (story counters) pass
+    use_last_modified=False so If-Modified-Since can't skip over them.
+    """
+    _, stamp = catalog_version.current_state()
+    user_stamp, user_updated_at = user_state(db, user_id)
+    updated_at = [value for value in (catalog_version.updated_at(), user_updated_at) if value is not None]
+    last_modified = max(updated_at) if updated_at and use_last_modified else None
+    return conditional_response(request, response, (stamp, user_id, user_stamp, *parts), last_modified)
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Iterable, Optional
+import time
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+from db.models import User, Profile, IdentityInvalidation
+from utils.background import register_periodic
+
+# Snapshots only hold identity fields. Points, streaks and badges change on almost
+# every request, so handlers that need them still read the Profile row.
+IDENTITY_CACHE_TTL_SECONDS = 60
+IDENTITY_CACHE_MAX_SIZE = 10000
+
+# Every process has its own cache, so a change to a cached field (or the password)
+# is logged in identity_invalidations in the same transaction, and the background
+# worker of each process polls the log to drop its copies. A deactivation, delete or
+# password change made on one worker stops authenticating on the others within
+# IDENTITY_INVALIDATION_POLL_SECONDS rather than the cache TTL.
+IDENTITY_INVALIDATION_POLL_SECONDS = 2
+# Each poll looks this far behind the previous one, for transactions that commit a
+# while after they flush and for clock skew between hosts
+IDENTITY_INVALIDATION_LOOKBACK_SECONDS = 30
+# Older log rows can no longer match a cached snapshot
+IDENTITY_INVALIDATION_RETENTION_SECONDS = 3600
+
+@dataclass(frozen=True)
+class CachedProfile:
+    id: int
+    user_id: int
+    nickname: Optional[str]
+    avatar_url: Optional[str]
+    is_premium: Optional[bool]
+    language_preference: Optional[object]
+    pronouns: Optional[object]
+    location: Optional[object]
+
+    @classmethod
+    def from_model(cls, profile) -> "CachedProfile":
+        return cls(
+            id=profile.id,
+            user_id=profile.user_id,
+            nickname=profile.nickname,
+            avatar_url=profile.avatar_url,
+            is_premium=profile.is_premium,
+            language_preference=profile.language_preference,
+            pronouns=profile.pronouns,
+            location=profile.location
+        )
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Read-only snapshot of the authenticated user, safe to share across requests"""
+    id: int
+    email: str
+    username: Optional[str]
+    joined_at: Optional[datetime]
+    is_verified: Optional[bool]
+    is_active: Optional[bool]
+    is_admin: Optional[bool]
+    profile: Optional[CachedProfile]
+
+    @classmethod
+    def from_model(cls, user) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            joined_at=user.joined_at,
+            is_verified=user.is_verified,
+            is_active=user.is_active,
+            is_admin=user.is_admin,
+            profile=CachedProfile.from_model(user.profile) if user.profile else None
+        )
+
+class IdentityCache:
+    """Process-level TTL/LRU cache of CurrentUser snapshots keyed by user_id"""
+
+    def __init__(self, ttl_seconds: int = IDENTITY_CACHE_TTL_SECONDS, max_size: int = IDENTITY_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def set(self, snapshot: CurrentUser):
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            # Evict least recently used entries once over capacity
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+identity_cache = IdentityCache()
+
+def invalidate_user(user_id: Optional[int]):
+    """Drop a user's cached snapshot after their user or profile row changes"""
+    if user_id is not None:
+        identity_cache.invalidate(user_id)
+
+# Columns whose change makes a cached snapshot stale
+_USER_COLUMNS = {field.name for field in fields(CurrentUser)} - {"profile"} | {"password"}
+_PROFILE_COLUMNS = {field.name for field in fields(CachedProfile)}
+
+def record_identity_change(session: Session, user_ids: Iterable[int]):
+    """
+    Log users whose snapshot goes stale with the session's transaction. The ORM hooks
+    below call it; bulk Query.update()s on users or profiles call it themselves.
+    """
+    changed = session.info.setdefault("identity_changed", set())
+    user_ids = set(user_ids) - changed
+    if not user_ids:
+        return
+    now = datetime.utcnow()
+    # On the connection, not session.execute(), so it stays out of the ORM hooks
+    session.connection().execute(
+        insert(IdentityInvalidation),
+        [{"user_id": user_id, "created_at": now} for user_id in sorted(user_ids)]
+    )
+    changed.update(user_ids)
+
+def _changed_columns(obj, columns) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+@event.listens_for(Session, "after_flush")
+def _detect_identity_changes(session, flush_context):
+    user_ids = set()
+    for obj in session.dirty:
+        if isinstance(obj, User) and _changed_columns(obj, _USER_COLUMNS):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Profile) and _changed_columns(obj, _PROFILE_COLUMNS):
+            user_ids.add(obj.user_id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Profile):
+            user_ids.add(obj.user_id)
+    user_ids.discard(None)
+    if user_ids:
+        record_identity_change(session, user_ids)
+
+@event.listens_for(Session, "after_commit")
+def _apply_identity_changes(session):
+    # This process doesn't wait for its own poll
+    for user_id in session.info.pop("identity_changed", ()):
+        identity_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_identity_changes(session):
+    session.info.pop("identity_changed", None)
+
+_polled_at: Optional[datetime] = None
+
+@register_periodic('identity_invalidations', IDENTITY_INVALIDATION_POLL_SECONDS)
+def poll_identity_invalidations(db: Session):
+    """Drop snapshots of users changed by any process since the last poll"""
+    global _polled_at
+    started_at = datetime.utcnow()
+    if _polled_at is None:
+        # Snapshots cached before the first poll may predate changes it would miss
+        identity_cache.clear()
+    else:
+        since = _polled_at - timedelta(seconds=IDENTITY_INVALIDATION_LOOKBACK_SECONDS)
+        for (user_id,) in db.query(IdentityInvalidation.user_id).filter(IdentityInvalidation.created_at > since).distinct():
+            identity_cache.invalidate(user_id)
+    _polled_at = started_at
+
+@register_periodic('identity_invalidations_prune', IDENTITY_INVALIDATION_RETENTION_SECONDS)
+def prune_identity_invalidations(db: Session):
+    cutoff = datetime.utcnow() - timedelta(seconds=IDENTITY_INVALIDATION_RETENTION_SECONDS)
+    db.query(IdentityInvalidation).filter(IdentityInvalidation.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,86 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+import json
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Keyset pagination over (timestamp, id). Clients pass the opaque `after` cursor
+# from the X-Next-Cursor header (or next_cursor field) to get the next page; each
+# page is an index range scan, so page 10,000 costs the same as page 1.
+# Endpoints that used to return everything still do when no limit/after is given.
+# The timestamp columns paged this way are NOT NULL: a NULL would sort outside the
+# tuple comparison and couldn't be written into a cursor.
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset(query, created_column, id_column, after: Optional[str] = None, limit: Optional[int] = None, descending: bool = False, offset: int = 0):
+    """
+    Order `query` (a Query or select()) by (created_column, id_column) and start it
+    after the cursor. Fetches one extra row so page() can tell whether there is more.
+    `offset` is only for endpoints that still accept the old skip parameter.
+    Returns (query, limit) where limit is None when the caller asked for everything.
+    """
+    if descending:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(created_column, id_column)
+
+    if after:
+        created_at, row_id = decode_cursor(after)
+        position = tuple_(created_column, id_column)
+        query = query.where(position < tuple_(created_at, row_id) if descending else position > tuple_(created_at, row_id))
+
+    if offset:
+        query = query.offset(offset)
+    if limit is None and after is not None:
+        limit = DEFAULT_PAGE_LIMIT
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query, limit
+
+def page(rows: List[Any], limit: Optional[int], created_attr: str = "created_at", id_attr: str = "id") -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page, if any"""
+    if limit is None or len(rows) <= limit:
+        return list(rows), None
+    rows = list(rows[:limit])
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
+
+def paginate(query, created_column, id_column, after: Optional[str] = None, limit: Optional[int] = None, descending: bool = False, offset: int = 0) -> Tuple[List[Any], Optional[str]]:
+    """keyset() + page() for a sync ORM Query"""
+    query, limit = keyset(query, created_column, id_column, after, limit, descending, offset)
+    return page(query.all(), limit, created_column.key, id_column.key)
+
+def sort_key(created_at: Optional[datetime], row_id: int) -> Tuple[bool, datetime, int]:
+    """(created_at, id) ordering for rows held in memory, NULL timestamps last like Postgres"""
+    return (created_at is None, created_at or datetime.min, row_id)
+
+def paginate_sorted(rows: List[Any], after: Optional[str] = None, limit: Optional[int] = None, created_attr: str = "created_at", id_attr: str = "id") -> Tuple[List[Any], Optional[str]]:
+    """paginate() for rows already in memory, sorted ascending by sort_key()"""
+    start = 0
+    if after:
+        created_at, row_id = decode_cursor(after)
+        start = bisect_right(rows, sort_key(created_at, row_id), key=lambda row: sort_key(getattr(row, created_attr), getattr(row, id_attr)))
+    if limit is None and after is not None:
+        limit = DEFAULT_PAGE_LIMIT
+    end = None if limit is None else start + limit + 1
+    return page(rows[start:end], limit, created_attr, id_attr)
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+from db.models import PointsEvent, Profile
+from utils.background import register_periodic
+
+# Points are never written with `profile.points += N` on the request path: awards
+# are inserted into points_events and folded into Profile.points in batches, so
+# concurrent requests for one user don't contend on (or overwrite) the profile row.
+POINTS_AGGREGATION_INTERVAL_SECONDS = 5
+POINTS_AGGREGATION_BATCH_SIZE = 5000
+
+# Ledger reasons
+POINTS_LOGIN_STREAK = 'login_streak'
+POINTS_STORY_VIEW = 'story_view'
+POINTS_QUIZ = 'quiz'
+POINTS_GAME = 'game'
+
+def award_points(db, user_id: int, delta: int, reason: str, source_id: Optional[int] = None):
+    """Record a points award in the caller's transaction (Session or AsyncSession)"""
+    if delta:
+        db.add(PointsEvent(user_id=user_id, delta=delta, reason=reason, source_id=source_id))
+
+def pending_points(user_id_column=Profile.user_id):
+    """Sum of a user's events not yet folded into Profile.points"""
+    return func.coalesce(
+        select(func.sum(PointsEvent.delta)).where(
+            PointsEvent.user_id == user_id_column,
+            PointsEvent.aggregated_at.is_(None)
+        ).scalar_subquery(),
+        0
+    )
+
+def points_balance():
+    """
+    Profile.points plus un-aggregated events, as one column expression.
+    Reading both in one statement keeps the balance consistent while the
+    aggregator moves events into the profile.
+    """
+    return (Profile.points + pending_points()).label('points')
+
+def get_points_balance(user_id: int, db: Session) -> Optional[int]:
+    return db.query(points_balance()).filter(Profile.user_id == user_id).scalar()
+
+async def get_points_balance_async(user_id: int, db) -> Optional[int]:
+    return (await db.execute(select(points_balance()).where(Profile.user_id == user_id))).scalar_one_or_none()
+
+def aggregate_points_events(db: Session, batch_size: int = POINTS_AGGREGATION_BATCH_SIZE) -> int:
+    """Fold one batch of pending events into Profile.points; returns how many were folded"""
+    events = db.query(PointsEvent.id, PointsEvent.user_id, PointsEvent.delta).filter(
+        PointsEvent.aggregated_at.is_(None)
+    ).order_by(PointsEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not events:
+        return 0
+
+    deltas: Dict[int, int] = {}
+    for _, user_id, delta in events:
+        deltas[user_id] = deltas.get(user_id, 0) + delta
+
+    profiles = Profile.__table__
+    db.execute(
+        update(profiles).where(profiles.c.user_id == bindparam('target_user_id')).values(
+            points=profiles.c.points + bindparam('delta')
+        ),
+        [{'target_user_id': user_id, 'delta': delta} for user_id, delta in deltas.items()]
+    )
+    db.query(PointsEvent).filter(PointsEvent.id.in_([event_id for event_id, _, _ in events])).update(
+        {PointsEvent.aggregated_at: datetime.utcnow()}, synchronize_session=False
+    )
+    # Balances don't change, so the rank index (which ranks by balance) has nothing to update
+    db.commit()
+    return len(events)
+
+@register_periodic('points_aggregation', POINTS_AGGREGATION_INTERVAL_SECONDS)
+def aggregate_all_points_events(db: Session):
+    """Fold every pending event, one batch at a time"""
+    while aggregate_points_events(db) == POINTS_AGGREGATION_BATCH_SIZE:
+        pass
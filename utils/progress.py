@@ -0,0 +1,273 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Any
+from sqlalchemy import func, select, case
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from db.models import (
+    UserProgress, UserTimelineProgress, UserStoryView, UserTimelineView, QuizAttempt, StandAloneGameAttempt, StandAloneGameQuestion,
+    GameTypes, Story, Timeline, IS_SQLITE
+)
+
+# Counters that are bumped by plain addition
+PROGRESS_COUNTERS = ('stories_completed', 'quizzes_completed', 'games_played', 'high_score_games')
+
+def game_type_bit(game_type) -> int:
+    """Bit for a game type in UserProgress.game_type_mask"""
+    if isinstance(game_type, str):
+        game_type = GameTypes[game_type]
+    return 1 << int(game_type)
+
+def count_game_types(game_type_mask: Optional[int]) -> int:
+    return bin(game_type_mask or 0).count("1")
+
+def _insert(values: Dict[str, Any], model=UserProgress):
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    return insert(model).values(**values)
+
+def progress_increment(user_id: int, game_type_mask: int = 0, **deltas):
+    """
+    Build an upsert that adds `deltas` to a user's counters in one statement.
+    Executing it inside the caller's transaction keeps the counters in step
+    with the activity row being inserted. Every call is a qualifying activity
+    for badge retention, so it also stamps last_qualifying_activity_at.
+    """
+    now = datetime.utcnow()
+    values = {counter: deltas.get(counter, 0) for counter in PROGRESS_COUNTERS}
+    stmt = _insert({
+        'user_id': user_id,
+        'game_type_mask': game_type_mask,
+        'last_qualifying_activity_at': now,
+        'updated_at': now,
+        **values
+    })
+    table = UserProgress.__table__
+    set_ = {counter: table.c[counter] + stmt.excluded[counter] for counter in deltas}
+    set_['game_type_mask'] = table.c.game_type_mask.op('|')(stmt.excluded.game_type_mask)
+    set_['last_qualifying_activity_at'] = stmt.excluded.last_qualifying_activity_at
+    set_['updated_at'] = stmt.excluded.updated_at
+    return stmt.on_conflict_do_update(index_elements=[UserProgress.user_id], set_=set_)
+
+def increment_progress(db: Session, user_id: int, game_type_mask: int = 0, **deltas):
+    db.execute(progress_increment(user_id, game_type_mask, **deltas))
+
+def get_progress_counters(user_id: int, db: Session) -> Dict[str, int]:
+    """Read a user's counters in one row lookup (all zero if the user has no activity yet)"""
+    row = db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
+    counters = {counter: getattr(row, counter) if row else 0 for counter in PROGRESS_COUNTERS}
+    counters['game_types_played'] = count_game_types(row.game_type_mask if row else 0)
+    counters['last_qualifying_activity_at'] = row.last_qualifying_activity_at if row else None
+    return counters
+
+def compute_progress_counters(db: Session, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """Recompute counters from the raw activity tables with one GROUP BY per table"""
+    user_ids = list(user_ids) if user_ids is not None else None
+    counters: Dict[int, Dict[str, int]] = {}
+
+    def row_for(user_id):
+        if user_id not in counters:
+            counters[user_id] = {counter: 0 for counter in PROGRESS_COUNTERS}
+            counters[user_id]['game_type_mask'] = 0
+            counters[user_id]['last_qualifying_activity_at'] = None
+        return counters[user_id]
+
+    def touch(user_id, activity_at):
+        row = row_for(user_id)
+        if activity_at and (row['last_qualifying_activity_at'] is None or activity_at > row['last_qualifying_activity_at']):
+            row['last_qualifying_activity_at'] = activity_at
+
+    def scoped(query, column):
+        return query.filter(column.in_(user_ids)) if user_ids is not None else query
+
+    story_views = scoped(
+        db.query(UserStoryView.user_id, func.count(), func.max(UserStoryView.viewed_at)).filter(UserStoryView.is_seen == True),
+        UserStoryView.user_id
+    ).group_by(UserStoryView.user_id)
+    for user_id, count, last_viewed_at in story_views:
+        row_for(user_id)['stories_completed'] = count
+        touch(user_id, last_viewed_at)
+
+    timeline_views = scoped(
+        db.query(UserTimelineView.user_id, func.max(UserTimelineView.viewed_at)),
+        UserTimelineView.user_id
+    ).group_by(UserTimelineView.user_id)
+    for user_id, last_viewed_at in timeline_views:
+        touch(user_id, last_viewed_at)
+
+    quizzes = scoped(
+        db.query(QuizAttempt.user_id, func.count(), func.max(QuizAttempt.completed_at)).filter(QuizAttempt.completed == True),
+        QuizAttempt.user_id
+    ).group_by(QuizAttempt.user_id)
+    for user_id, count, last_completed_at in quizzes:
+        row_for(user_id)['quizzes_completed'] = count
+        touch(user_id, last_completed_at)
+
+    games = scoped(
+        db.query(
+            StandAloneGameAttempt.user_id,
+            func.count(),
+            func.count().filter(StandAloneGameAttempt.is_correct == True),
+            func.max(StandAloneGameAttempt.created_at)
+        ),
+        StandAloneGameAttempt.user_id
+    ).group_by(StandAloneGameAttempt.user_id)
+    for user_id, played, correct, last_played_at in games:
+        row_for(user_id)['games_played'] = played
+        row_for(user_id)['high_score_games'] = correct
+        touch(user_id, last_played_at)
+
+    game_types = scoped(
+        db.query(StandAloneGameAttempt.user_id, StandAloneGameQuestion.game_type).join(
+            StandAloneGameQuestion, StandAloneGameAttempt.game_id == StandAloneGameQuestion.id
+        ),
+        StandAloneGameAttempt.user_id
+    ).distinct()
+    for user_id, game_type in game_types:
+        row_for(user_id)['game_type_mask'] |= game_type_bit(game_type)
+
+    return counters
+
+def write_progress_counters(db: Session, counters: Dict[int, Dict[str, Any]]):
+    """Overwrite stored counters with the given absolute values"""
+    for user_id, values in counters.items():
+        stmt = _insert({'user_id': user_id, 'updated_at': datetime.utcnow(), **values})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserProgress.user_id],
+            set_={column: stmt.excluded[column] for column in [*values, 'updated_at']}
+        )
+        db.execute(stmt)
+
+def timeline_progress_increment(user_id: int, timeline_id: int):
+    """
+    Build an upsert recording one more seen story of a timeline for a user.
+    Must run in the same transaction that inserts the UserStoryView.
+    """
+    now = datetime.utcnow()
+    stories_total = select(func.count()).select_from(Story).where(Story.timeline_id == timeline_id).scalar_subquery()
+    stmt = _insert({
+        'user_id': user_id,
+        'timeline_id': timeline_id,
+        'stories_seen': 1,
+        'stories_total': stories_total,
+        'completed_at': case((stories_total <= 1, now), else_=None)
+    }, UserTimelineProgress)
+    table = UserTimelineProgress.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=[UserTimelineProgress.user_id, UserTimelineProgress.timeline_id],
+        set_={
+            'stories_seen': table.c.stories_seen + 1,
+            'completed_at': case(
+                (table.c.completed_at.is_(None) & (table.c.stories_seen + 1 >= table.c.stories_total), now),
+                else_=table.c.completed_at
+            )
+        }
+    )
+
+def record_story_added(db: Session, timeline_id: Optional[int]):
+    """A new story is unseen by everyone: bump totals and reopen completed timelines"""
+    if timeline_id is None:
+        return
+    db.query(UserTimelineProgress).filter(UserTimelineProgress.timeline_id == timeline_id).update({
+        UserTimelineProgress.stories_total: UserTimelineProgress.stories_total + 1,
+        UserTimelineProgress.completed_at: None
+    }, synchronize_session=False)
+
+def record_stories_removed(db: Session, story_ids: Iterable[int]):
+    """Take stories that are about to be deleted out of their viewers' story counters"""
+    story_ids = list(story_ids)
+    if not story_ids:
+        return
+    seen = (UserStoryView.story_id.in_(story_ids), UserStoryView.is_seen == True)
+    viewers = select(UserStoryView.user_id).where(*seen)
+    removed = select(func.count()).where(UserStoryView.user_id == UserProgress.user_id, *seen).scalar_subquery()
+    db.query(UserProgress).filter(UserProgress.user_id.in_(viewers)).update({
+        UserProgress.stories_completed: UserProgress.stories_completed - removed
+    }, synchronize_session=False)
+
+def refresh_timeline_progress(db: Session, timeline_ids: Iterable[Optional[int]]):
+    """
+    Rebuild progress rows for whole timelines from stories and views.
+    Used when stories are removed from or moved between timelines; the caller
+    must flush the story changes first so the counts see them.
+    """
+    timeline_ids = [timeline_id for timeline_id in set(timeline_ids) if timeline_id is not None]
+    if not timeline_ids:
+        return
+
+    totals = dict(
+        db.query(Story.timeline_id, func.count()).filter(
+            Story.timeline_id.in_(timeline_ids)
+        ).group_by(Story.timeline_id).all()
+    )
+    seen = db.query(UserStoryView.user_id, Story.timeline_id, func.count()).join(
+        Story, Story.id == UserStoryView.story_id
+    ).filter(
+        Story.timeline_id.in_(timeline_ids),
+        UserStoryView.is_seen == True
+    ).group_by(UserStoryView.user_id, Story.timeline_id).all()
+
+    # Keep the original completion time for users who are still complete
+    previous = {
+        (row.user_id, row.timeline_id): row.completed_at
+        for row in db.query(UserTimelineProgress).filter(UserTimelineProgress.timeline_id.in_(timeline_ids))
+    }
+    db.query(UserTimelineProgress).filter(
+        UserTimelineProgress.timeline_id.in_(timeline_ids)
+    ).delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    rows = []
+    for user_id, timeline_id, stories_seen in seen:
+        stories_total = totals.get(timeline_id, 0)
+        completed_at = None
+        if stories_total and stories_seen >= stories_total:
+            completed_at = previous.get((user_id, timeline_id)) or now
+        rows.append({
+            'user_id': user_id,
+            'timeline_id': timeline_id,
+            'stories_seen': stories_seen,
+            'stories_total': stories_total,
+            'completed_at': completed_at
+        })
+    if rows:
+        db.execute(UserTimelineProgress.__table__.insert(), rows)
+
+def get_timeline_completion(user_id: int, db: Session) -> Dict[str, int]:
+    """Completed timelines and how many distinct categories they span"""
+    completed = db.query(Timeline.categories).join(
+        UserTimelineProgress, UserTimelineProgress.timeline_id == Timeline.id
+    ).filter(
+        UserTimelineProgress.user_id == user_id,
+        UserTimelineProgress.completed_at.isnot(None)
+    ).all()
+
+    categories = set()
+    for (timeline_categories,) in completed:
+        categories.update(timeline_categories or [])
+
+    return {
+        'timelines_completed': len(completed),
+        'timelines_completed_across_categories': len(categories)
+    }
+
+def compute_timeline_completion(db: Session, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+    """get_timeline_completion for many users with a single query"""
+    query = db.query(UserTimelineProgress.user_id, Timeline.categories).join(
+        Timeline, UserTimelineProgress.timeline_id == Timeline.id
+    ).filter(UserTimelineProgress.completed_at.isnot(None))
+    if user_ids is not None:
+        query = query.filter(UserTimelineProgress.user_id.in_(list(user_ids)))
+
+    completed: Dict[int, int] = {}
+    categories: Dict[int, set] = {}
+    for user_id, timeline_categories in query:
+        completed[user_id] = completed.get(user_id, 0) + 1
+        categories.setdefault(user_id, set()).update(timeline_categories or [])
+
+    return {
+        user_id: {
+            'timelines_completed': count,
+            'timelines_completed_across_categories': len(categories[user_id])
+        }
+        for user_id, count in completed.items()
+    }
@@ -0,0 +1,159 @@
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+import time
+from sortedcontainers import SortedList
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from db.models import SessionLocal, Profile, PointsEvent
+from utils.background import register_periodic
+from utils.points import points_balance
+
+# In-process leaderboard index: (-points, user_id) kept sorted, so rank, percentile
+# and top-N are O(log n) instead of COUNT(*) scans over profiles.
+# Users are ranked by their balance (Profile.points plus events the aggregator
+# hasn't folded in yet, see utils/points.py), the same value the endpoints show.
+# Awards and points changes made through the ORM are applied on commit. Other processes
+# (other workers, scripts) are picked up by the periodic resync from SQL, which
+# runs in the background worker. Reads only look at the index; async handlers
+# load it with `await asyncio.to_thread(rank_service.refresh_if_stale)` first,
+# which only scans profiles when the worker hasn't (first request, no worker).
+RANK_RESYNC_SECONDS = 300
+
+class RankService:
+    def __init__(self, resync_seconds: int = RANK_RESYNC_SECONDS):
+        self.resync_seconds = resync_seconds
+        self._entries = SortedList()
+        self._points: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = RLock()
+
+    def resync(self, db: Optional[Session] = None):
+        """Rebuild the index from the profiles table and pending points events"""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(Profile.user_id, points_balance()).all()
+        finally:
+            if own_session:
+                db.close()
+
+        points = {user_id: user_points or 0 for user_id, user_points in rows}
+        entries = SortedList((-user_points, user_id) for user_id, user_points in points.items())
+        with self._lock:
+            self._points = points
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.resync_seconds
+
+    def refresh_if_stale(self):
+        """Resync when the index was never loaded or is older than resync_seconds"""
+        if self.is_stale():
+            self.resync()
+
+    def set_points(self, user_id: int, points: Optional[int]):
+        points = points or 0
+        with self._lock:
+            previous = self._points.get(user_id)
+            if previous is not None:
+                self._entries.discard((-previous, user_id))
+            self._points[user_id] = points
+            self._entries.add((-points, user_id))
+
+    def add_points(self, user_id: int, delta: int):
+        """Apply an award to a user already in the index; anyone else is picked up by the next resync"""
+        with self._lock:
+            previous = self._points.get(user_id)
+            if previous is not None:
+                self.set_points(user_id, previous + delta)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            previous = self._points.pop(user_id, None)
+            if previous is not None:
+                self._entries.discard((-previous, user_id))
+
+    def total(self) -> int:
+        return len(self._entries)
+
+    def rank_for_points(self, points: int) -> int:
+        """1 + number of users with strictly more points (ties share a rank)"""
+        with self._lock:
+            return self._entries.bisect_left((-(points or 0), float('-inf'))) + 1
+
+    def rank(self, user_id: int) -> Optional[int]:
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            return self._entries.bisect_left((-points, float('-inf'))) + 1
+
+    def get_rank_info(self, user_id: int, points: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """
+        Rank, total users and percentile, computed the same way the endpoints always have.
+        Callers that just read the profile pass its points, which corrects the entry
+        if another process changed them since the last resync.
+        """
+        with self._lock:
+            if points is not None and self._points.get(user_id) != points:
+                self.set_points(user_id, points)
+            rank = self.rank(user_id)
+            if rank is None:
+                return None
+            total_users = len(self._entries)
+        percentile = round((1 - (rank / total_users)) * 100) if total_users > 0 else 0
+        return {"rank": rank, "total_users": total_users, "percentile": percentile}
+
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        """(user_id, points) of the `limit` highest ranked users"""
+        with self._lock:
+            return [(user_id, -negative_points) for negative_points, user_id in self._entries[:max(limit, 0)]]
+
+rank_service = RankService()
+
+@register_periodic('rank_index', RANK_RESYNC_SECONDS)
+def resync_rank_index(db: Session):
+    """Pick up points changed by other processes"""
+    rank_service.resync(db)
+
+# Session hooks: collect points changes at flush, apply them once the transaction commits.
+# Awards and edits of Profile.points move the balance by a delta, which leaves the
+# events still pending for the user counted.
+@event.listens_for(Session, "after_flush")
+def _collect_points_changes(session, flush_context):
+    pending = session.info.setdefault("rank_updates", {})
+    deltas = session.info.setdefault("rank_deltas", {})
+    for obj in session.new:
+        if isinstance(obj, Profile):
+            pending[obj.user_id] = obj.points
+        elif isinstance(obj, PointsEvent):
+            deltas[obj.user_id] = deltas.get(obj.user_id, 0) + obj.delta
+    for obj in session.dirty:
+        if isinstance(obj, Profile):
+            history = inspect(obj).attrs.points.history
+            if not history.has_changes():
+                continue
+            if history.deleted:
+                deltas[obj.user_id] = deltas.get(obj.user_id, 0) + (obj.points or 0) - (history.deleted[0] or 0)
+            else:
+                # Previous value never loaded, fall back to the stored points
+                pending[obj.user_id] = obj.points
+    for obj in session.deleted:
+        if isinstance(obj, Profile):
+            pending[obj.user_id] = None
+
+@event.listens_for(Session, "after_commit")
+def _apply_points_changes(session):
+    for user_id, points in session.info.pop("rank_updates", {}).items():
+        if points is None:
+            rank_service.remove(user_id)
+        else:
+            rank_service.set_points(user_id, points)
+    for user_id, delta in session.info.pop("rank_deltas", {}).items():
+        rank_service.add_points(user_id, delta)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_points_changes(session):
+    session.info.pop("rank_updates", None)
+    session.info.pop("rank_deltas", None)
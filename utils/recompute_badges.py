@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Script to recompute every user's badges after a badge rule change.
+Progress metrics are loaded for a chunk of users with a few GROUP BY queries,
+thresholds are checked for the whole chunk at once with NumPy, and only the
+badges that changed are written back in bulk.
+Applies the same earn/retention/fallback rules as utils.badge_utils.update_user_badges.
+Usage: python utils/recompute_badges.py [--dry-run]
+"""
+
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert, update
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import get_db, User, Profile, UserBadge
+from utils.badge_utils import ALL_BADGES, PREVIOUS_TIER_BADGE, BADGE_PATH_ILLUMINATION, BADGE_PATH_GAME
+from utils.progress import compute_progress_counters, compute_timeline_completion, count_game_types, PROGRESS_COUNTERS
+
+USER_CHUNK_SIZE = 5000
+WRITE_CHUNK_SIZE = 1000
+RETENTION_DAYS = 7
+
+# Rule tables compiled once: one column per metric, one row per badge.
+# Missing criteria are a threshold of 0, which every (non-negative) metric meets.
+BADGE_IDS = [badge['id'] for badge in ALL_BADGES]
+BADGE_INDEX = {badge_id: i for i, badge_id in enumerate(BADGE_IDS)}
+METRICS = sorted({metric for badge in ALL_BADGES for metric in badge['criteria']})
+THRESHOLDS = np.array(
+    [[badge['criteria'].get(metric, 0) for metric in METRICS] for badge in ALL_BADGES],
+    dtype=np.int64
+).reshape(len(ALL_BADGES), len(METRICS))
+HAS_RETENTION = np.array([badge['path'] in (BADGE_PATH_ILLUMINATION, BADGE_PATH_GAME) for badge in ALL_BADGES])
+# (badge column, previous tier column) pairs for the retention fallback
+FALLBACKS = [
+    (BADGE_INDEX[badge_id], BADGE_INDEX[previous['id']])
+    for badge_id, previous in PREVIOUS_TIER_BADGE.items()
+    if previous is not None
+]
+
+def load_metrics(db, user_ids, streaks):
+    """Metric matrix (users x METRICS) and last qualifying activity for a chunk"""
+    counters = compute_progress_counters(db, user_ids)
+    timelines = compute_timeline_completion(db, user_ids)
+
+    values = np.zeros((len(user_ids), len(METRICS)), dtype=np.int64)
+    last_activity = np.full(len(user_ids), np.datetime64('NaT'), dtype='datetime64[us]')
+    columns = {metric: j for j, metric in enumerate(METRICS)}
+
+    for i, user_id in enumerate(user_ids):
+        row = {'streak_days': streaks[i] or 0}
+        user_counters = counters.get(user_id)
+        if user_counters:
+            row.update({counter: user_counters[counter] for counter in PROGRESS_COUNTERS})
+            row['game_types_played'] = count_game_types(user_counters['game_type_mask'])
+            if user_counters['last_qualifying_activity_at']:
+                last_activity[i] = np.datetime64(user_counters['last_qualifying_activity_at'], 'us')
+        row.update(timelines.get(user_id, {}))
+        for metric, value in row.items():
+            if metric in columns:
+                values[i, columns[metric]] = value
+
+    return values, last_activity
+
+def load_held_badges(db, user_ids):
+    """Held matrix (users x badges) plus every stored row keyed by (user_id, badge_id)"""
+    positions = {user_id: i for i, user_id in enumerate(user_ids)}
+    held = np.zeros((len(user_ids), len(BADGE_IDS)), dtype=bool)
+    rows = {}
+
+    for row_id, user_id, badge_id, revoked_at in db.query(
+        UserBadge.id, UserBadge.user_id, UserBadge.badge_id, UserBadge.revoked_at
+    ).filter(UserBadge.user_id.in_(user_ids)):
+        rows[(user_id, badge_id)] = row_id
+        if revoked_at is None and badge_id in BADGE_INDEX:
+            held[positions[user_id], BADGE_INDEX[badge_id]] = True
+
+    return held, rows
+
+def evaluate_thresholds(values, last_activity, held, now):
+    """Returns (granted, revoked) boolean matrices (users x badges)"""
+    # earned[u, b]: every metric of user u meets badge b's threshold
+    earned = (values[:, None, :] >= THRESHOLDS[None, :, :]).all(axis=2)
+
+    # Retention only applies to illumination and game badges
+    recently_active = last_activity >= np.datetime64(now - timedelta(days=RETENTION_DAYS), 'us')
+    retained = ~HAS_RETENTION[None, :] | recently_active[:, None]
+
+    granted = ~held & earned
+    lost = held & ~retained
+
+    # A lost badge keeps its previous tier if the user holds it
+    kept = np.zeros_like(held)
+    for badge_column, previous_column in FALLBACKS:
+        kept[:, previous_column] |= lost[:, badge_column] & held[:, previous_column]
+
+    return granted, lost & ~kept
+
+def write_changes(db, user_ids, granted, revoked, rows, now):
+    """Insert new badge rows, reactivate revoked ones, and revoke lost ones in bulk"""
+    inserts, reactivations, revocations = [], [], []
+
+    for i, j in zip(*np.nonzero(granted)):
+        key = (user_ids[i], BADGE_IDS[j])
+        if key in rows:
+            reactivations.append({'id': rows[key], 'earned_at': now, 'revoked_at': None})
+        else:
+            inserts.append({'user_id': key[0], 'badge_id': key[1], 'earned_at': now})
+
+    for i, j in zip(*np.nonzero(revoked)):
+        revocations.append({'id': rows[(user_ids[i], BADGE_IDS[j])], 'revoked_at': now})
+
+    for start in range(0, len(inserts), WRITE_CHUNK_SIZE):
+        db.execute(insert(UserBadge), inserts[start:start + WRITE_CHUNK_SIZE])
+    # Bulk UPDATE by primary key; each batch shares one column set
+    for batch in (reactivations, revocations):
+        for start in range(0, len(batch), WRITE_CHUNK_SIZE):
+            db.execute(update(UserBadge), batch[start:start + WRITE_CHUNK_SIZE])
+
+def recompute_badges(dry_run: bool = False):
+    """Recompute badges for all users in chunks and write back only the changes"""
+    db = next(get_db())
+
+    try:
+        users = db.query(User.id, Profile.current_login_streak).outerjoin(
+            Profile, Profile.user_id == User.id
+        ).order_by(User.id).all()
+        print(f"Found {len(users)} users, {len(ALL_BADGES)} badges over {len(METRICS)} metrics")
+
+        started = time.perf_counter()
+        total_granted = total_revoked = users_changed = 0
+
+        for start in range(0, len(users), USER_CHUNK_SIZE):
+            chunk = users[start:start + USER_CHUNK_SIZE]
+            user_ids = [user_id for user_id, _ in chunk]
+            streaks = [streak for _, streak in chunk]
+            now = datetime.utcnow()
+
+            values, last_activity = load_metrics(db, user_ids, streaks)
+            held, rows = load_held_badges(db, user_ids)
+            granted, revoked = evaluate_thresholds(values, last_activity, held, now)
+
+            total_granted += int(granted.sum())
+            total_revoked += int(revoked.sum())
+            users_changed += int((granted | revoked).any(axis=1).sum())
+
+            if not dry_run:
+                write_changes(db, user_ids, granted, revoked, rows, now)
+                db.commit()
+
+            elapsed = time.perf_counter() - started
+            done = start + len(chunk)
+            print(f"  {done}/{len(users)} users ({done / elapsed:.0f} users/sec)")
+
+        elapsed = time.perf_counter() - started
+        rate = len(users) / elapsed if elapsed else 0
+        action = "Would change" if dry_run else "Changed"
+        print(f"{action} badges for {users_changed} users: {total_granted} granted, {total_revoked} revoked")
+        print(f"✅ Recomputed badges for {len(users)} users in {elapsed:.2f}s ({rate:.0f} users/sec)")
+
+    except Exception as e:
+        print(f"❌ Error recomputing badges: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    recompute_badges(dry_run="--dry-run" in sys.argv[1:])
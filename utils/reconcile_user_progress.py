@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the user_progress counters and user_timeline_progress rows
+from the raw activity tables.
+Counters are maintained incrementally, so deletes (stories, games, users' views)
+can leave them out of step; run this periodically to catch and fix drift.
+Usage: python utils/reconcile_user_progress.py [--dry-run]
+"""
+
+import sys
+import os
+from datetime import timedelta
+
+# Add the parent directory to the path so we can import from the project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.models import get_db, UserProgress, Timeline
+from utils.progress import compute_progress_counters, write_progress_counters, refresh_timeline_progress, PROGRESS_COUNTERS
+
+COMPARED_COLUMNS = PROGRESS_COUNTERS + ('game_type_mask', 'last_qualifying_activity_at')
+# The stored activity stamp is taken when the counters are bumped, a moment after the
+# activity row's own timestamp, so only a larger gap counts as drift
+ACTIVITY_TOLERANCE = timedelta(minutes=1)
+
+def column_drifted(row, values, column) -> bool:
+    stored, expected = getattr(row, column), values[column]
+    if column == 'last_qualifying_activity_at' and stored is not None and expected is not None:
+        return abs(stored - expected) > ACTIVITY_TOLERANCE
+    return stored != expected
+
+def reconcile_user_progress(dry_run: bool = False):
+    """Compare stored counters with the raw tables and overwrite any that drifted"""
+    db = next(get_db())
+
+    try:
+        expected = compute_progress_counters(db)
+        stored = {row.user_id: row for row in db.query(UserProgress).all()}
+
+        drifted = {}
+        for user_id, values in expected.items():
+            row = stored.get(user_id)
+            if row is None or any(column_drifted(row, values, column) for column in COMPARED_COLUMNS):
+                drifted[user_id] = values
+
+        # Users whose activity rows are all gone should be back at zero
+        for user_id, row in stored.items():
+            if user_id not in expected and any(getattr(row, column) for column in COMPARED_COLUMNS):
+                drifted[user_id] = {column: 0 for column in COMPARED_COLUMNS}
+                drifted[user_id]['last_qualifying_activity_at'] = None
+
+        print(f"Checked {len(set(expected) | set(stored))} users, {len(drifted)} with drifted counters")
+
+        for user_id, values in list(drifted.items())[:20]:
+            row = stored.get(user_id)
+            before = {column: getattr(row, column) for column in COMPARED_COLUMNS} if row else None
+            print(f"  user {user_id}: {before} -> {values}")
+
+        if drifted and not dry_run:
+            write_progress_counters(db, drifted)
+            db.commit()
+            print(f"✅ Rebuilt counters for {len(drifted)} users")
+
+        if not dry_run:
+            # Timeline progress is rebuilt wholesale, one timeline batch at a time
+            timeline_ids = [timeline_id for (timeline_id,) in db.query(Timeline.id).all()]
+            for i in range(0, len(timeline_ids), 100):
+                refresh_timeline_progress(db, timeline_ids[i:i + 100])
+                db.commit()
+            print(f"✅ Rebuilt timeline progress for {len(timeline_ids)} timelines")
+
+    except Exception as e:
+        print(f"❌ Error reconciling user progress: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconcile_user_progress(dry_run="--dry-run" in sys.argv[1:])
@@ -0,0 +1,229 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
+import gzip
+import brotli
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.catalog import catalog_version
+
+# Serialization: the app's default response class is ORJSONResponse, but FastAPI
+# still runs a returned dict through jsonable_encoder first, which costs far more
+# than the encoding itself on the large lists. Hot endpoints declare a typed
+# response_model for the API schema and return json_response(), which encodes
+# their dicts straight to bytes. Catalog payloads that are the same for every
+# user are kept as bytes in response_cache until the catalog version moves.
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Compression: bodies under this size aren't worth the CPU or the extra header
+COMPRESSION_MINIMUM_SIZE = 1024
+# Bodies from this size on take a millisecond or more to compress, so they are
+# compressed in a thread instead of on the event loop
+COMPRESSION_THREAD_MINIMUM_SIZE = 64 * 1024
+GZIP_LEVEL = 6
+# Brotli 4 compresses JSON better than gzip 6 at about the same speed
+BROTLI_QUALITY = 4
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+def _default(value: Any):
+    """orjson fallback for the catalog's NamedTuple records and Pydantic models"""
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        return value._asdict()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """
+    `content` encoded with orjson, skipping jsonable_encoder. A returned Response
+    doesn't pick up headers set on the injected `response` (cursor, ETag), so they
+    are copied over.
+    """
+    result = Response(dump_json(content), status_code=status_code, media_type=ORJSONResponse.media_type)
+    if response is not None:
+        for name, value in response.raw_headers:
+            if name not in (b"content-length", b"content-type"):
+                result.raw_headers.append((name, value))
+    return result
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+class ResponseCache:
+    """
+    Serialized responses keyed by catalog version stamp and URL, for endpoints whose
+    payload only depends on the catalog. Entries of older versions are never hit
+    again and fall out as the byte budget fills.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, request: Request) -> Tuple[str, str, str]:
+        _, stamp = catalog_version.current_state()
+        return stamp, request.url.path, request.url.query
+
+    def get(self, request: Request) -> Optional[Response]:
+        key = self._key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        response = Response(entry.body, status_code=entry.status_code)
+        response.raw_headers = list(entry.headers)
+        return response
+
+    def put(self, request: Request, response: Response) -> Response:
+        """Keep the serialized `response` for the current catalog version and return it"""
+        key = self._key(request)
+        entry = CachedResponse(response.status_code, list(response.raw_headers), bytes(response.body))
+        if len(entry.body) > self.max_bytes:
+            return response
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+        return response
+
+    def serve(self, request: Request, response: Response, build: Callable[[], Any]) -> Response:
+        """The cached bytes for this URL, or json_response(build()) cached for next time"""
+        cached = self.get(request)
+        if cached is not None:
+            return cached
+        return self.put(request, json_response(build(), response))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+response_cache = ResponseCache()
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """"br" or "gzip" from an Accept-Encoding header, brotli first on a tie; None for identity"""
+    encodings = _accepted_encodings(header)
+    wildcard = encodings.get("*", 0.0)
+    candidates = [(encodings.get(name, wildcard), -rank, name) for rank, name in enumerate(("br", "gzip"))]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip for JSON and text bodies, whichever the client prefers. Only
+    responses sent in one piece are compressed: streamed bodies (media files) go
+    out as they are, and so do small ones and 304s.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        thread_minimum_size: int = COMPRESSION_THREAD_MINIMUM_SIZE
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= self.thread_minimum_size:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            # The bytes differ per encoding, so the ETag can only stay as a weak validator
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,12 +1,17 @@
 import os
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from fastapi import UploadFile
 import uuid
 from pathlib import Path
 from dotenv import load_dotenv
+from typing import BinaryIO, Optional
+import asyncio
 import io
 from PIL import Image
+import shutil
 import tempfile
 import subprocess
 
@@ -20,6 +25,22 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 S3_ENABLED = os.getenv("S3_ENABLED", "false").lower() == "true"
 
+# Multipart uploads: files over the threshold go up in parts of S3_PART_SIZE,
+# S3_UPLOAD_CONCURRENCY parts at a time, with at most twice that many parts
+# buffered in memory per upload
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", 8 * 1024 * 1024))
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", 4))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_PART_SIZE,
+    multipart_chunksize=S3_PART_SIZE,
+    max_concurrency=S3_UPLOAD_CONCURRENCY,
+    use_threads=True
+)
+TRANSFER_CONFIG.max_in_memory_upload_chunks = S3_UPLOAD_CONCURRENCY * 2
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv']
+
 # Initialize S3 client if S3 is enabled
 s3_client = None
 if S3_ENABLED and AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and S3_BUCKET_NAME:
@@ -32,7 +53,7 @@ if S3_ENABLED and AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and S3_BUCKET_NAME
 
 async def compress_image(image_data: bytes, quality: int = 85, max_size: tuple = (1920, 1080)) -> bytes:
     """
-    Compress an image using PIL
+    Compress an image using PIL, in a worker thread
     
     Args:
         image_data: The original image data
@@ -42,6 +63,9 @@ async def compress_image(image_data: bytes, quality: int = 85, max_size: tuple =
     Returns:
         Compressed image data
     """
+    return await asyncio.to_thread(_compress_image, image_data, quality, max_size)
+
+def _compress_image(image_data: bytes, quality: int, max_size: tuple) -> bytes:
     try:
         img = Image.open(io.BytesIO(image_data))
         
@@ -62,25 +86,19 @@ async def compress_image(image_data: bytes, quality: int = 85, max_size: tuple =
         print(f"Error compressing image: {e}")
         return image_data  # Return original if compression fails
 
-async def compress_video(video_data: bytes, crf: int = 28) -> bytes:
+def compress_video(input_path: str, crf: int = 28) -> Optional[str]:
     """
-    Compress a video using FFmpeg
+    Compress a video file using FFmpeg. Blocking, run it in a worker thread.
     
     Args:
-        video_data: The original video data
+        input_path: Path of the original video
         crf: Constant Rate Factor (0-51, higher means more compression)
         
     Returns:
-        Compressed video data or original if compression fails
+        Path of the compressed video, to be removed by the caller, or None if compression fails
     """
+    output_path = input_path + '_compressed.mp4'
     try:
-        # Create temporary files for input and output
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as input_file:
-            input_file.write(video_data)
-            input_path = input_file.name
-            
-        output_path = input_path + '_compressed.mp4'
-        
         # Run FFmpeg compression
         cmd = [
             'ffmpeg', '-i', input_path, 
@@ -94,31 +112,49 @@ async def compress_video(video_data: bytes, crf: int = 28) -> bytes:
         
         if result.returncode != 0:
             print(f"FFmpeg error: {result.stderr.decode()}")
-            os.unlink(input_path)
-            return video_data
-            
-        # Read compressed video
-        with open(output_path, 'rb') as f:
-            compressed_data = f.read()
-            
-        # Clean up temporary files
-        os.unlink(input_path)
-        os.unlink(output_path)
+            if os.path.exists(output_path):
+                os.unlink(output_path)
+            return None
         
-        return compressed_data
+        return output_path
     except Exception as e:
         print(f"Error compressing video: {e}")
-        try:
-            os.unlink(input_path)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-        except:
-            pass
-        return video_data  # Return original if compression fails
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        return None
+
+def _upload_fileobj(file_obj: BinaryIO, object_key: str, content_type: Optional[str]):
+    """Blocking streamed upload; multipart with parallel parts above the threshold"""
+    file_obj.seek(0)
+    s3_client.upload_fileobj(
+        file_obj,
+        S3_BUCKET_NAME,
+        object_key,
+        ExtraArgs={"ContentType": content_type} if content_type else None,
+        Config=TRANSFER_CONFIG
+    )
+
+def _upload_compressed_video(source: BinaryIO, file_extension: str, object_key: str, content_type: Optional[str]):
+    """Spool the upload to a named file for FFmpeg, then upload the compressed file, or the original if that fails"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as input_file:
+        source.seek(0)
+        shutil.copyfileobj(source, input_file, S3_PART_SIZE)
+        input_path = input_file.name
+    output_path = None
+    try:
+        output_path = compress_video(input_path)
+        with open(output_path or input_path, 'rb') as video_file:
+            _upload_fileobj(video_file, object_key, content_type)
+    finally:
+        for path in (input_path, output_path):
+            if path and os.path.exists(path):
+                os.unlink(path)
 
 async def upload_file_to_s3(upload_file: UploadFile, directory: str, compress: bool = True) -> str:
     """
     Upload a file to S3 bucket and return the URL.
+    The file is streamed from the upload's spool file, never read into memory whole,
+    except for images, which are small enough to recompress in memory.
     
     Args:
         upload_file: The uploaded file
@@ -142,29 +178,15 @@ async def upload_file_to_s3(upload_file: UploadFile, directory: str, compress: b
     object_key = f"{directory}/{unique_filename}"
     
     try:
-        # Read file content
-        file_content = await upload_file.read()
-        
         # Compress if needed
-        if compress:
-            if directory == "images" and file_extension.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
-                file_content = await compress_image(file_content)
-                content_type = 'image/jpeg'
-            elif directory == "videos" and file_extension.lower() in ['.mp4', '.mov', '.avi', '.mkv']:
-                file_content = await compress_video(file_content)
-                content_type = upload_file.content_type
-            else:
-                content_type = upload_file.content_type
+        if compress and directory == "images" and file_extension.lower() in IMAGE_EXTENSIONS:
+            await upload_file.seek(0)
+            file_content = await compress_image(await upload_file.read())
+            await asyncio.to_thread(_upload_fileobj, io.BytesIO(file_content), object_key, 'image/jpeg')
+        elif compress and directory == "videos" and file_extension.lower() in VIDEO_EXTENSIONS:
+            await asyncio.to_thread(_upload_compressed_video, upload_file.file, file_extension, object_key, upload_file.content_type)
         else:
-            content_type = upload_file.content_type
-        
-        # Upload the file
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=object_key,
-            Body=file_content,
-            ContentType=content_type
-        )
+            await asyncio.to_thread(_upload_fileobj, upload_file.file, object_key, upload_file.content_type)
         
         # Reset file cursor for potential further use
         await upload_file.seek(0)
@@ -177,9 +199,30 @@ async def upload_file_to_s3(upload_file: UploadFile, directory: str, compress: b
         
         return s3_url
     
-    except ClientError as e:
+    except (ClientError, S3UploadFailedError) as e:
+        print(f"Error uploading to S3: {e}")
+        await upload_file.seek(0)
+        return None
+
+def upload_path_to_s3(file_path: str, directory: str, content_type: Optional[str]) -> Optional[str]:
+    """
+    Stream a local file to S3 as it is, multipart above the threshold. Blocking,
+    run it in a worker thread. Returns the URL, or None when S3 is off or the upload fails.
+    """
+    if not S3_ENABLED or not s3_client:
+        return None
+    
+    object_key = f"{directory}/{uuid.uuid4()}{os.path.splitext(file_path)[1]}"
+    try:
+        with open(file_path, 'rb') as file_obj:
+            _upload_fileobj(file_obj, object_key, content_type)
+    except (ClientError, S3UploadFailedError) as e:
         print(f"Error uploading to S3: {e}")
         return None
+    
+    if AWS_REGION == "us-east-1":
+        return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{object_key}"
+    return f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{object_key}"
 
 async def upload_image_to_s3(image: UploadFile, compress: bool = True) -> str:
     """Upload an image to S3 and return its URL"""
@@ -250,7 +293,7 @@ def upload_local_file_to_s3(file_path, directory="images", compress: bool = True
             file_data = file_obj.read()
         
         if compress:
-            if directory == "images" and file_extension.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
+            if directory == "images" and file_extension.lower() in IMAGE_EXTENSIONS:
                 # Convert synchronous use
                 img = Image.open(io.BytesIO(file_data))
                 if img.mode == 'RGBA':
@@ -261,7 +304,7 @@ def upload_local_file_to_s3(file_path, directory="images", compress: bool = True
                 img.save(output, format='JPEG', quality=85, optimize=True)
                 file_data = output.getvalue()
                 content_type = 'image/jpeg'
-            elif directory == "videos" and file_extension.lower() in ['.mp4', '.mov', '.avi', '.mkv']:
+            elif directory == "videos" and file_extension.lower() in VIDEO_EXTENSIONS:
                 # Create temporary files for video compression
                 with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as input_file:
                     input_file.write(file_data)
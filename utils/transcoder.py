@@ -0,0 +1,427 @@
+import asyncio
+import fcntl
+import os
+import re
+import shutil
+import socket
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Set
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from db.models import SessionLocal, Story, VideoJob
+from utils.file_handler import MEDIA_ROOT, IMAGES_DIR, VIDEOS_DIR, PENDING_VIDEOS_DIR, delete_file
+from utils.s3_handler import upload_path_to_s3
+# Registers the catalog hooks, so a finished video shows up in the catalog cache
+import utils.catalog
+
+# Story videos are accepted as they are and transcoded here, off the request.
+# The video_jobs table is the queue: any app process can pick up a job, a worker
+# claims it with a conditional UPDATE and keeps its heartbeat fresh while ffmpeg
+# runs. Jobs whose heartbeat went stale (the process died or was restarted) are
+# found by the recovery scan and run again, up to MAX_ATTEMPTS times.
+# Uploads are kept on the disk of the host that received them, so a job is only
+# claimed by processes on that host, and every process there counts the jobs the
+# host is running before it claims one, under a host-wide file lock.
+CPU_COUNT = os.cpu_count() or 1
+# Transcodes at a time per host, across all its app processes, and ffmpeg threads per transcode
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", max(1, CPU_COUNT // 2)))
+FFMPEG_THREADS = max(1, CPU_COUNT // TRANSCODE_WORKERS)
+# ffmpeg runs at a lower priority than the API
+FFMPEG_NICENESS = 10
+VIDEO_CRF = 28
+PROGRESS_REPORT_SECONDS = 2
+STALE_AFTER_SECONDS = 60
+RECOVERY_SCAN_SECONDS = 30
+MAX_ATTEMPTS = 3
+# How long a worker waits for a free transcode slot on the host before asking again
+CLAIM_RETRY_SECONDS = 5
+# Hosts sharing PENDING_VIDEOS_DIR (a network volume) can set the same TRANSCODE_HOST
+TRANSCODE_HOST = os.getenv("TRANSCODE_HOST", socket.gethostname())[:64]
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:64]
+CLAIMS_LOCK_PATH = PENDING_VIDEOS_DIR / ".claims.lock"
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+class TranscodeError(Exception):
+    pass
+
+class JobCancelled(Exception):
+    """The job was replaced by a newer upload, or taken over, while it ran"""
+
+class HostBusy(Exception):
+    """The host already runs TRANSCODE_WORKERS transcodes"""
+
+def ffmpeg_binary() -> str:
+    """FFMPEG_BINARY, the ffmpeg on PATH, or the one bundled with imageio-ffmpeg"""
+    binary = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+    if binary:
+        return binary
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+def _lower_priority():
+    os.nice(FFMPEG_NICENESS)
+
+def create_video_job(db: Session, story_id: int, source_path: str) -> VideoJob:
+    """Queue a story's new video in the caller's transaction; older unfinished uploads of the story are cancelled"""
+    now = datetime.utcnow()
+    for job in db.query(VideoJob).filter(VideoJob.story_id == story_id, VideoJob.status == "processing"):
+        job.status = "cancelled"
+        job.finished_at = now
+        if job.claimed_by is None and os.path.exists(job.source_path):
+            # Nobody is working on it; a running worker cleans up after itself
+            os.remove(job.source_path)
+    job = VideoJob(story_id=story_id, source_path=source_path, host=TRANSCODE_HOST, status="processing", progress=0, attempts=0)
+    db.add(job)
+    return job
+
+def _on_this_host():
+    # Jobs queued before jobs recorded their host can run anywhere
+    return or_(VideoJob.host == TRANSCODE_HOST, VideoJob.host.is_(None))
+
+def pending_job_ids(db: Session, limit: int = 100) -> List[int]:
+    """
+    Unfinished jobs of this host nobody is working on: never claimed, or claimed by
+    a worker that stopped reporting
+    """
+    stale = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+    return [
+        job_id for (job_id,) in db.query(VideoJob.id).filter(
+            VideoJob.status == "processing",
+            _on_this_host(),
+            or_(VideoJob.heartbeat_at.is_(None), VideoJob.heartbeat_at < stale)
+        ).order_by(VideoJob.id).limit(limit)
+    ]
+
+@contextmanager
+def _claims_lock():
+    """Exclusive lock shared by every process on the host"""
+    with open(CLAIMS_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _claim(job_id: int) -> Optional[str]:
+    """
+    Take the job for this process and return its source path, or None if it isn't
+    available. Raises HostBusy while the host has no free transcode slot.
+    """
+    db = SessionLocal()
+    try:
+        with _claims_lock():
+            now = datetime.utcnow()
+            stale = now - timedelta(seconds=STALE_AFTER_SECONDS)
+            available = db.query(VideoJob).filter(
+                VideoJob.id == job_id,
+                VideoJob.status == "processing",
+                _on_this_host(),
+                or_(VideoJob.heartbeat_at.is_(None), VideoJob.heartbeat_at < stale)
+            )
+            if available.first() is None:
+                return None
+            running = db.query(VideoJob.id).filter(
+                VideoJob.status == "processing",
+                _on_this_host(),
+                VideoJob.claimed_by.isnot(None),
+                VideoJob.heartbeat_at >= stale
+            ).count()
+            if running >= TRANSCODE_WORKERS:
+                raise HostBusy()
+
+            claimed = available.update(
+                {"claimed_by": WORKER_ID, "heartbeat_at": now, "attempts": VideoJob.attempts + 1},
+                synchronize_session=False
+            )
+            db.commit()
+        if not claimed:
+            return None
+
+        job = db.get(VideoJob, job_id)
+        if job.attempts > MAX_ATTEMPTS:
+            _fail(job_id, f"Transcoding was interrupted {MAX_ATTEMPTS} times")
+            _remove(job.source_path)
+            return None
+        return job.source_path
+    finally:
+        db.close()
+
+def _report_progress(job_id: int, progress: int) -> bool:
+    """Progress and heartbeat; False when the job is no longer this worker's"""
+    db = SessionLocal()
+    try:
+        updated = db.query(VideoJob).filter(
+            VideoJob.id == job_id, VideoJob.claimed_by == WORKER_ID, VideoJob.status == "processing"
+        ).update({"progress": progress, "heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+    finally:
+        db.close()
+
+def _finish(job_id: int, video_url: str, poster_url: Optional[str]) -> bool:
+    """Swap the transcoded video into the story; False when the job is no longer this worker's"""
+    db = SessionLocal()
+    try:
+        job = db.query(VideoJob).filter(
+            VideoJob.id == job_id, VideoJob.claimed_by == WORKER_ID, VideoJob.status == "processing"
+        ).with_for_update().first()
+        story = db.get(Story, job.story_id) if job else None
+        if story is None:
+            return False
+
+        old_video = story.video_url
+        story.video_url = video_url
+        if not story.thumbnail_url and poster_url:
+            story.thumbnail_url = poster_url
+        job.status = "ready"
+        job.progress = 100
+        job.video_url = video_url
+        job.poster_url = poster_url
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+        if old_video and old_video != video_url:
+            delete_file(old_video)
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _release(job_id: int):
+    """Hand the job back without counting the attempt, for a worker shutting down"""
+    db = SessionLocal()
+    try:
+        db.query(VideoJob).filter(
+            VideoJob.id == job_id, VideoJob.claimed_by == WORKER_ID, VideoJob.status == "processing"
+        ).update(
+            {"claimed_by": None, "heartbeat_at": None, "progress": 0, "attempts": VideoJob.attempts - 1},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _fail(job_id: int, error: str):
+    db = SessionLocal()
+    try:
+        db.query(VideoJob).filter(
+            VideoJob.id == job_id, VideoJob.claimed_by == WORKER_ID, VideoJob.status == "processing"
+        ).update({"status": "failed", "error": error[-2000:], "finished_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _remove(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _publish(path: str, directory: str, content_type: str) -> str:
+    """The file's S3 URL when S3 is enabled, else its media path"""
+    s3_url = upload_path_to_s3(path, directory, content_type)
+    if s3_url:
+        os.remove(path)
+        return s3_url
+    return str(Path(path).relative_to(MEDIA_ROOT.parent))
+
+async def _transcode(job_id: int, source_path: str, output_path: str) -> Optional[float]:
+    """Run ffmpeg, reporting progress as it goes; returns the duration in seconds when ffmpeg printed it"""
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_binary(), "-hide_banner", "-nostdin", "-y", "-i", source_path,
+        "-c:v", "libx264", "-crf", str(VIDEO_CRF), "-preset", "medium", "-threads", str(FFMPEG_THREADS),
+        "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart",
+        "-progress", "pipe:1", "-nostats", output_path,
+        stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        preexec_fn=_lower_priority if hasattr(os, "nice") else None
+    )
+    duration = None
+    stderr_tail = deque(maxlen=20)
+
+    async def read_stderr():
+        nonlocal duration
+        async for line in process.stderr:
+            text = line.decode(errors="replace").rstrip()
+            stderr_tail.append(text)
+            match = DURATION_PATTERN.search(text) if duration is None else None
+            if match:
+                hours, minutes, seconds = match.groups()
+                duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    stderr_task = asyncio.create_task(read_stderr())
+    try:
+        last_report = 0.0
+        # -progress writes key=value lines, a block about twice a second
+        async for line in process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key != "out_time_us" or time.monotonic() - last_report < PROGRESS_REPORT_SECONDS:
+                continue
+            last_report = time.monotonic()
+            progress = 0
+            if duration and value.isdigit():
+                progress = min(99, int(int(value) / 1_000_000 / duration * 100))
+            if not await asyncio.to_thread(_report_progress, job_id, progress):
+                raise JobCancelled()
+        await process.wait()
+        await stderr_task
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+
+    if process.returncode != 0:
+        raise TranscodeError("\n".join(stderr_tail) or f"ffmpeg exited with {process.returncode}")
+    return duration
+
+async def _extract_poster(video_path: str, poster_path: str, duration: Optional[float]) -> bool:
+    """A frame a second in (or halfway through shorter videos) as a JPEG; False for videos without one"""
+    position = min(1.0, duration / 2) if duration else 0.0
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_binary(), "-hide_banner", "-nostdin", "-y", "-ss", f"{position:.2f}", "-i", video_path,
+        "-frames:v", "1", "-q:v", "3", poster_path,
+        stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        preexec_fn=_lower_priority if hasattr(os, "nice") else None
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0 or not os.path.exists(poster_path):
+        print(f"No poster frame for {video_path}: {stderr.decode(errors='replace')[-300:]}")
+        return False
+    return True
+
+async def process_video_job(job_id: int):
+    """Claim, transcode and publish one job"""
+    while True:
+        try:
+            source_path = await asyncio.to_thread(_claim, job_id)
+            break
+        except HostBusy:
+            await asyncio.sleep(CLAIM_RETRY_SECONDS)
+    if source_path is None:
+        return
+
+    output_path = str(VIDEOS_DIR / f"{uuid.uuid4()}.mp4")
+    poster_path = str(IMAGES_DIR / f"{uuid.uuid4()}.jpg")
+    published: List[str] = []
+    done = False
+    try:
+        if not os.path.exists(source_path):
+            raise TranscodeError("The uploaded video is missing")
+        duration = await _transcode(job_id, source_path, output_path)
+        has_poster = await _extract_poster(output_path, poster_path, duration)
+
+        published.append(await asyncio.to_thread(_publish, output_path, "videos", "video/mp4"))
+        if has_poster:
+            published.append(await asyncio.to_thread(_publish, poster_path, "images", "image/jpeg"))
+        video_url, poster_url = published[0], (published[1] if has_poster else None)
+        done = True
+        if await asyncio.to_thread(_finish, job_id, video_url, poster_url):
+            # The story has them now
+            published.clear()
+            output_path = poster_path = None
+            print(f"Transcoded video job {job_id}: {video_url}")
+    except JobCancelled:
+        done = True
+        print(f"Video job {job_id} was cancelled")
+    except TranscodeError as e:
+        done = True
+        print(f"Error transcoding video job {job_id}: {e}")
+        await asyncio.to_thread(_fail, job_id, str(e))
+    except asyncio.CancelledError:
+        # Shutting down: the job goes back to the queue for the next start. If this
+        # doesn't get through, the recovery scan takes it once the heartbeat is stale.
+        try:
+            await asyncio.to_thread(_release, job_id)
+        finally:
+            raise
+    except Exception as e:
+        done = True
+        print(f"Error processing video job {job_id}: {e}")
+        await asyncio.to_thread(_fail, job_id, str(e))
+    finally:
+        # Whatever didn't end up in a story: partial outputs, or results of a cancelled job
+        for path in (output_path, poster_path):
+            _remove(path)
+        for url in published:
+            delete_file(url)
+        if done:
+            _remove(source_path)
+
+class TranscodePool:
+    """
+    Worker tasks running queued video jobs, plus the recovery scan. Every process
+    has TRANSCODE_WORKERS of them, the claims keep the host to that many transcodes.
+    """
+
+    def __init__(self, workers: int = TRANSCODE_WORKERS):
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs queued or running in this process
+        self._queued: Set[int] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def enqueue(self, job_id: int):
+        """Run the job in this process. Without running workers it waits for the next recovery scan."""
+        if not self.running or job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await process_video_job(job_id)
+            except Exception as e:
+                print(f"Error in video worker for job {job_id}: {e}")
+            finally:
+                self._queued.discard(job_id)
+                self._queue.task_done()
+
+    async def _recover(self):
+        while True:
+            try:
+                for job_id in await asyncio.to_thread(self._pending_job_ids):
+                    self.enqueue(job_id)
+            except Exception as e:
+                print(f"Error scanning for video jobs: {e}")
+            await asyncio.sleep(RECOVERY_SCAN_SECONDS)
+
+    @staticmethod
+    def _pending_job_ids() -> List[int]:
+        db = SessionLocal()
+        try:
+            return pending_job_ids(db)
+        finally:
+            db.close()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Also picks up the jobs left over by a previous run
+        self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def stop(self):
+        """Stop without waiting for running transcodes; their ffmpeg is killed and the jobs resume later"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
+        self._queued.clear()
+
+transcode_pool = TranscodePool()